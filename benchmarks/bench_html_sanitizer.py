@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""Benchmark HTMLSanitizer.sanitize_html per parser backend against the original
+multi-pass rules.
+
+Usage: python benchmarks/bench_html_sanitizer.py [--repeat N]
+"""
+
+import argparse
+import os
+import random
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "connect_q_cdk", "lambdas", "kb_content_parser"))
+
+from bs4 import BeautifulSoup
+from html_sanitizer import HTMLSanitizer, available_parser_backends
+from benchmarks.synthetic_articles import ARTICLE_SHAPES, generate_article_html
+
+def multi_pass_sanitize(html_content):
+    """The pre-refactor implementation: four find_all() walks, then str(soup)."""
+    soup = BeautifulSoup(html_content, 'html.parser')
+    for tag in soup.find_all():
+        if tag.name == 'a' and 'target' in tag.attrs:
+            del tag['target']
+        if tag.name == 'b':
+            tag.name = 'strong'
+    for table in soup.find_all('table'):
+        if 'border' in table.attrs:
+            table['border'] = '1'
+        for attr in list(table.attrs):
+            if attr not in ['border']:
+                del table[attr]
+    for link in soup.find_all('a'):
+        for attr in list(link.attrs):
+            if attr not in ['href', 'title']:
+                del link[attr]
+    for img in soup.find_all('img'):
+        for attr in list(img.attrs):
+            if attr not in ['src', 'alt', 'title']:
+                del img[attr]
+    return str(soup).replace('\xa0', ' ').replace('\n', ' ')
+
+def best_of(func, arg, repeat):
+    return min(timeit.repeat(lambda: func(arg), number=1, repeat=repeat))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=15)
+    args = parser.parse_args()
+
+    backends = available_parser_backends()
+    print(f"{'shape':<10}{'KB':>8}{'multi-pass ms':>15}" + ''.join(f"{backend + ' ms':>16}" for backend in backends))
+    for shape, params in ARTICLE_SHAPES.items():
+        html = generate_article_html(random.Random(42), **params)
+        before = best_of(multi_pass_sanitize, html, args.repeat)
+        row = f"{shape:<10}{len(html) / 1024:>8.1f}{before * 1000:>15.2f}"
+        for backend in backends:
+            sanitizer = HTMLSanitizer(backend)
+            after = best_of(sanitizer.sanitize_html, html, args.repeat)
+            row += f"{after * 1000:>9.2f} ({before / after:.1f}x)"
+        print(row)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""Benchmark decoding AppFlow JSON Lines: stdlib (decode + json.loads) against
+the orjson fast path ArticleParser uses when orjson is installed.
+
+Usage: python benchmarks/bench_json_decode.py [--articles N] [--repeat N]
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "connect_q_cdk", "lambdas", "kb_content_parser"))
+
+import article_parser
+from article_parser import ArticleParser
+from benchmarks.synthetic_articles import ARTICLE_SHAPES, generate_export_lines
+
+def stdlib_loads(lines):
+    for line in lines:
+        json.loads(line.decode("utf-8").strip())
+
+def fast_loads(lines):
+    for line in lines:
+        ArticleParser.fast_loads(line)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--articles", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if article_parser.orjson is None:
+        print("orjson is not installed; only the stdlib path is available")
+        return
+
+    print(f"{'shape':<10}{'MB':>8}{'stdlib ms':>12}{'orjson ms':>12}{'speedup':>9}")
+    for shape in ARTICLE_SHAPES:
+        lines = generate_export_lines(args.articles, archived_ratio=0, **ARTICLE_SHAPES[shape])
+        size = sum(len(line) for line in lines) / 1024 / 1024
+        before = min(timeit.repeat(lambda: stdlib_loads(lines), number=1, repeat=args.repeat)) * 1000
+        after = min(timeit.repeat(lambda: fast_loads(lines), number=1, repeat=args.repeat)) * 1000
+        print(f"{shape:<10}{size:>8.1f}{before:>12.1f}{after:>12.1f}{before / after:>8.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""Benchmark OUTPUT_ENCODING: stored bytes and compression cost per sanitized
+article, and the upload time saved at a given effective bandwidth.
+
+br is reported only when the brotli package is installed.
+
+Usage: python benchmarks/bench_output_encoding.py [--repeat N] [--mbps 200]
+"""
+
+import argparse
+import os
+import random
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "connect_q_cdk", "lambdas", "kb_content_parser"))
+
+import s3_manager
+from html_sanitizer import HTMLSanitizer
+from s3_manager import compress_html
+from benchmarks.synthetic_articles import ARTICLE_SHAPES, generate_article_html
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=15)
+    parser.add_argument("--mbps", type=float, default=200.0, help="effective upload bandwidth per connection")
+    args = parser.parse_args()
+
+    encodings = ["gzip"] + (["br"] if s3_manager.brotli is not None else [])
+    sanitizer = HTMLSanitizer()
+    bytes_per_ms = args.mbps * 1000 / 8
+
+    print(f"{'shape':<10}{'encoding':<10}{'KB':>9}{'stored KB':>11}{'ratio':>8}{'compress ms':>13}{'upload ms saved':>17}")
+    for shape, params in ARTICLE_SHAPES.items():
+        html = sanitizer.sanitize_html(generate_article_html(random.Random(42), **params))
+        size = len(html.encode("utf-8"))
+        for encoding in encodings:
+            stored = len(compress_html(html, encoding))
+            cost = min(timeit.repeat(lambda: compress_html(html, encoding), number=1, repeat=args.repeat)) * 1000
+            saved = (size - stored) / bytes_per_ms
+            print(f"{shape:<10}{encoding:<10}{size / 1024:>9.1f}{stored / 1024:>11.1f}{size / stored:>7.1f}x"
+                  f"{cost:>13.2f}{saved:>17.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Benchmark parsing and sanitizing an export file in the handler process
+against the SANITIZE_MODE=process worker pool.
+
+The cache is disabled so every article is sanitized. On Lambda the worker pool
+only helps once the function has more than one vCPU (about 3538 MB and up).
+
+Usage: python benchmarks/bench_process_pool.py [--articles N] [--shape typical] [--workers 1,2,4]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "connect_q_cdk", "lambdas", "kb_content_parser"))
+
+from article_parser import ArticleParser, parse_lines_task
+from html_sanitizer import HTMLSanitizer, default_parser_backend
+from process_pool import WorkerPool, available_cpus
+from record_validator import RecordValidator
+from sanitize_cache import SanitizeCache
+from benchmarks.synthetic_articles import ARTICLE_SHAPES, generate_article_html
+
+CONTENT_FIELD = "Content__c"
+CONFIG_PATH = os.path.join(ROOT, "config", "config.dev.json")
+
+def load_record_schema(path=CONFIG_PATH):
+    """RECORD_SCHEMA as the stack builds it from the salesforce tasks."""
+    with open(path) as f:
+        tasks = json.load(f)["salesforce"]["tasks"]
+    return json.dumps({name: tasks.get(name, []) for name in ("projections", "filters", "validations")},
+                      separators=(",", ":"))
+
+def generate_lines(count, shape):
+    rng = random.Random(42)
+    return [
+        (json.dumps({
+            "Id": f"ka0{i:05d}",
+            "Title": f"Article <b>{i}</b>",
+            "ArticleNumber": f"{i:09d}",
+            "UrlName": f"article-{i}",
+            "PublishStatus": "Online",
+            CONTENT_FIELD: generate_article_html(rng, **ARTICLE_SHAPES[shape]),
+        }) + "\n").encode("utf-8")
+        for i in range(count)
+    ]
+
+def chunks(lines, size):
+    return [lines[i:i + size] for i in range(0, len(lines), size)]
+
+def run(articles, shape="typical", chunk_size=50, worker_counts=None, out=sys.stdout):
+    """
+    Time the serial path and each pool size, checking their output matches.
+
+    Returns:
+        dict: Seconds taken by "thread" and each "process xN" mode
+    """
+    os.environ["SANITIZE_CACHE_ENTRIES"] = "0"
+    backend = default_parser_backend()
+    record_schema = load_record_schema()
+    lines = generate_lines(articles, shape)
+    worker_counts = worker_counts or sorted({1, 2, available_cpus()})
+
+    serial = ArticleParser(CONTENT_FIELD, HTMLSanitizer(backend, cache=SanitizeCache(max_entries=0)),
+                           RecordValidator.from_json(record_schema, CONTENT_FIELD))
+    start = time.perf_counter()
+    expected = serial.parse_lines(lines)
+    baseline = time.perf_counter() - start
+    timings = {"thread": baseline}
+    print(f"{len(lines)} {shape} articles, {available_cpus()} CPUs, backend {backend}", file=out)
+    print(f"{'mode':<16}{'seconds':>10}{'articles/s':>12}{'speedup':>9}", file=out)
+    print(f"{'thread':<16}{baseline:>10.2f}{len(lines) / baseline:>12.0f}{1.0:>8.1f}x", file=out)
+
+    for workers in worker_counts:
+        pool = WorkerPool(workers)
+        try:
+            # Warm the workers so process start-up is not timed, as on a warm Lambda
+            list(pool.imap(parse_lines_task, [(CONTENT_FIELD, backend, record_schema, lines[:1])] * workers))
+            start = time.perf_counter()
+            result = [
+                article
+                for articles, _ in pool.imap(parse_lines_task, ((CONTENT_FIELD, backend, record_schema, chunk)
+                                                                for chunk in chunks(lines, chunk_size)))
+                for article in articles
+            ]
+            elapsed = time.perf_counter() - start
+        finally:
+            pool.close()
+        assert result == expected, "process pool output differs from the serial path"
+        timings[f"process x{workers}"] = elapsed
+        print(f"{'process x' + str(workers):<16}{elapsed:>10.2f}{len(lines) / elapsed:>12.0f}{baseline / elapsed:>8.1f}x",
+              file=out)
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--articles", type=int, default=400)
+    parser.add_argument("--shape", choices=ARTICLE_SHAPES, default="typical")
+    parser.add_argument("--chunk-size", type=int, default=50)
+    parser.add_argument("--workers", default=None, help="comma separated pool sizes")
+    args = parser.parse_args()
+
+    worker_counts = [int(w) for w in args.workers.split(",")] if args.workers else None
+    run(args.articles, args.shape, args.chunk_size, worker_counts)
+
+if __name__ == "__main__":
+    main()
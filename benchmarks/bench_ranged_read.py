@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""Benchmark reading a large export file as one stream against parallel
+ranged GETs (RANGE_THRESHOLD / RANGE_PART_SIZE) and against spilling it to
+/tmp with the same parallel GETs and memory-mapping it (SPILL_THRESHOLD).
+
+S3 is simulated: every GET pays a first-byte latency and each connection is
+throttled to a fixed bandwidth, which is what caps a single-stream read in
+Lambda. Only the download and line splitting are timed, not sanitization.
+
+Usage: python benchmarks/bench_ranged_read.py [--mb 64] [--stream-mbps 80] [--latency-ms 30]
+"""
+
+import argparse
+import io
+import os
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "connect_q_cdk", "lambdas", "kb_content_parser"))
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+from s3_manager import S3Manager
+
+class ThrottledBody:
+    def __init__(self, data, bytes_per_second, on_close=lambda: None):
+        self._data = data
+        self._bytes_per_second = bytes_per_second
+        self._on_close = on_close
+
+    def read(self):
+        time.sleep(len(self._data) / self._bytes_per_second)
+        self._on_close()
+        return self._data
+
+    def iter_chunks(self, chunk_size=1024):
+        try:
+            for offset in range(0, len(self._data), chunk_size):
+                chunk = self._data[offset:offset + chunk_size]
+                time.sleep(len(chunk) / self._bytes_per_second)
+                yield chunk
+        finally:
+            self._on_close()
+
+    @property
+    def _raw_stream(self):
+        chunk = 1024 * 1024
+        for offset in range(0, len(self._data), chunk):
+            time.sleep(min(chunk, len(self._data) - offset) / self._bytes_per_second)
+        self._on_close()
+        return io.BytesIO(self._data)
+
+class SimulatedS3:
+    def __init__(self, data, bytes_per_second, latency):
+        self.data = data
+        self.bytes_per_second = bytes_per_second
+        self.latency = latency
+        # Bodies being read, to check how many parts are in flight at once
+        self.open_bodies = 0
+        self.peak_open_bodies = 0
+        self._lock = threading.Lock()
+
+    def get_object(self, Bucket, Key, Range=None, **kwargs):
+        time.sleep(self.latency)
+        data = self.data
+        if Range:
+            first, last = map(int, Range[len("bytes="):].split("-"))
+            data = data[first:last + 1]
+        with self._lock:
+            self.open_bodies += 1
+            self.peak_open_bodies = max(self.peak_open_bodies, self.open_bodies)
+        return {"Body": ThrottledBody(data, self.bytes_per_second, self._close_body), "ETag": '"bench"'}
+
+    def _close_body(self):
+        with self._lock:
+            self.open_bodies -= 1
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mb", type=int, default=64, help="export file size")
+    parser.add_argument("--stream-mbps", type=float, default=80.0, help="throughput of one connection, MB/s")
+    parser.add_argument("--latency-ms", type=float, default=30.0, help="first-byte latency per GET")
+    args = parser.parse_args()
+
+    line = b'{"Id": "ka0", "Title": "t", "Content__c": "' + b"x" * 2000 + b'"}\n'
+    data = line * (args.mb * 1024 * 1024 // len(line))
+    client = SimulatedS3(data, args.stream_mbps * 1024 * 1024, args.latency_ms / 1000)
+
+    print(f"{'mode':<28}{'seconds':>9}{'MB/s':>9}{'peak GETs':>11}")
+    for label, threads, part_mb in [("single stream", 10, 0), ("ranged 8 MB x 4", 4, 8),
+                                    ("ranged 8 MB x 10", 10, 8), ("ranged 16 MB x 10", 10, 16),
+                                    ("spill 8 MB x 10", 10, -8)]:  # negative: spill with parts of that size
+        manager = S3Manager({"BATCH_SIZE": 25, "MAX_THREADS": threads, "LOB_MAPPING": "",
+                             "RANGE_PART_SIZE": max(abs(part_mb), 1) * 1024 * 1024}, s3_client=client)
+        client.peak_open_bodies = 0
+        started = time.perf_counter()
+        if part_mb < 0:
+            # Count raw lines rather than sanitizing them
+            manager.article_parser.parse_line = lambda line, stats=None: line
+            manager.spill_budget.reserve(len(data))
+            lines = sum(1 for _ in manager.iter_spilled("bench", "export.jsonl", len(data)))
+        elif part_mb:
+            lines = sum(1 for _ in manager.iter_ranged_lines("bench", "export.jsonl", len(data)))
+        else:
+            lines = sum(1 for _ in client.get_object(Bucket="bench", Key="export.jsonl")["Body"]._raw_stream)
+        elapsed = time.perf_counter() - started
+        manager.close()
+        assert lines == data.count(b"\n")
+        print(f"{label:<28}{elapsed:>9.2f}{len(data) / 1024 / 1024 / elapsed:>9.1f}{client.peak_open_bodies:>11}")
+
+if __name__ == "__main__":
+    main()
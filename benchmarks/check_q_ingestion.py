@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""Check that a deployed Amazon Q in Connect knowledge base still ingests HTML
+uploaded with an OUTPUT_ENCODING other than identity.
+
+Uploads a marker article to a LOB output bucket the way S3Manager does, waits
+for AppIntegrations to sync it into the knowledge base, then downloads the
+ingested document and checks that it reads as HTML rather than compressed
+bytes. The test object is deleted afterwards. Needs credentials for the
+deployed stack; it cannot run offline.
+
+Usage: python benchmarks/check_q_ingestion.py --bucket BUCKET --knowledge-base-id ID [--encoding gzip] [--timeout 900]
+"""
+
+import argparse
+import os
+import sys
+import time
+import urllib.request
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "connect_q_cdk", "lambdas", "kb_content_parser"))
+
+import boto3
+from s3_manager import CONTENT_DIGEST_METADATA_KEY, compress_html, content_digest
+
+def find_content(qconnect, knowledge_base_id, key):
+    paginator = qconnect.get_paginator("list_contents")
+    for page in paginator.paginate(knowledgeBaseId=knowledge_base_id):
+        for summary in page["contentSummaries"]:
+            if key in (summary.get("name"), summary.get("title")) or key in summary.get("name", ""):
+                return summary
+    return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--bucket", required=True, help="LOB output bucket feeding the knowledge base")
+    parser.add_argument("--knowledge-base-id", required=True)
+    parser.add_argument("--encoding", choices=("gzip", "br"), default="gzip")
+    parser.add_argument("--timeout", type=int, default=900, help="seconds to wait for ingestion")
+    args = parser.parse_args()
+
+    marker = f"encoding-check-{uuid.uuid4().hex[:12]}"
+    key = f"{marker}.html"
+    html = f"<h1>{marker}</h1><p>Compatibility check for Content-Encoding {args.encoding}.</p>"
+
+    s3 = boto3.client("s3")
+    qconnect = boto3.client("qconnect")
+    s3.put_object(
+        Bucket=args.bucket,
+        Key=key,
+        Body=compress_html(html, args.encoding),
+        Metadata={CONTENT_DIGEST_METADATA_KEY: content_digest(html, args.encoding)},
+        ContentType="text/html",
+        ContentEncoding=args.encoding,
+    )
+    print(f"Uploaded s3://{args.bucket}/{key} with Content-Encoding {args.encoding}; waiting for ingestion")
+
+    try:
+        deadline = time.time() + args.timeout
+        summary = None
+        while time.time() < deadline:
+            summary = find_content(qconnect, args.knowledge_base_id, marker)
+            if summary and summary["status"] not in ("CREATE_IN_PROGRESS", "UPDATE_IN_PROGRESS"):
+                break
+            time.sleep(30)
+
+        if summary is None:
+            print("FAIL: the document never appeared in the knowledge base")
+            return 1
+        if summary["status"] != "ACTIVE":
+            print(f"FAIL: ingestion finished with status {summary['status']}")
+            return 1
+
+        content = qconnect.get_content(knowledgeBaseId=args.knowledge_base_id, contentId=summary["contentId"])["content"]
+        with urllib.request.urlopen(content["url"]) as response:
+            ingested = response.read()
+        if marker.encode("utf-8") not in ingested:
+            print(f"FAIL: ingested document does not contain the marker text ({len(ingested)} bytes, "
+                  f"starts {ingested[:16]!r})")
+            return 1
+        print(f"PASS: knowledge base ingested the {args.encoding} document as readable HTML")
+        return 0
+    finally:
+        s3.delete_object(Bucket=args.bucket, Key=key)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""Replay SQS-wrapped S3 events through lambda_handler against an in-process
+S3 stand-in, to tune BATCH_SIZE / MAX_THREADS and validate parser changes
+without an AWS account.
+
+Synthetic export files are written to the import bucket, one per LOB in turn,
+and delivered as S3 ObjectCreated notifications batched into SQS events the
+way the event source mapping invokes the function. LocalS3 adds per-request
+latency, per-connection bandwidth and a request rate above which S3 answers
+SlowDown (retried with jittered backoff as botocore does, then raised).
+
+INPUT_BUCKET is the import bucket, as in the stack, so checkpoints and
+tombstones are kept under its CHECKPOINT_PREFIX; --env INPUT_BUCKET= turns
+both off.
+
+Reports end-to-end files/s and records/s, S3 calls per operation, throttled
+requests, the successful/failed/skipped counts and batchItemFailures the
+controller returned, and the stage metrics it would have emitted as EMF.
+--replays 2 delivers the same events again to a warm function, where
+unchanged articles are skipped from cached versions without HEAD requests;
+only deletes look up again objects cached as absent. With --rate-limit, the
+S3Write* stages show the adaptive write limiter backing off, e.g.
+--rate-limit 60 --env S3_MAX_CONCURRENCY=30.
+
+Usage: python benchmarks/e2e_harness.py [--files 8] [--articles 100] [--shape small]
+           [--batch-size 25] [--max-threads 10] [--object-concurrency 4] [--sqs-batch-size 10]
+           [--latency-ms 20] [--bandwidth-mbps 80] [--rate-limit 0] [--replays 1]
+           [--env KEY=VALUE ...] [--output results.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "connect_q_cdk", "lambdas", "kb_content_parser"))
+
+from benchmarks.local_s3 import LocalS3
+from metrics import InMemorySink
+from benchmarks.synthetic_articles import ARTICLE_SHAPES, generate_export_lines
+
+IMPORT_BUCKET = "kb-import"
+
+class LambdaContext:
+    """The parts of the Lambda context object a handler may read."""
+
+    def __init__(self, timeout_seconds):
+        self.function_name = "kb-content-parser"
+        self.aws_request_id = "local"
+        self._deadline = time.monotonic() + timeout_seconds
+
+    def get_remaining_time_in_millis(self):
+        return max(0, int((self._deadline - time.monotonic()) * 1000))
+
+def s3_notification(bucket, key, size):
+    return {"Records": [{
+        "eventSource": "aws:s3",
+        "eventName": "ObjectCreated:Put",
+        "s3": {"bucket": {"name": bucket}, "object": {"key": key, "size": size}},
+    }]}
+
+def sqs_events(keys, sizes, sqs_batch_size):
+    messages = [
+        {"messageId": f"msg-{index}", "body": json.dumps(s3_notification(IMPORT_BUCKET, key, sizes[key]))}
+        for index, key in enumerate(keys)
+    ]
+    return [{"Records": messages[i:i + sqs_batch_size]} for i in range(0, len(messages), sqs_batch_size)]
+
+def stage_summary(documents):
+    """Totals of counters and p50/p95/max of timings across the EMF documents."""
+    totals, observations = {}, {}
+    for document in documents:
+        for directive in document["_aws"]["CloudWatchMetrics"]:
+            for metric in directive["Metrics"]:
+                value = document[metric["Name"]]
+                if isinstance(value, list):
+                    observations.setdefault(metric["Name"], []).extend(value)
+                else:
+                    totals[metric["Name"]] = totals.get(metric["Name"], 0) + value
+    summary = {name: {"total": total} for name, total in totals.items()}
+    for name, values in observations.items():
+        values.sort()
+        summary[name] = {"count": len(values), "p50": values[len(values) // 2],
+                         "p95": values[min(len(values) - 1, int(len(values) * 0.95))], "max": values[-1]}
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=8, help="export files to deliver")
+    parser.add_argument("--articles", type=int, default=100, help="articles per file")
+    parser.add_argument("--shape", choices=sorted(ARTICLE_SHAPES), default="small")
+    parser.add_argument("--archived-ratio", type=float, default=0.1)
+    parser.add_argument("--lobs", default="credit,auto,payment")
+    parser.add_argument("--batch-size", type=int, default=25)
+    parser.add_argument("--max-threads", type=int, default=10)
+    parser.add_argument("--object-concurrency", type=int, default=4)
+    parser.add_argument("--sqs-batch-size", type=int, default=10, help="messages per invocation")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="added to every S3 request")
+    parser.add_argument("--bandwidth-mbps", type=float, default=80.0, help="per connection, MB/s; 0 for unlimited")
+    parser.add_argument("--rate-limit", type=float, default=0, help="S3 requests/s before SlowDown; 0 for unlimited")
+    parser.add_argument("--replays", type=int, default=1, help="times the same events are delivered")
+    parser.add_argument("--timeout", type=int, default=300, help="function timeout seconds for the context")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra function environment, e.g. SANITIZE_MODE=process")
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args()
+
+    s3 = LocalS3(latency=args.latency_ms / 1000, bandwidth=args.bandwidth_mbps * 1024 * 1024,
+                 rate_limit=args.rate_limit)
+    lobs = [lob.strip() for lob in args.lobs.split(",") if lob.strip()]
+    os.environ.update({
+        "AWS_DEFAULT_REGION": "us-east-1",
+        "LOB_MAPPING": ",".join(f"{lob}-kb:{lob}-bucket" for lob in lobs),
+        "INPUT_BUCKET": IMPORT_BUCKET,
+        "BATCH_SIZE": str(args.batch_size),
+        "MAX_THREADS": str(args.max_threads),
+        "OBJECT_CONCURRENCY": str(args.object_concurrency),
+        **dict(item.split("=", 1) for item in args.env),
+    })
+
+    keys, sizes, records = [], {}, 0
+    for index in range(args.files):
+        lines = generate_export_lines(args.articles, seed=index, archived_ratio=args.archived_ratio,
+                                      first_id=index * args.articles, **ARTICLE_SHAPES[args.shape])
+        key = f"{lobs[index % len(lobs)]}-kb/export-{index:04d}.jsonl"
+        data = b"".join(lines)
+        s3.put(IMPORT_BUCKET, key, data)
+        keys.append(key)
+        sizes[key] = len(data)
+        records += len(lines)
+
+    # Stage metrics are collected instead of written to stdout as EMF
+    with mock.patch("boto3.client", return_value=s3), mock.patch("metrics.StdoutSink", InMemorySink):
+        import lambda_function
+
+        replays = []
+        for replay in range(args.replays):
+            s3.calls.clear()
+            s3.throttled.clear()
+            if lambda_function._manager is not None:
+                lambda_function._manager.metrics.sink.documents.clear()
+            totals = {"successful": 0, "failed": 0, "skipped": 0, "batch_item_failures": 0, "invocations": 0}
+            started = time.perf_counter()
+            for event in sqs_events(keys, sizes, args.sqs_batch_size):
+                response = lambda_function.lambda_handler(event, LambdaContext(args.timeout))
+                body = json.loads(response["body"])
+                for name in ("successful", "failed", "skipped"):
+                    totals[name] += body.get(name, 0)
+                totals["batch_item_failures"] += len(response.get("batchItemFailures", []))
+                totals["invocations"] += 1
+            elapsed = time.perf_counter() - started
+            replays.append({
+                "replay": replay + 1,
+                "seconds": elapsed,
+                "files_per_s": len(keys) / elapsed,
+                "records_per_s": records / elapsed,
+                **totals,
+                "s3_calls": dict(s3.calls),
+                "s3_throttled": dict(s3.throttled),
+                "stages": stage_summary(lambda_function._manager.metrics.sink.documents),
+            })
+        if lambda_function._manager is not None:
+            lambda_function._manager.close()
+
+    print(f"{len(keys)} files, {records} records, {sum(sizes.values()) / 1024 / 1024:.1f} MB; "
+          f"BATCH_SIZE={args.batch_size} MAX_THREADS={args.max_threads} OBJECT_CONCURRENCY={args.object_concurrency}")
+    print(f"{'replay':<8}{'seconds':>9}{'files/s':>9}{'records/s':>11}{'ok':>7}{'failed':>8}{'skipped':>9}"
+          f"{'retried msgs':>14}  S3 calls (throttled)")
+    for result in replays:
+        calls = ", ".join(
+            f"{operation} {count}" + (f" ({result['s3_throttled'][operation]})" if operation in result["s3_throttled"] else "")
+            for operation, count in sorted(result["s3_calls"].items())
+        )
+        print(f"{result['replay']:<8}{result['seconds']:>9.2f}{result['files_per_s']:>9.2f}{result['records_per_s']:>11.1f}"
+              f"{result['successful']:>7}{result['failed']:>8}{result['skipped']:>9}{result['batch_item_failures']:>14}  {calls}")
+
+    for result in replays:
+        print(f"\nreplay {result['replay']} stages (all LOBs)")
+        for name, summary in sorted(result["stages"].items()):
+            print(f"  {name:<28}" + "  ".join(f"{stat} {value:,.1f}" for stat, value in summary.items()))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"params": vars(args), "files": len(keys), "records": records, "replays": replays}, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
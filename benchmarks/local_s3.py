@@ -0,0 +1,155 @@
+"""In-process stand-in for the S3 client calls the kb_content_parser Lambda makes,
+with injectable request latency, per-connection bandwidth and throttling."""
+
+import collections
+import hashlib
+import io
+import random
+import threading
+import time
+
+from botocore.exceptions import ClientError
+
+class LocalS3:
+    """Thread-safe in-memory buckets implementing get/head/put/copy_object, delete_objects and
+    list_objects_v2 pagination.
+
+    Args:
+        latency: Seconds added to every request before it is served
+        bandwidth: Bytes per second of a single GET or PUT body (0 for unlimited)
+        rate_limit: Requests per second served before S3 answers SlowDown (0 for unlimited)
+        max_attempts: Attempts per request, as botocore's retry handler makes, before SlowDown is raised
+        seed: Random seed for retry jitter
+    """
+
+    def __init__(self, latency=0.0, bandwidth=0, rate_limit=0, max_attempts=3, seed=0):
+        self.objects = {}
+        self.metadata = {}
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.rate_limit = rate_limit
+        self.max_attempts = max_attempts
+        self.calls = collections.Counter()
+        self.throttled = collections.Counter()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._tokens = float(rate_limit)
+        self._refilled = time.monotonic()
+
+    def put(self, bucket, key, data):
+        """Store an object directly, without latency or call counting."""
+        with self._lock:
+            self.objects[(bucket, key)] = data
+
+    def _etag(self, bucket, key):
+        return '"%s"' % hashlib.md5(self.objects[(bucket, key)]).hexdigest()
+
+    def _take_token(self):
+        if not self.rate_limit:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.rate_limit, self._tokens + (now - self._refilled) * self.rate_limit)
+            self._refilled = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def _request(self, operation, size=0):
+        """Count the call and wait out latency, throttling retries and transfer time."""
+        with self._lock:
+            self.calls[operation] += 1
+        for attempt in range(self.max_attempts):
+            time.sleep(self.latency)
+            if self._take_token():
+                break
+            with self._lock:
+                self.throttled[operation] += 1
+                delay = self._rng.uniform(0, min(20, 2 ** attempt))
+            if attempt == self.max_attempts - 1:
+                raise ClientError({"Error": {"Code": "SlowDown", "Message": "Please reduce your request rate."},
+                                   "ResponseMetadata": {"HTTPStatusCode": 503}}, operation)
+            # botocore's standard retry mode: full jitter, base 1s, capped at 20s
+            time.sleep(delay)
+        if self.bandwidth and size:
+            time.sleep(size / self.bandwidth)
+
+    def get_object(self, Bucket, Key, Range=None, **kwargs):
+        with self._lock:
+            data = self.objects.get((Bucket, Key))
+            etag = self._etag(Bucket, Key) if data is not None else None
+        if data is None:
+            self._request("GetObject")
+            raise ClientError({"Error": {"Code": "NoSuchKey", "Message": "The specified key does not exist."}}, "GetObject")
+        if Range:
+            first, _, last = Range[len("bytes="):].partition("-")
+            data = data[int(first):int(last) + 1 if last else None]
+        self._request("GetObject", len(data))
+        body = io.BytesIO(data)
+        iter_chunks = lambda chunk_size=1024: iter(lambda: body.read(chunk_size), b"")
+        return {"Body": type("Body", (), {"_raw_stream": body, "read": body.read,
+                                          "iter_chunks": staticmethod(iter_chunks)})(),
+                "ETag": etag, "ContentLength": len(data)}
+
+    def head_object(self, Bucket, Key, **kwargs):
+        self._request("HeadObject")
+        with self._lock:
+            if (Bucket, Key) not in self.objects:
+                raise ClientError({"Error": {"Code": "404", "Message": "Not Found"}}, "HeadObject")
+            return {"ETag": self._etag(Bucket, Key), "Metadata": dict(self.metadata.get((Bucket, Key), {})),
+                    "ContentLength": len(self.objects[(Bucket, Key)])}
+
+    def put_object(self, Bucket, Key, Body, Metadata=None, IfMatch=None, IfNoneMatch=None, **kwargs):
+        data = Body if isinstance(Body, bytes) else Body.encode("utf-8")
+        self._request("PutObject", len(data))
+        with self._lock:
+            exists = (Bucket, Key) in self.objects
+            if (IfNoneMatch == "*" and exists) or (IfMatch and (not exists or self._etag(Bucket, Key) != IfMatch)):
+                raise ClientError({"Error": {"Code": "PreconditionFailed",
+                                             "Message": "At least one of the pre-conditions you specified did not hold"}},
+                                  "PutObject")
+            self.objects[(Bucket, Key)] = data
+            self.metadata[(Bucket, Key)] = dict(Metadata or {})
+            return {"ETag": self._etag(Bucket, Key)}
+
+    def copy_object(self, Bucket, Key, CopySource, Metadata=None, CopySourceIfMatch=None, **kwargs):
+        self._request("CopyObject")
+        with self._lock:
+            source = (CopySource["Bucket"], CopySource["Key"])
+            if source not in self.objects:
+                raise ClientError({"Error": {"Code": "NoSuchKey", "Message": "The specified key does not exist."}},
+                                  "CopyObject")
+            if CopySourceIfMatch and self._etag(*source) != CopySourceIfMatch:
+                raise ClientError({"Error": {"Code": "PreconditionFailed",
+                                             "Message": "At least one of the pre-conditions you specified did not hold"}},
+                                  "CopyObject")
+            self.objects[(Bucket, Key)] = self.objects[source]
+            self.metadata[(Bucket, Key)] = dict(Metadata or {})
+            return {"CopyObjectResult": {"ETag": self._etag(Bucket, Key)}}
+
+    def get_paginator(self, operation):
+        assert operation == "list_objects_v2", operation
+        return self
+
+    def paginate(self, Bucket, Prefix="", **kwargs):
+        """list_objects_v2 pages of up to 1000 keys."""
+        with self._lock:
+            keys = sorted(key for bucket, key in self.objects if bucket == Bucket and key.startswith(Prefix))
+        for start in range(0, max(len(keys), 1), 1000):
+            self._request("ListObjectsV2")
+            page = keys[start:start + 1000]
+            yield {"Contents": [{"Key": key} for key in page]} if page else {"KeyCount": 0}
+
+    def delete_objects(self, Bucket, Delete, **kwargs):
+        self._request("DeleteObjects")
+        errors = []
+        with self._lock:
+            for obj in Delete["Objects"]:
+                key = obj["Key"]
+                if "ETag" in obj and (Bucket, key) in self.objects and self._etag(Bucket, key) != obj["ETag"]:
+                    errors.append({"Key": key, "Code": "PreconditionFailed", "Message": "Precondition Failed"})
+                else:
+                    self.objects.pop((Bucket, key), None)
+                    self.metadata.pop((Bucket, key), None)
+        return {"Errors": errors} if errors else {}
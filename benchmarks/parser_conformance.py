@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Compare HTMLSanitizer parser backends against the html.parser reference.
+
+For every installed backend, reports how many corpus documents sanitize to
+byte-identical output, how many only differ in whitespace, and the mean
+time per document. The corpus is the synthetic article shapes plus markup
+quirks seen in Salesforce rich text (Word paste, unclosed tags, entities).
+
+Usage: python benchmarks/parser_conformance.py [--articles N]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "connect_q_cdk", "lambdas", "kb_content_parser"))
+
+from html_sanitizer import HTML_PARSER, HTMLSanitizer, available_parser_backends
+from benchmarks.synthetic_articles import ARTICLE_SHAPES, generate_article_html
+
+QUIRKS = [
+    '<p class="MsoNormal"><o:p></o:p>Word&nbsp;paste<o:p>&nbsp;</o:p></p>',
+    '<p>unclosed<p>paragraphs<li>and items',
+    '<div><span>mis</div>nested</span>',
+    '<table><tr><td>no tbody</td></tr></table>',
+    '<b>bold <i>italic</b> tail</i>',
+    '<p>&#150; &#8217; &copy; &unknown; &amp;</p>',
+    '<![CDATA[raw]]><!-- note --><p>after</p>',
+    '<script>var a = 1 < 2 && 3 > 2;</script>',
+    '  \n  <p>leading whitespace</p>  \n',
+    '<br></br><img src="/a.png"></img>',
+]
+
+def build_corpus(articles: int):
+    rng = random.Random(2024)
+    corpus = [generate_article_html(rng, **ARTICLE_SHAPES[shape])
+              for shape in ARTICLE_SHAPES for _ in range(articles)]
+    return corpus + QUIRKS
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--articles", type=int, default=3, help="articles per shape")
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.articles)
+    reference = [HTMLSanitizer(HTML_PARSER).sanitize_html(html) for html in corpus]
+
+    print(f"{len(corpus)} documents ({len(QUIRKS)} markup quirks)")
+    print(f"{'backend':<12}{'identical':>11}{'whitespace':>12}{'different':>11}{'ms/doc':>10}")
+    for backend in available_parser_backends():
+        sanitizer = HTMLSanitizer(backend)
+        identical = whitespace = different = 0
+        started = time.perf_counter()
+        outputs = [sanitizer.sanitize_html(html) for html in corpus]
+        elapsed = time.perf_counter() - started
+        for expected, actual in zip(reference, outputs):
+            if actual == expected:
+                identical += 1
+            elif actual.split() == expected.split():
+                whitespace += 1
+            else:
+                different += 1
+        print(f"{backend:<12}{identical:>11}{whitespace:>12}{different:>11}{elapsed / len(corpus) * 1000:>10.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""Offline benchmark suite for the kb_content_parser hot path.
+
+Generates a synthetic Knowledge__kav export and times, each in a fresh
+process so peak RSS is per benchmark:
+
+  sanitize_html     HTMLSanitizer.sanitize_html on every article body
+  validate_article  S3Manager.validate_article on every decoded line
+  read_s3_object    S3Manager.read_s3_object from an in-memory S3 client
+                    (decode, validate and sanitize every line)
+
+and reports records/s, MB/s of export input and peak RSS. The sanitize cache
+is disabled so every body is sanitized. Results are written as JSON (to
+benchmarks/results/<commit>.json by default); --compare prints the change
+against an earlier results file and flags regressions beyond --tolerance.
+
+Usage: python benchmarks/run_suite.py [--articles 200] [--paragraphs 30] [--tables 6] [--rows 20]
+           [--image-every 5] [--archived-ratio 0.1] [--repeat 3] [--only NAME]
+           [--output PATH] [--compare BASELINE.json] [--tolerance 0.1]
+"""
+
+import argparse
+import datetime
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "connect_q_cdk", "lambdas", "kb_content_parser"))
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+CONTENT_FIELD = "Content__c"
+
+class InMemoryS3:
+    """Serves a single export object the way S3Manager.iter_s3_object reads it."""
+
+    def __init__(self, data):
+        self.data = data
+
+    def get_object(self, Bucket, Key, **kwargs):
+        return {"Body": type("Body", (), {"_raw_stream": io.BytesIO(self.data)})()}
+
+def build_manager(data=b""):
+    from s3_manager import S3Manager
+    return S3Manager({"BATCH_SIZE": 25, "MAX_THREADS": 1, "LOB_MAPPING": "",
+                      "RANGE_THRESHOLD": 0, "SPILL_THRESHOLD": 0}, s3_client=InMemoryS3(data))
+
+def bench_sanitize_html(lines):
+    from html_sanitizer import HTMLSanitizer
+    sanitizer = HTMLSanitizer(cache=None)
+    bodies = [json.loads(line)[CONTENT_FIELD] for line in lines]
+    started = time.perf_counter()
+    for body in bodies:
+        sanitizer.sanitize_html(body)
+    return time.perf_counter() - started
+
+def bench_validate_article(lines, passes=200):
+    # A single pass is too short to time reliably; report the mean per pass
+    manager = build_manager()
+    articles = [json.loads(line) for line in lines]
+    started = time.perf_counter()
+    for _ in range(passes):
+        for article in articles:
+            manager.validate_article(article)
+    elapsed = time.perf_counter() - started
+    manager.close()
+    return elapsed / passes
+
+def bench_read_s3_object(lines):
+    manager = build_manager(b"".join(lines))
+    started = time.perf_counter()
+    records = manager.read_s3_object("bench", "bench-kb/export.jsonl")
+    elapsed = time.perf_counter() - started
+    manager.close()
+    assert len(records) == len(lines)
+    return elapsed
+
+BENCHMARKS = {
+    "sanitize_html": bench_sanitize_html,
+    "validate_article": bench_validate_article,
+    "read_s3_object": bench_read_s3_object,
+}
+
+def export_lines(args):
+    from benchmarks.synthetic_articles import generate_export_lines
+    return generate_export_lines(
+        args.articles, seed=args.seed, archived_ratio=args.archived_ratio, content_field=CONTENT_FIELD,
+        paragraphs=args.paragraphs, tables=args.tables, rows=args.rows, columns=args.columns,
+        image_every=args.image_every
+    )
+
+def run_child(name, args):
+    """Run one benchmark in this process and print its result as JSON."""
+    lines = export_lines(args)
+    seconds = min(BENCHMARKS[name](lines) for _ in range(args.repeat))
+    size = sum(len(line) for line in lines)
+    print(json.dumps({
+        "records": len(lines),
+        "bytes": size,
+        "seconds": seconds,
+        "records_per_s": len(lines) / seconds,
+        "mb_per_s": size / 1024 / 1024 / seconds,
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }))
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, False
+
+def compare(results, baseline, tolerance):
+    """Print the change from baseline; returns the names of regressed benchmarks."""
+    if baseline["params"] != results["params"]:
+        print("warning: baseline was run with different parameters")
+    regressions = []
+    print(f"\n{'benchmark':<20}{'records/s':>12}{'baseline':>12}{'change':>9}{'peak RSS MB':>13}{'baseline':>10}")
+    for name, result in results["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+        speed = result["records_per_s"] / before["records_per_s"] - 1
+        memory = result["peak_rss_mb"] / before["peak_rss_mb"] - 1
+        flag = ""
+        if speed < -tolerance or memory > tolerance:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<20}{result['records_per_s']:>12.1f}{before['records_per_s']:>12.1f}{speed:>+8.1%}"
+              f"{result['peak_rss_mb']:>13.1f}{before['peak_rss_mb']:>10.1f}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles", type=int, default=200)
+    parser.add_argument("--paragraphs", type=int, default=30, help="styled paragraphs per body")
+    parser.add_argument("--tables", type=int, default=6, help="tables per body")
+    parser.add_argument("--rows", type=int, default=20, help="rows per table")
+    parser.add_argument("--columns", type=int, default=5, help="cells per row")
+    parser.add_argument("--image-every", type=int, default=5, help="an image after every N paragraphs, 0 for none")
+    parser.add_argument("--archived-ratio", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark; the fastest is kept")
+    parser.add_argument("--only", choices=sorted(BENCHMARKS), action="append", help="run only these benchmarks")
+    parser.add_argument("--output", help="results file (default benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="relative change reported as a regression")
+    parser.add_argument("--child", choices=sorted(BENCHMARKS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    params = {name: getattr(args, name) for name in
+              ("articles", "paragraphs", "tables", "rows", "columns", "image_every", "archived_ratio", "seed", "repeat")}
+    if args.child:
+        run_child(args.child, args)
+        return 0
+
+    commit, dirty = git_commit()
+    results = {
+        "suite": "kb_content_parser",
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "dirty": dirty,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "params": params,
+        "results": {},
+    }
+    # Every body must be sanitized, not served from the shared cache
+    env = {**os.environ, "SANITIZE_CACHE_ENTRIES": "0", "SANITIZE_CACHE_DIR": "", "AWS_DEFAULT_REGION": "us-east-1"}
+    child_args = [f"--{name.replace('_', '-')}={value}" for name, value in params.items()]
+
+    print(f"{'benchmark':<20}{'records':>9}{'MB':>8}{'seconds':>10}{'records/s':>12}{'MB/s':>9}{'peak RSS MB':>13}")
+    for name in args.only or BENCHMARKS:
+        completed = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", name, *child_args],
+                                   env=env, capture_output=True, text=True)
+        if completed.returncode != 0:
+            print(f"{name} failed:\n{completed.stderr}", file=sys.stderr)
+            return 1
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        results["results"][name] = result
+        print(f"{name:<20}{result['records']:>9}{result['bytes'] / 1024 / 1024:>8.1f}{result['seconds']:>10.3f}"
+              f"{result['records_per_s']:>12.1f}{result['mb_per_s']:>9.2f}{result['peak_rss_mb']:>13.1f}")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit or 'unknown'}{'-dirty' if dirty else ''}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
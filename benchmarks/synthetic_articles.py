@@ -0,0 +1,83 @@
+"""Synthetic Salesforce Knowledge article bodies and export files for benchmarks."""
+
+import json
+import random
+from typing import List
+
+def generate_article_html(rng: random.Random, paragraphs: int = 30, tables: int = 6,
+                          rows: int = 20, columns: int = 5, image_every: int = 5) -> str:
+    """Generate a Content__c-like HTML body with rich-text editor markup.
+
+    Args:
+        rng: Random source, so corpora are reproducible
+        paragraphs: Number of styled paragraphs
+        tables: Number of tables appended after the paragraphs
+        rows: Rows per table
+        columns: Cells per row
+        image_every: Emit an image after every N paragraphs (0 disables images)
+
+    Returns:
+        str: The generated HTML body
+    """
+    parts = []
+    for p in range(paragraphs):
+        word = rng.choice(("account", "payment", "card", "loan", "policy", "claim"))
+        parts.append(
+            f'<p style="margin:0in;font-family:Calibri" class="MsoNormal">Step {p}:&nbsp;review the '
+            f'<b>{word}</b> details in <a href="https://kb.example.com/articles/{word}-{p}" '
+            f'target="_blank" rel="noopener noreferrer" class="kb-link">this article</a>\n'
+            f'and confirm the {word}\xa0status &amp; history.</p>\n'
+        )
+        if image_every and p % image_every == 0:
+            parts.append(
+                f'<img src="https://kb.example.com/img/{p}.png" alt="Figure {p}" width="640" '
+                f'height="480" style="border:0" title="Figure {p}">\n'
+            )
+    for _ in range(tables):
+        parts.append('<table border="0" cellpadding="4" cellspacing="0" style="width:100%" class="kb-table"><tbody>\n')
+        for r in range(rows):
+            cells = ''.join(
+                f'<td style="border:1px solid #ccc;padding:2px" valign="top">r{r}c{c} <b>{rng.randint(0, 9999)}</b></td>'
+                for c in range(columns)
+            )
+            parts.append(f'<tr>{cells}</tr>\n')
+        parts.append('</tbody></table>\n')
+    return ''.join(parts)
+
+# Named article shapes roughly matching the small/typical/large bodies seen in exports
+ARTICLE_SHAPES = {
+    "small": dict(paragraphs=8, tables=1, rows=5),
+    "typical": dict(paragraphs=30, tables=6, rows=20),
+    "large": dict(paragraphs=120, tables=25, rows=40),
+}
+
+def generate_export_lines(count: int, seed: int = 42, archived_ratio: float = 0.1,
+                          content_field: str = "Content__c", first_id: int = 0, **html_params) -> List[bytes]:
+    """Generate an AppFlow Knowledge__kav export as JSON Lines.
+
+    Args:
+        count: Number of articles
+        seed: Random seed, so exports are reproducible
+        archived_ratio: Fraction of articles exported as Archived rather than Online
+        content_field: Name of the rich text content field
+        first_id: Number of the first article, so several exports can cover distinct articles
+        **html_params: Passed to generate_article_html (paragraphs, tables, rows, columns, image_every)
+
+    Returns:
+        List[bytes]: One UTF-8 encoded line per article, each ending in a newline
+    """
+    rng = random.Random(seed)
+    lines = []
+    for i in range(first_id, first_id + count):
+        archived = rng.random() < archived_ratio
+        lines.append((json.dumps({
+            "Id": f"ka0{i:05d}",
+            "LastModifiedDate": f"2024-05-{1 + i % 28:02d}T10:00:00.000Z",
+            "Title": f"Article <b>{i}</b> – übersicht",
+            content_field: generate_article_html(rng, **html_params),
+            "ArticleNumber": f"{i:09d}",
+            "PublishStatus": "Archived" if archived else "Online",
+            "UrlName": f"article-{i}",
+            "IsDeleted": False,
+        }) + "\n").encode("utf-8"))
+    return lines
@@ -0,0 +1,243 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+# article_parser.py
+
+import json
+import logging
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from html_sanitizer import HTMLSanitizer
+from logger import get_logger
+from record_validator import RecordValidator
+from sanitize_cache import shared_cache
+from spill_file import read_slice_lines
+
+logger = get_logger(__name__)
+
+# orjson parses the raw bytes of a line without a separate UTF-8 decode;
+# without it (or on lines it rejects) the stdlib path below is used
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+class ArticleRecord:
+    """
+    The fields of an exported Knowledge__kav row the pipeline uses. Other
+    projected fields are dropped when the line is parsed.
+    """
+    __slots__ = ('id', 'title', 'article_number', 'url_name', 'publish_status', 'last_modified_date', 'content')
+
+    def __init__(self, id: str, title: str, article_number: str, url_name: Optional[str],
+                 publish_status: Optional[str], last_modified_date: Optional[str], content: str):
+        self.id = id
+        self.title = title
+        self.article_number = article_number
+        self.url_name = url_name
+        self.publish_status = publish_status
+        self.last_modified_date = last_modified_date
+        self.content = content
+
+    @classmethod
+    def from_article(cls, article: Dict, content_field: str) -> 'ArticleRecord':
+        """
+        Args:
+            article (Dict): A decoded JSON line
+            content_field (str): Name of the rich text content field
+        Returns:
+            ArticleRecord: The record, with Title and content as given
+        """
+        return cls(
+            article['Id'], article['Title'], article['ArticleNumber'], article.get('UrlName'),
+            article.get('PublishStatus'), article.get('LastModifiedDate'), article[content_field]
+        )
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, ArticleRecord):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self) -> str:
+        return f"ArticleRecord(id={self.id!r}, url_name={self.url_name!r}, publish_status={self.publish_status!r})"
+
+class ParseStats:
+    """
+    Counters of one read, filled in by ArticleParser as it parses lines. Kept
+    per reader (or per worker task) rather than shared, so no locking is needed.
+    """
+    __slots__ = ('lines', 'bytes', 'malformed', 'rejects', 'sanitize_seconds')
+
+    def __init__(self):
+        self.lines = 0
+        self.bytes = 0
+        # Lines that are not valid JSON
+        self.malformed = 0
+        # (field, reason) -> number of articles rejected for it; see record_validator
+        self.rejects: Dict[Tuple[str, str], int] = {}
+        # Thread CPU time spent sanitizing Title and content
+        self.sanitize_seconds = 0.0
+
+    def merge(self, other: 'ParseStats') -> None:
+        self.lines += other.lines
+        self.bytes += other.bytes
+        self.malformed += other.malformed
+        for reject, count in other.rejects.items():
+            self.rejects[reject] = self.rejects.get(reject, 0) + count
+        self.sanitize_seconds += other.sanitize_seconds
+
+class ArticleParser:
+    """
+    Turns AppFlow JSON Lines into validated, sanitized article records.
+    """
+
+    def __init__(self, content_field: str, sanitizer: HTMLSanitizer, validator: Optional[RecordValidator] = None):
+        """
+        Args:
+            content_field (str): Name of the rich text field holding the article body
+            sanitizer (HTMLSanitizer): Sanitizer applied to Title and the content field
+            validator (Optional[RecordValidator]): Compiled record schema; defaults to the required fields only
+        """
+        self.content_field = content_field
+        self.sanitizer = sanitizer
+        self.validator = validator if validator is not None else RecordValidator.from_json('', content_field)
+
+    def validate_article(self, article: Dict, stats: Optional[ParseStats] = None) -> bool:
+        """
+        Validate the article against the record schema. Rejects are counted in
+        stats and summarized once per file by the reader, not logged per article.
+        Args:
+            article: The article data to validate
+            stats: Counts the rejected article under each (field, reason), if given
+        Returns:
+            bool: True if article is valid, False otherwise
+        """
+        rejects = self.validator.rejects(article)
+        if not rejects:
+            return True
+
+        if stats is not None:
+            for reject in rejects:
+                stats.rejects[reject] = stats.rejects.get(reject, 0) + 1
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Rejected article: {', '.join(f'{field} {reason}' for field, reason in rejects)}")
+        return False
+
+    def parse_line(self, line: bytes, stats: Optional[ParseStats] = None) -> Optional[ArticleRecord]:
+        """
+        Decode, validate and sanitize one JSON line.
+
+        Args:
+            line (bytes): A raw line from the export file
+            stats (Optional[ParseStats]): Counters to update, if given
+        Returns:
+            Optional[ArticleRecord]: The sanitized article, or None for blank, malformed or invalid lines
+        """
+        if stats is not None:
+            stats.lines += 1
+            stats.bytes += len(line)
+        article = self.fast_loads(line)
+        if article is None:
+            line = line.decode('utf-8').strip()
+            if not line:
+                return None
+
+        try:
+            if article is None:
+                article = json.loads(line)
+            if not self.validate_article(article, stats):
+                return None
+
+            record = ArticleRecord.from_article(article, self.content_field)
+            started = time.thread_time()
+            record.title = self.sanitizer.sanitize_html(record.title)
+            record.content = self.sanitizer.sanitize_html(record.content)
+            if stats is not None:
+                stats.sanitize_seconds += time.thread_time() - started
+            return record
+
+        except json.JSONDecodeError as e:
+            logger.error(f"Error parsing JSON line: {line[:100]}... Error: {str(e)}")
+            if stats is not None:
+                stats.malformed += 1
+        except Exception as e:
+            logger.error(f"Error processing line: {str(e)}")
+        return None
+
+    @staticmethod
+    def fast_loads(line: bytes) -> Optional[object]:
+        """
+        Parse a line with orjson when it is installed.
+
+        Returns:
+            The decoded JSON value, or None when orjson is unavailable, the line is
+            blank or orjson rejects it; the caller then takes the stdlib path, which
+            keeps its exact results and error handling for those lines.
+        """
+        if orjson is None:
+            return None
+        line = line.strip()
+        if not line:
+            return None
+        try:
+            return orjson.loads(line)
+        except orjson.JSONDecodeError:
+            return None
+
+    def parse_lines(self, lines: Iterable[bytes], stats: Optional[ParseStats] = None) -> List[ArticleRecord]:
+        """
+        Parse a chunk of lines, dropping the ones parse_line rejects.
+        """
+        articles = []
+        for line in lines:
+            article = self.parse_line(line, stats)
+            if article is not None:
+                articles.append(article)
+        return articles
+
+# Parsers built inside worker processes, keyed by (content_field, parser backend, record schema)
+_worker_parsers: Dict[tuple, ArticleParser] = {}
+
+def parse_lines_task(content_field: str, parser_backend: str, record_schema: str,
+                     lines: List[bytes]) -> Tuple[List[ArticleRecord], ParseStats]:
+    """
+    Process pool entry point: parse a chunk of lines with a per-process parser.
+
+    Args:
+        content_field (str): Name of the rich text content field
+        parser_backend (str): HTMLSanitizer parser backend
+        record_schema (str): RECORD_SCHEMA the worker's validator is compiled from
+        lines (List[bytes]): Raw lines from the export file
+    Returns:
+        Tuple[List[ArticleRecord], ParseStats]: The sanitized articles, in input order, and the chunk's counters
+    """
+    stats = ParseStats()
+    return _worker_parser(content_field, parser_backend, record_schema).parse_lines(lines, stats), stats
+
+def parse_slice_task(content_field: str, parser_backend: str, record_schema: str, path: str, start: int,
+                     end: int) -> Tuple[List[ArticleRecord], ParseStats]:
+    """
+    Process pool entry point: parse a line-aligned slice of a spill file, read
+    from the mapped file by the worker rather than sent over the pipe.
+
+    Args:
+        content_field (str): Name of the rich text content field
+        parser_backend (str): HTMLSanitizer parser backend
+        record_schema (str): RECORD_SCHEMA the worker's validator is compiled from
+        path (str): The spill file
+        start (int): Offset of the first line of the slice
+        end (int): Offset just past the last line of the slice
+    Returns:
+        Tuple[List[ArticleRecord], ParseStats]: The sanitized articles, in file order, and the slice's counters
+    """
+    stats = ParseStats()
+    parser = _worker_parser(content_field, parser_backend, record_schema)
+    return parser.parse_lines(read_slice_lines(path, start, end), stats), stats
+
+def _worker_parser(content_field: str, parser_backend: str, record_schema: str) -> ArticleParser:
+    parser = _worker_parsers.get((content_field, parser_backend, record_schema))
+    if parser is None:
+        parser = ArticleParser(content_field, HTMLSanitizer(parser_backend, cache=shared_cache()),
+                               RecordValidator.from_json(record_schema, content_field))
+        _worker_parsers[(content_field, parser_backend, record_schema)] = parser
+    return parser
@@ -0,0 +1,195 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+# checkpoint.py
+
+import json
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, NamedTuple, Optional, Tuple
+from botocore.exceptions import ClientError
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+# Key prefix of checkpoint objects in the checkpoint bucket; the controller
+# ignores notifications for keys under it
+DEFAULT_CHECKPOINT_PREFIX = '_checkpoints/'
+
+# Time left for in-flight uploads and the checkpoint after reading stops
+DEFAULT_DEADLINE_MARGIN_SECONDS = 30.0
+
+class Checkpoint(NamedTuple):
+    """
+    How far an export file has been processed by earlier invocations.
+    """
+    # ETag of the object version the offset refers to
+    etag: Optional[str]
+    # Every line before this byte offset has been processed
+    offset: int
+    successful: int
+    failed: int
+    skipped: int
+    # Invocations that processed part of the file
+    invocations: int
+
+    def to_json(self) -> str:
+        return json.dumps(self._asdict())
+
+    @classmethod
+    def from_json(cls, data) -> 'Checkpoint':
+        return cls(**json.loads(data))
+
+class DeadlineReached(Exception):
+    """
+    Raised by S3Manager.process_s3_object when it stopped reading before the
+    end of the file and saved a checkpoint; the counts are this invocation's.
+    """
+
+    def __init__(self, checkpoint: Checkpoint, successful: int, failed: int, skipped: int):
+        super().__init__(f"Stopped at byte {checkpoint.offset} before the invocation deadline")
+        self.checkpoint = checkpoint
+        self.successful = successful
+        self.failed = failed
+        self.skipped = skipped
+
+class Deadline:
+    """
+    The time by which an invocation stops reading, margin seconds before Lambda would end it.
+    """
+
+    def __init__(self, expires_at: float, clock: Callable[[], float] = time.monotonic):
+        self.expires_at = expires_at
+        self._clock = clock
+
+    @classmethod
+    def from_context(cls, context, margin: float = DEFAULT_DEADLINE_MARGIN_SECONDS,
+                     clock: Callable[[], float] = time.monotonic) -> Optional['Deadline']:
+        """
+        Args:
+            context: The Lambda context object, or None when invoked without one
+            margin (float): Seconds reserved for finishing uploads and saving the checkpoint
+        Returns:
+            Optional[Deadline]: None if the context has no remaining time
+        """
+        if context is None or not hasattr(context, 'get_remaining_time_in_millis'):
+            return None
+        return cls(clock() + context.get_remaining_time_in_millis() / 1000 - margin, clock)
+
+    def expired(self) -> bool:
+        return self._clock() >= self.expires_at
+
+    def remaining(self) -> float:
+        return self.expires_at - self._clock()
+
+class ReadProgress:
+    """
+    Tracks the byte offset of the lines handed to the parser and stops
+    handing them out once the deadline has passed. At least one line is read
+    per invocation, so a resumed file always makes progress.
+    """
+
+    def __init__(self, offset: int = 0, deadline: Optional[Deadline] = None, etag: Optional[str] = None):
+        """
+        Args:
+            offset (int): Byte offset reading starts at
+            deadline (Optional[Deadline]): When to stop; never if None
+            etag (Optional[str]): ETag the object must still have, when resuming
+        """
+        self.start = offset
+        self.offset = offset
+        self.deadline = deadline
+        self.etag = etag
+        # Whether reading stopped before the end of the object
+        self.stopped = False
+
+    def check_etag(self, etag: Optional[str]) -> bool:
+        """
+        Record the ETag of the object being read.
+
+        Returns:
+            bool: False if it differs from the ETag already recorded
+        """
+        if etag is None:
+            return True
+        if self.etag is None:
+            self.etag = etag
+        return self.etag == etag
+
+    def _expired(self) -> bool:
+        if self.deadline is None or self.offset == self.start or not self.deadline.expired():
+            return False
+        self.stopped = True
+        return True
+
+    def lines(self, lines: Iterable[bytes]) -> Iterator[bytes]:
+        """
+        Yields lines until the deadline, advancing offset past each one.
+        """
+        for line in lines:
+            if self._expired():
+                return
+            self.offset += len(line)
+            yield line
+
+    def slices(self, slices: Iterable[Tuple[int, int]], base: int) -> Iterator[Tuple[int, int]]:
+        """
+        Yields line-aligned (start, end) slices of a file holding the object
+        from byte base until the deadline, advancing offset past each one.
+        """
+        for start, end in slices:
+            if self._expired():
+                return
+            self.offset = base + end
+            yield start, end
+
+class S3CheckpointStore:
+    """
+    Keeps checkpoints as JSON objects under a prefix of an S3 bucket.
+    """
+
+    def __init__(self, s3_client, bucket: str, prefix: str = DEFAULT_CHECKPOINT_PREFIX):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def key(self, bucket: str, s3_key: str) -> str:
+        return f"{self.prefix}{bucket}/{s3_key}.json"
+
+    def load(self, bucket: str, s3_key: str) -> Optional[Checkpoint]:
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket, Key=self.key(bucket, s3_key))
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                return None
+            raise
+        return Checkpoint.from_json(response['Body'].read())
+
+    def save(self, bucket: str, s3_key: str, checkpoint: Checkpoint) -> None:
+        self.s3_client.put_object(Bucket=self.bucket, Key=self.key(bucket, s3_key), Body=checkpoint.to_json(),
+                                  ContentType='application/json')
+
+    def delete(self, bucket: str, s3_key: str) -> None:
+        self.s3_client.delete_object(Bucket=self.bucket, Key=self.key(bucket, s3_key))
+
+class InMemoryCheckpointStore:
+    """
+    Keeps checkpoints in memory, e.g. for tests and local harnesses.
+    """
+
+    def __init__(self, prefix: str = DEFAULT_CHECKPOINT_PREFIX):
+        self.prefix = prefix
+        self.checkpoints: Dict[Tuple[str, str], Checkpoint] = {}
+        self._lock = threading.Lock()
+
+    def load(self, bucket: str, s3_key: str) -> Optional[Checkpoint]:
+        with self._lock:
+            return self.checkpoints.get((bucket, s3_key))
+
+    def save(self, bucket: str, s3_key: str, checkpoint: Checkpoint) -> None:
+        with self._lock:
+            self.checkpoints[(bucket, s3_key)] = checkpoint
+
+    def delete(self, bucket: str, s3_key: str) -> None:
+        with self._lock:
+            self.checkpoints.pop((bucket, s3_key), None)
@@ -3,26 +3,158 @@
 
 # html_sanitizer.py
 
-from bs4 import BeautifulSoup
-from typing import Optional
+from bs4 import BeautifulSoup, NavigableString, Tag
+from bs4.builder import HTMLParserTreeBuilder
+from bs4.element import (AttributeValueWithCharsetSubstitution, CData, CharsetMetaAttributeValue, Comment,
+                         ContentMetaAttributeValue, Declaration, Doctype, ProcessingInstruction)
+from bs4.dammit import EntitySubstitution
+from bs4.formatter import HTMLFormatter
+from html.parser import HTMLParser
+from importlib.util import find_spec
+from typing import List, Optional
+import os
 import re
 from logger import get_logger
+from sanitize_cache import SanitizeCache, cache_key
 
 logger = get_logger(__name__)
 
+# Bump whenever a rule change alters sanitized output, so cached results
+# produced by the old rules are never served
+RULES_VERSION = '1'
+
+# Parser backends selectable via the constructor or the HTML_PARSER env var
+PARSER_ENV_VAR = 'HTML_PARSER'
+LXML = 'lxml'
+HTML_PARSER = 'html.parser'
+HTML5LIB = 'html5lib'
+STREAMING = 'streaming'
+PARSER_BACKENDS = (STREAMING, LXML, HTML_PARSER, HTML5LIB)
+
+# Backends that need a package beyond bs4 and the standard library
+OPTIONAL_BACKEND_MODULES = {LXML: 'lxml', HTML5LIB: 'html5lib'}
+
+# Backends that wrap fragments in <html>/<head>/<body>
+WRAPPING_BACKENDS = frozenset({LXML, HTML5LIB})
+DOCUMENT_TAGS = frozenset({'html', 'head', 'body'})
+DOCUMENT_TAG_RE = re.compile(r'<\s*(?:html|head|body)[\s/>]', re.IGNORECASE)
+
+# Void elements and multi-valued attributes as html.parser's tree builder sees them
+_TREE_BUILDER = HTMLParserTreeBuilder()
+VOID_ELEMENTS = frozenset(_TREE_BUILDER.empty_element_tags)
+MULTI_VALUED_ATTRS = {tag: frozenset(attrs) for tag, attrs in _TREE_BUILDER.cdata_list_attributes.items()}
+
+# Formatter used by str(soup); non-plain strings (comments, doctypes,
+# script/style bodies) are still rendered through it so output stays identical
+MINIMAL_FORMATTER = HTMLFormatter.REGISTRY['minimal']
+
+# Encoding str(soup) substitutes into <meta charset> attribute values
+OUTPUT_ENCODING = 'utf-8'
+
+def _escape_text(text: str) -> str:
+    """
+    Apply the 'minimal' formatter entity substitution (&, <, >) to a string.
+    """
+    if '&' in text:
+        text = text.replace('&', '&amp;')
+    if '<' in text:
+        text = text.replace('<', '&lt;')
+    if '>' in text:
+        text = text.replace('>', '&gt;')
+    return text
+
+def _quote_attribute(value: str) -> str:
+    """
+    Escape and quote an attribute value the same way BeautifulSoup does.
+    """
+    value = _escape_text(value)
+    if '"' in value:
+        if "'" in value:
+            return '"' + value.replace('"', '&quot;') + '"'
+        return "'" + value + "'"
+    return '"' + value + '"'
+
+def _format_opening_tag(name: str, attrs: dict) -> str:
+    """
+    Render '<name attr="value" ...' (without the closing bracket) with
+    attributes sorted and values converted the way Tag.decode() does.
+    """
+    if not attrs:
+        return f"<{name}"
+    attribute_parts = []
+    for key in sorted(attrs):
+        value = attrs[key]
+        if value is None:
+            attribute_parts.append(key)
+            continue
+        if isinstance(value, (list, tuple)):
+            value = ' '.join(value)
+        elif isinstance(value, AttributeValueWithCharsetSubstitution):
+            # bs4 < 4.13 exposes this as an encode() override
+            substitute = getattr(value, 'substitute_encoding', None) or value.encode
+            value = substitute(OUTPUT_ENCODING)
+        elif not isinstance(value, str):
+            value = str(value)
+        attribute_parts.append(f"{key}={_quote_attribute(value)}")
+    return f"<{name} {' '.join(attribute_parts)}"
+
+def is_backend_installed(backend: str) -> bool:
+    """
+    Check whether the packages a parser backend needs can be imported.
+    """
+    module = OPTIONAL_BACKEND_MODULES.get(backend)
+    return module is None or find_spec(module) is not None
+
+def available_parser_backends() -> List[str]:
+    """
+    List the parser backends usable in this environment, fastest first.
+    """
+    return [backend for backend in PARSER_BACKENDS if is_backend_installed(backend)]
+
+def default_parser_backend() -> str:
+    """
+    The tree-less streaming rewriter: the fastest backend, and byte-identical
+    to html.parser, which is what Q has always ingested.
+    """
+    return STREAMING
+
 class HTMLSanitizer:
     """
     A class to handle HTML sanitization and formatting.
     """
     
-    def __init__(self):
+    def __init__(self, parser: Optional[str] = None, cache: Optional[SanitizeCache] = None):
         """
         Initialize HTMLSanitizer with allowed attributes for specific tags.
+
+        Args:
+            parser (str): Parser backend, one of PARSER_BACKENDS. Defaults to the
+                HTML_PARSER environment variable, then default_parser_backend().
+            cache (SanitizeCache): Optional memo of previously sanitized bodies
+        Raises:
+            ValueError: If the backend is unknown or its package is not installed
         """
+        parser = parser or os.environ.get(PARSER_ENV_VAR) or default_parser_backend()
+        if parser not in PARSER_BACKENDS:
+            raise ValueError(f"Unknown HTML parser backend: {parser}. Expected one of: {', '.join(PARSER_BACKENDS)}")
+        if not is_backend_installed(parser):
+            raise ValueError(f"HTML parser backend {parser} requires the {OPTIONAL_BACKEND_MODULES[parser]} package")
+        self.parser = parser
+        self.cache = cache if cache is not None and cache.enabled else None
+        # Backends can disagree on malformed markup, so they never share entries
+        self.cache_version = f"{RULES_VERSION}:{parser}"
+
         self.allowed_table_attrs = ['border']
         self.allowed_link_attrs = ['href', 'title']
         self.allowed_img_attrs = ['src', 'alt', 'title']
 
+        # Attribute allowlists by tag name, resolved once per sanitizer
+        self.tag_attr_allowlists = {
+            'table': frozenset(self.allowed_table_attrs),
+            'a': frozenset(self.allowed_link_attrs),
+            'img': frozenset(self.allowed_img_attrs)
+        }
+
     def sanitize_html(self, html_content: Optional[str]) -> str:
         """
         Performs basic HTML sanitization:
@@ -30,6 +162,9 @@ class HTMLSanitizer:
         - Removes unnecessary whitespace
         - Keeps basic structure and formatting
         - Preserves essential attributes for links and images
+
+        All rules are applied while the document is serialized, so it is
+        walked exactly once after parsing (or not at all when streaming).
         
         Args:
             html_content (str): Raw HTML content
@@ -39,43 +174,288 @@ class HTMLSanitizer:
         if not html_content:
             return ""
 
-        # Create BeautifulSoup object
-        soup = BeautifulSoup(html_content, 'html.parser')
+        if self.cache is not None:
+            key = cache_key(html_content, self.cache_version)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+            sanitized = self._sanitize(html_content)
+            self.cache.put(key, sanitized)
+            return sanitized
 
-        # Remove style attributes from all tags
-        for tag in soup.find_all():               
-            # Remove target attributes from links
-            if tag.name == 'a' and 'target' in tag.attrs:
-                del tag['target']
-                
-            # Convert b tags to strong
-            if tag.name == 'b':
-                tag.name = 'strong'
-
-        # Clean up tables
-        for table in soup.find_all('table'):
-            if 'border' in table.attrs:
-                table['border'] = '1'
-            # Remove other table attributes
-            for attr in list(table.attrs):
-                if attr not in self.allowed_table_attrs:
-                    del table[attr]
-                    
-        # Clean up links
-        for link in soup.find_all('a'):
-            for attr in list(link.attrs):
-                if attr not in self.allowed_link_attrs:
-                    del link[attr]
-                    
-        # Clean up images
-        for img in soup.find_all('img'):
-            for attr in list(img.attrs):
-                if attr not in self.allowed_img_attrs:
-                    del img[attr]
+        return self._sanitize(html_content)
+
+    def _sanitize(self, html_content: str) -> str:
+        """
+        Parse, apply the rules and normalise whitespace (no caching).
+        """
+        if self.parser == STREAMING:
+            html_content = self._render_streaming(html_content)
+        else:
+            # Create BeautifulSoup object
+            soup = BeautifulSoup(html_content, self.parser)
+            # Fragments come back wrapped in <html><body> from some backends;
+            # drop the wrapper so output matches html.parser
+            hidden_tags = frozenset()
+            if self.parser in WRAPPING_BACKENDS and not DOCUMENT_TAG_RE.search(html_content):
+                hidden_tags = DOCUMENT_TAGS
+            html_content = self._render(soup, hidden_tags)
 
         # Convert non-breaking spaces
-        html_content = str(soup)
         html_content = html_content.replace('\xa0', ' ')
         html_content = html_content.replace('\n', ' ')
 
         return html_content
+
+    def _render(self, soup: BeautifulSoup, hidden_tags: frozenset = frozenset()) -> str:
+        """
+        Serialize the parse tree in a single traversal, applying the tag rules
+        (b -> strong, attribute allowlists, table border normalisation) to each
+        element as it is emitted. Output matches str(soup) after the rules.
+
+        Args:
+            soup (BeautifulSoup): Parsed document
+            hidden_tags (frozenset): Tag names rendered as their contents only
+        Returns:
+            str: Serialized, sanitized HTML
+        """
+        allowlists = self.tag_attr_allowlists
+        pieces = []
+        append = pieces.append
+        # Stack of (tag, closing markup) for elements still open
+        open_tags = []
+
+        for node in soup.descendants:
+            parent = node.parent
+            while open_tags and open_tags[-1][0] is not parent:
+                append(open_tags.pop()[1])
+
+            node_type = type(node)
+            if node_type is NavigableString:
+                append(_escape_text(node))
+                continue
+            if node_type is not Tag:
+                # Comments, doctypes, CDATA and script/style bodies
+                append(node.output_ready(MINIMAL_FORMATTER))
+                continue
+
+            if node.name in hidden_tags:
+                open_tags.append((node, ''))
+                continue
+
+            # Convert b tags to strong
+            if node.name == 'b':
+                node.name = 'strong'
+            name = node.name
+            if node.prefix:
+                name = f"{node.prefix}:{name}"
+
+            # Remove every attribute outside the tag's allowlist
+            # (this also drops target attributes from links)
+            allowed = allowlists.get(node.name)
+            if allowed is not None:
+                node.attrs = {key: value for key, value in node.attrs.items() if key in allowed}
+                if node.name == 'table' and 'border' in node.attrs:
+                    node.attrs['border'] = '1'
+
+            opening = _format_opening_tag(name, node.attrs)
+
+            if node.is_empty_element:
+                append(opening + '/>')
+            else:
+                append(opening + '>')
+                open_tags.append((node, f"</{name}>"))
+
+        while open_tags:
+            append(open_tags.pop()[1])
+
+        return ''.join(pieces)
+
+    def _render_streaming(self, html_content: str) -> str:
+        """
+        Sanitize without building a parse tree by rewriting html.parser events.
+
+        Args:
+            html_content (str): Raw HTML content
+        Returns:
+            str: Serialized, sanitized HTML (before whitespace normalisation)
+        """
+        rewriter = _StreamingRewriter(self.tag_attr_allowlists)
+        rewriter.feed(html_content)
+        return rewriter.finish()
+
+class _StreamingRewriter(HTMLParser):
+    """
+    Tree-less counterpart of HTMLSanitizer._render. It reproduces how
+    BeautifulSoup's html.parser tree builder merges text, resolves entity
+    references and nests/closes tags, so the output matches the html.parser
+    backend without allocating a Tag per element.
+    """
+
+    # Elements whose text bs4 emits without entity substitution
+    RAW_TEXT_TAGS = frozenset({'script', 'style'})
+    # Elements inside which whitespace-only text is kept verbatim
+    PRESERVE_WHITESPACE_TAGS = frozenset({'pre', 'textarea'})
+    ASCII_SPACES = '\x20\x0a\x09\x0c\x0d'
+
+    def __init__(self, allowlists):
+        super().__init__(convert_charrefs=False)
+        self.allowlists = allowlists
+        self.pieces = []
+        # Text seen since the last markup event, merged like a NavigableString
+        self.text = []
+        # Source tag names of elements still open, innermost last
+        self.open_tags = []
+        self.preserve_whitespace_depth = 0
+        # Void elements opened as <tag>, whose optional </tag> is swallowed
+        self.closed_void_elements = []
+
+    def flush_text(self):
+        """
+        Emit buffered text as bs4 would: whitespace-only strings collapse to a
+        single space or newline, and text is escaped outside script/style.
+        """
+        if not self.text:
+            return
+        data = ''.join(self.text)
+        self.text = []
+        if not self.preserve_whitespace_depth and not data.strip(self.ASCII_SPACES):
+            data = '\n' if '\n' in data else ' '
+        if self.open_tags and self.open_tags[-1] in self.RAW_TEXT_TAGS:
+            self.pieces.append(data)
+        else:
+            self.pieces.append(_escape_text(data))
+
+    def handle_starttag(self, tag, attrs):
+        if not self._start(tag, attrs):
+            self.closed_void_elements.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self._start(tag, attrs)
+        self._end(tag)
+
+    def _start(self, tag, attrs) -> bool:
+        """
+        Emit an opening tag. Returns True if the element was left open.
+        """
+        self.flush_text()
+        name = 'strong' if tag == 'b' else tag
+        attr_dict = {}
+        for key, value in attrs:
+            attr_dict[key] = '' if value is None else value
+
+        allowed = self.allowlists.get(name)
+        if allowed is not None:
+            attr_dict = {key: value for key, value in attr_dict.items() if key in allowed}
+            if name == 'table' and 'border' in attr_dict:
+                attr_dict['border'] = '1'
+
+        multi_valued = MULTI_VALUED_ATTRS['*'] | MULTI_VALUED_ATTRS.get(name, frozenset())
+        for key in multi_valued.intersection(attr_dict):
+            attr_dict[key] = attr_dict[key].split()
+
+        # Same <meta> charset rewriting html.parser's tree builder sets up
+        if name == 'meta':
+            if 'charset' in attr_dict:
+                attr_dict['charset'] = CharsetMetaAttributeValue(attr_dict['charset'])
+            elif 'content' in attr_dict and attr_dict.get('http-equiv', '').lower() == 'content-type':
+                attr_dict['content'] = ContentMetaAttributeValue(attr_dict['content'])
+
+        opening = _format_opening_tag(name, attr_dict)
+        if name in VOID_ELEMENTS:
+            self.pieces.append(opening + '/>')
+            return False
+        self.pieces.append(opening + '>')
+        self.open_tags.append(tag)
+        if tag in self.PRESERVE_WHITESPACE_TAGS:
+            self.preserve_whitespace_depth += 1
+        return True
+
+    def handle_endtag(self, tag):
+        if tag in self.closed_void_elements:
+            self.closed_void_elements.remove(tag)
+            return
+        self._end(tag)
+
+    def _end(self, tag):
+        """
+        Close everything up to the most recent open element named tag. Stray
+        end tags are dropped but still end the current string.
+        """
+        self.flush_text()
+        if tag not in self.open_tags:
+            return
+        while self._close() != tag:
+            pass
+
+    def _close(self) -> str:
+        """
+        Emit the closing tag of the innermost open element and return its source name.
+        """
+        open_tag = self.open_tags.pop()
+        if open_tag in self.PRESERVE_WHITESPACE_TAGS:
+            self.preserve_whitespace_depth -= 1
+        self.pieces.append(f"</{'strong' if open_tag == 'b' else open_tag}>")
+        return open_tag
+
+    def handle_data(self, data):
+        self.text.append(data)
+
+    def handle_entityref(self, name):
+        character = EntitySubstitution.HTML_ENTITY_TO_CHARACTER.get(name)
+        self.text.append(character if character is not None else f"&{name}")
+
+    def handle_charref(self, name):
+        try:
+            codepoint = int(name[1:], 16) if name[:1] in ('x', 'X') else int(name)
+        except ValueError:
+            self.text.append(f"&#{name}")
+            return
+        # NUL, surrogates and code points beyond Unicode are parse errors that
+        # html.parser's tree builder resolves to U+FFFD; a lone surrogate
+        # could not even be encoded as UTF-8
+        if codepoint == 0 or 0xD800 <= codepoint <= 0xDFFF or codepoint > 0x10FFFF:
+            self.text.append('\N{REPLACEMENT CHARACTER}')
+            return
+        data = None
+        if codepoint < 256:
+            # Numeric references in the 128-159 range usually mean Windows-1252
+            try:
+                data = bytes([codepoint]).decode('windows-1252')
+            except UnicodeDecodeError:
+                pass
+        if not data:
+            try:
+                data = chr(codepoint)
+            except (ValueError, OverflowError):
+                pass
+        self.text.append(data or '\N{REPLACEMENT CHARACTER}')
+
+    def handle_comment(self, data):
+        self._append_special(Comment(data))
+
+    def handle_decl(self, decl):
+        self._append_special(Doctype(decl[len('DOCTYPE '):]))
+
+    def unknown_decl(self, data):
+        if data.upper().startswith('CDATA['):
+            self._append_special(CData(data[len('CDATA['):]))
+        else:
+            self._append_special(Declaration(data))
+
+    def handle_pi(self, data):
+        self._append_special(ProcessingInstruction(data))
+
+    def _append_special(self, string):
+        self.flush_text()
+        self.pieces.append(string.output_ready(MINIMAL_FORMATTER))
+
+    def finish(self) -> str:
+        """
+        Flush buffered input, close any elements left open and return the output.
+        """
+        self.close()
+        self.flush_text()
+        while self.open_tags:
+            self._close()
+        return ''.join(self.pieces)
@@ -0,0 +1,78 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+# known_objects.py
+
+import collections
+import threading
+from typing import Any, Hashable
+
+# Entries kept across warm invocations; a few hundred bytes each
+DEFAULT_KNOWN_OBJECTS_MAX_ENTRIES = 50000
+
+class KnownObjects:
+    """
+    What this execution environment last saw of each output object, kept
+    across warm invocations so most articles need no HEAD request. Entries
+    can be stale when another execution environment writes the same key:
+    writes are conditional on the cached ETag, so a stale entry fails with a
+    precondition error and is dropped. The least recently used entries are
+    evicted beyond max_entries. Safe to use from several threads.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_KNOWN_OBJECTS_MAX_ENTRIES):
+        """
+        Args:
+            max_entries (int): Most entries kept; 0 keeps none
+        """
+        if max_entries < 0:
+            raise ValueError(f"KNOWN_OBJECTS_MAX_ENTRIES must not be negative, got {max_entries}")
+        self.max_entries = max_entries
+        self._entries: 'collections.OrderedDict[Hashable, tuple]' = collections.OrderedDict()
+        self._lock = threading.Lock()
+        # Incremented per invocation, to tell entries of this invocation from older ones
+        self._invocation = 0
+
+    def new_invocation(self) -> None:
+        with self._lock:
+            self._invocation += 1
+
+    def get(self, key: Hashable, default: Any = None, current: bool = False) -> Any:
+        """
+        Args:
+            key (Hashable): The (bucket, key) of the object
+            default (Any): Returned for unknown objects
+            current (bool): Only trust an entry recorded during this invocation
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (current and entry[1] != self._invocation):
+                return default
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            if not self.max_entries:
+                return
+            self._entries[key] = (value, self._invocation)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            return default if entry is None else entry[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
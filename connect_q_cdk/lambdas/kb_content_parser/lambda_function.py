@@ -10,6 +10,99 @@ import boto3
 
 logger = get_logger(__name__)    
 
+REQUIRED_ENV_VARS = frozenset({
+    'LOB_MAPPING'
+})
+
+# Environment variables the manager is built from; a change to any of them
+# (e.g. a configuration update on a warm execution environment) rebuilds it
+CONFIG_ENV_VARS = (
+    'LOB_MAPPING', 'BATCH_SIZE', 'MAX_THREADS', 'MAX_IN_FLIGHT_BATCHES', 'OBJECT_CONCURRENCY', 'SKIP_UNCHANGED', 'OUTPUT_ENCODING',
+    'SANITIZE_MODE', 'SANITIZE_WORKERS', 'SANITIZE_CHUNK_SIZE', 'RANGE_THRESHOLD_MB', 'RANGE_PART_SIZE_MB', 'SPILL_THRESHOLD_MB',
+    'EPHEMERAL_STORAGE_MB', 'CONTENT_FIELD', 'HTML_PARSER', 'METRICS_NAMESPACE', 'RECORD_SCHEMA',
+    'S3_MAX_CONCURRENCY', 'S3_REQUEST_RATE', 'S3_LATENCY_TARGET_MS', 'INPUT_BUCKET', 'CHECKPOINT_BUCKET',
+    'CHECKPOINT_PREFIX', 'DEADLINE_MARGIN_MS', 'QUEUE_URL', 'KNOWN_OBJECTS_MAX_ENTRIES'
+)
+
+def load_config() -> dict:
+    """
+    Validate the environment and build the S3Manager configuration.
+
+    Returns:
+        dict: The configuration
+    Raises:
+        ValueError: If a required variable is missing or a value is invalid
+    """
+    # Validate all required environment variables exist
+    missing_vars = REQUIRED_ENV_VARS - set(os.environ.keys())
+    if missing_vars:
+        raise ValueError(f"Missing required environment variables: {', '.join(missing_vars)}")
+
+    DEFAULT_CONFIG = {
+        "BATCH_SIZE": int(os.environ.get('BATCH_SIZE', '25')),
+        "MAX_THREADS": int(os.environ.get('MAX_THREADS', '10')),
+        "MAX_IN_FLIGHT_BATCHES": int(os.environ.get('MAX_IN_FLIGHT_BATCHES', os.environ.get('MAX_THREADS', '10'))),
+        # Export files from one event processed at the same time
+        "OBJECT_CONCURRENCY": int(os.environ.get('OBJECT_CONCURRENCY', '4')),
+        "SKIP_UNCHANGED": os.environ.get('SKIP_UNCHANGED', 'true').lower() == 'true',
+        # Content-Encoding of uploaded HTML: identity, gzip or br
+        "OUTPUT_ENCODING": os.environ.get('OUTPUT_ENCODING', 'identity').lower(),
+        # 'thread' sanitizes in the handler process; 'process' fans out to worker processes
+        "SANITIZE_MODE": os.environ.get('SANITIZE_MODE', 'thread').lower(),
+        # 0 sizes the worker pool to the CPUs available to the function
+        "SANITIZE_WORKERS": int(os.environ.get('SANITIZE_WORKERS', '0')),
+        "SANITIZE_CHUNK_SIZE": int(os.environ.get('SANITIZE_CHUNK_SIZE', '50')),
+        # Export files of at least RANGE_THRESHOLD bytes are read as parallel ranged GETs; 0 disables
+        "RANGE_THRESHOLD": int(float(os.environ.get('RANGE_THRESHOLD_MB', '64')) * 1024 * 1024),
+        "RANGE_PART_SIZE": int(float(os.environ.get('RANGE_PART_SIZE_MB', '8')) * 1024 * 1024),
+        # Export files of at least SPILL_THRESHOLD bytes are downloaded to /tmp and memory-mapped; 0 disables
+        "SPILL_THRESHOLD": int(float(os.environ.get('SPILL_THRESHOLD_MB', '256')) * 1024 * 1024),
+        "EPHEMERAL_STORAGE": int(float(os.environ.get('EPHEMERAL_STORAGE_MB', '512')) * 1024 * 1024),
+        # JSON of the salesforce tasks (projections, filters, validations) records are validated against
+        "RECORD_SCHEMA": os.environ.get('RECORD_SCHEMA', ''),
+        # Ceiling of the adaptive S3 write concurrency, which starts at MAX_THREADS
+        "S3_MAX_CONCURRENCY": int(os.environ.get('S3_MAX_CONCURRENCY', os.environ.get('MAX_THREADS', '10'))),
+        # S3 write requests per second across all threads; 0 disables the limit
+        "S3_REQUEST_RATE": float(os.environ.get('S3_REQUEST_RATE', '0')),
+        # Write latency above which concurrency is reduced as for throttling; 0 disables
+        "S3_LATENCY_TARGET": float(os.environ.get('S3_LATENCY_TARGET_MS', '0')) / 1000,
+        # Checkpoints of files not finished before the deadline, and tombstones of deleted
+        # articles; empty disables both
+        "CHECKPOINT_BUCKET": os.environ.get('CHECKPOINT_BUCKET', os.environ.get('INPUT_BUCKET', '')),
+        "CHECKPOINT_PREFIX": os.environ.get('CHECKPOINT_PREFIX', '_checkpoints/'),
+        # Reading stops this long before the function timeout
+        "DEADLINE_MARGIN": float(os.environ.get('DEADLINE_MARGIN_MS', '30000')) / 1000,
+        # Queue the notification of a checkpointed file is sent to again; empty waits for redelivery
+        "QUEUE_URL": os.environ.get('QUEUE_URL', ''),
+        # Output objects whose ETag and version are cached across warm invocations
+        "KNOWN_OBJECTS_MAX_ENTRIES": int(os.environ.get('KNOWN_OBJECTS_MAX_ENTRIES', '50000'))
+    }
+
+    # Build config using dictionary comprehension
+    return {
+        **DEFAULT_CONFIG,
+        **{key: os.environ[key] for key in REQUIRED_ENV_VARS}
+    }
+
+# Built once per execution environment and reused by warm invocations
+_manager = None
+_manager_fingerprint = None
+
+def get_manager() -> S3Manager:
+    """
+    Return the cached S3Manager, building it on first use or when the
+    configuration environment has changed since it was built.
+    """
+    global _manager, _manager_fingerprint
+    fingerprint = tuple(os.environ.get(name) for name in CONFIG_ENV_VARS)
+    if _manager is None or fingerprint != _manager_fingerprint:
+        manager = S3Manager(load_config())
+        if _manager is not None:
+            logger.info("Configuration changed, rebuilding S3Manager")
+            _manager.close()
+        _manager, _manager_fingerprint = manager, fingerprint
+    return _manager
+
 def lambda_handler(event, context):
     """
     AWS Lambda handler function for processing S3 objects.
@@ -21,28 +114,8 @@ def lambda_handler(event, context):
     Returns:
         dict: Response from the controller
     """
-    REQUIRED_ENV_VARS = frozenset({
-        'LOB_MAPPING'
-    })
-    
-    DEFAULT_CONFIG = {
-        "BATCH_SIZE": int(os.environ.get('BATCH_SIZE', '25')),
-        "MAX_THREADS": int(os.environ.get('MAX_THREADS', '10'))
-    }
-
     try:
-        # Validate all required environment variables exist
-        missing_vars = REQUIRED_ENV_VARS - set(os.environ.keys())
-        if missing_vars:
-            raise ValueError(f"Missing required environment variables: {', '.join(missing_vars)}")
-
-        # Build config using dictionary comprehension
-        config = {
-            **DEFAULT_CONFIG,
-            **{key: os.environ[key] for key in REQUIRED_ENV_VARS}
-        }
-
-        return S3Manager(config).controller(event)
+        return get_manager().controller(event, context)
 
     except ValueError as e:
         logger.error(f"Configuration error: {str(e)}")
@@ -51,6 +124,13 @@ def lambda_handler(event, context):
         logger.error(f"Failed to process S3 objects: {str(e)}")
         raise
 
+# Set up the client and sanitizer during the init phase; configuration errors
+# are raised again by the first invocation
+try:
+    get_manager()
+except Exception as e:
+    logger.warning(f"Deferring S3Manager setup to the first invocation: {str(e)}")
+
                                                                                                        
 if __name__ == "__main__":
     lambda_handler({}, None)
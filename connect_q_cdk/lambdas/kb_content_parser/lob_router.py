@@ -0,0 +1,122 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+# lob_router.py
+
+import re
+from types import MappingProxyType
+from typing import Dict, Mapping, NamedTuple, Optional
+
+# LOB_MAPPING entry whose bucket receives exports under no configured prefix
+DEFAULT_PREFIX = '*'
+
+# S3 general purpose bucket naming rules
+BUCKET_NAME_PATTERN = re.compile(r'^[a-z0-9][a-z0-9.-]{1,61}[a-z0-9]$')
+
+class Route(NamedTuple):
+    # The matched LOB prefix, or the first path segment of an unmatched key
+    lob: str
+    # Output bucket; None when nothing matched and there is no default bucket
+    bucket: Optional[str]
+
+class LobRouter:
+    """
+    Immutable routing table from export key prefixes to LOB output buckets,
+    compiled once from LOB_MAPPING.
+
+    LOB_MAPPING is a comma separated list of prefix:bucket entries. A prefix
+    may span several path segments (e.g. credit-kb/cards) and the longest
+    prefix matching a key's directory wins. An entry with the prefix * names
+    the bucket for exports under no configured prefix.
+    """
+    __slots__ = ('mapping', 'default_bucket', '_lobs_by_bucket', '_max_depth')
+
+    def __init__(self, mapping: Mapping[str, str], default_bucket: Optional[str] = None):
+        """
+        Args:
+            mapping (Mapping[str, str]): LOB prefix to output bucket
+            default_bucket (Optional[str]): Bucket for keys under no configured prefix
+        """
+        lobs_by_bucket: Dict[str, str] = {}
+        for prefix, bucket in mapping.items():
+            lobs_by_bucket.setdefault(bucket, prefix)
+        object.__setattr__(self, 'mapping', MappingProxyType(dict(mapping)))
+        object.__setattr__(self, 'default_bucket', default_bucket)
+        object.__setattr__(self, '_lobs_by_bucket', MappingProxyType(lobs_by_bucket))
+        object.__setattr__(self, '_max_depth', max((prefix.count('/') + 1 for prefix in mapping), default=0))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("LobRouter is immutable")
+
+    @classmethod
+    def parse(cls, lob_mapping: str) -> 'LobRouter':
+        """
+        Compile a LOB_MAPPING string.
+
+        Args:
+            lob_mapping (str): e.g. "credit-kb:credit-bucket,credit-kb/cards:cards-bucket,*:unrouted-bucket"
+        Returns:
+            LobRouter: The routing table
+        Raises:
+            ValueError: If an entry is malformed, a bucket name is invalid or a prefix is mapped twice
+        """
+        mapping: Dict[str, str] = {}
+        default_bucket = None
+        for entry in (lob_mapping or '').split(','):
+            entry = entry.strip()
+            if not entry:
+                continue
+            prefix, separator, bucket = entry.partition(':')
+            prefix, bucket = prefix.strip(), bucket.strip()
+            if not separator or not prefix or not bucket or ':' in bucket:
+                raise ValueError(f"Malformed LOB_MAPPING entry '{entry}', expected prefix:bucket")
+            if not BUCKET_NAME_PATTERN.match(bucket):
+                raise ValueError(f"Invalid bucket name '{bucket}' in LOB_MAPPING entry '{entry}'")
+            if prefix == DEFAULT_PREFIX:
+                if default_bucket is not None and default_bucket != bucket:
+                    raise ValueError(f"LOB_MAPPING names more than one default bucket: {default_bucket}, {bucket}")
+                default_bucket = bucket
+                continue
+            if prefix.startswith('/') or prefix.endswith('/') or '' in prefix.split('/'):
+                raise ValueError(f"Invalid prefix '{prefix}' in LOB_MAPPING entry '{entry}'")
+            if mapping.get(prefix, bucket) != bucket:
+                raise ValueError(f"LOB prefix '{prefix}' is mapped to both {mapping[prefix]} and {bucket}")
+            mapping[prefix] = bucket
+        return cls(mapping, default_bucket)
+
+    def route(self, s3_key: str) -> Route:
+        """
+        Args:
+            s3_key (str): Key of an export object, e.g. credit-kb/cards/export.jsonl
+        Returns:
+            Route: The LOB and output bucket of the longest configured prefix of the key's directory
+        """
+        segments = s3_key.split('/')[:-1]
+        for depth in range(min(len(segments), self._max_depth), 0, -1):
+            prefix = '/'.join(segments[:depth])
+            bucket = self.mapping.get(prefix)
+            if bucket is not None:
+                return Route(prefix, bucket)
+        lob = s3_key.split('/')[0]
+        return Route(lob, self.bucket_for(lob))
+
+    def bucket_for(self, lob: str) -> Optional[str]:
+        """
+        Args:
+            lob (str): A LOB prefix, as in Route.lob
+        Returns:
+            Optional[str]: Its output bucket, the default bucket, or None
+        """
+        return self.mapping.get(lob, self.default_bucket)
+
+    def lob_for_bucket(self, bucket: str) -> str:
+        """
+        The LOB writing to an output bucket, for metric dimensions; the bucket itself if none does.
+        """
+        return self._lobs_by_bucket.get(bucket, bucket)
+
+    def __len__(self) -> int:
+        return len(self.mapping)
+
+    def __repr__(self) -> str:
+        return f"LobRouter({dict(self.mapping)!r}, default_bucket={self.default_bucket!r})"
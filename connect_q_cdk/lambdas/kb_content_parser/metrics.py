@@ -0,0 +1,203 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+# metrics.py
+
+import json
+import os
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+# Units used by the recorder; see the CloudWatch MetricDatum Unit values
+COUNT = 'Count'
+BYTES = 'Bytes'
+MILLISECONDS = 'Milliseconds'
+SECONDS = 'Seconds'
+
+# CloudWatch accepts at most 100 metrics per EMF directive and 100 values per metric
+EMF_MAX_METRICS = 100
+EMF_MAX_VALUES = 100
+
+DEFAULT_NAMESPACE = 'ConnectQ/KbContentParser'
+
+class StdoutSink:
+    """
+    Writes each EMF document as one line on stdout, which Lambda ships to
+    CloudWatch Logs where it is extracted into metrics. The logging module is
+    bypassed because the runtime's log prefix would break the JSON.
+    """
+
+    def emit(self, document: Dict) -> None:
+        sys.stdout.write(json.dumps(document) + '\n')
+        sys.stdout.flush()
+
+class InMemorySink:
+    """
+    Keeps emitted documents, e.g. for tests and local harnesses.
+    """
+
+    def __init__(self):
+        self.documents: List[Dict] = []
+
+    def emit(self, document: Dict) -> None:
+        self.documents.append(document)
+
+    def values(self, name: str, **dimensions) -> List[float]:
+        """
+        All values of a metric emitted with exactly these dimensions.
+        """
+        values = []
+        for document in self.documents:
+            names = {metric['Name'] for directive in document['_aws']['CloudWatchMetrics'] for metric in directive['Metrics']}
+            dimension_names = document['_aws']['CloudWatchMetrics'][0]['Dimensions'][0]
+            if name in names and {key: document[key] for key in dimension_names} == dimensions:
+                value = document[name]
+                values.extend(value if isinstance(value, list) else [value])
+        return values
+
+    def total(self, name: str, **dimensions) -> float:
+        return sum(self.values(name, **dimensions))
+
+class MetricsRecorder:
+    """
+    Collects counters and timings during one invocation and emits them as
+    CloudWatch Embedded Metric Format documents on flush(), one document per
+    set of dimensions. Counters are summed; timings keep every observation so
+    CloudWatch can compute percentiles. Safe to use from several threads.
+    """
+
+    def __init__(self, namespace: str = DEFAULT_NAMESPACE, sink=None):
+        """
+        Args:
+            namespace (str): CloudWatch namespace of the metrics
+            sink: Object with an emit(document) method; defaults to StdoutSink
+        """
+        self.namespace = namespace
+        self.sink = sink if sink is not None else StdoutSink()
+        self._lock = threading.Lock()
+        # (dimensions, metric name) -> (unit, summed value or list of observations)
+        self._metrics: Dict[Tuple[Tuple[Tuple[str, str], ...], str], Tuple[str, object]] = {}
+
+    @classmethod
+    def from_env(cls, sink=None) -> 'MetricsRecorder':
+        """
+        Build a recorder for METRICS_NAMESPACE.
+        """
+        return cls(os.environ.get('METRICS_NAMESPACE', DEFAULT_NAMESPACE), sink)
+
+    def count(self, name: str, value: float = 1, unit: str = COUNT, **dimensions: str) -> None:
+        """
+        Add value to a counter, e.g. count('LinesDecoded', 25, Lob='credit-kb').
+        """
+        key = (tuple(sorted(dimensions.items())), name)
+        with self._lock:
+            _, total = self._metrics.get(key, (unit, 0))
+            self._metrics[key] = (unit, total + value)
+
+    def observe(self, name: str, value: float, unit: str = MILLISECONDS, **dimensions: str) -> None:
+        """
+        Record one observation of a timing or size.
+        """
+        key = (tuple(sorted(dimensions.items())), name)
+        with self._lock:
+            entry = self._metrics.get(key)
+            if entry is None:
+                self._metrics[key] = (unit, [value])
+            else:
+                entry[1].append(value)
+
+    def timer(self, name: str, **dimensions: str) -> 'Timer':
+        """
+        Context manager observing the elapsed wall time in milliseconds.
+        """
+        return Timer(self, name, dimensions)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._metrics.clear()
+
+    def flush(self, timestamp: Optional[float] = None) -> int:
+        """
+        Emit everything recorded since the last flush and start over.
+
+        Args:
+            timestamp (float): Epoch seconds of the documents; defaults to now
+        Returns:
+            int: Number of documents emitted
+        """
+        with self._lock:
+            metrics, self._metrics = self._metrics, {}
+        by_dimensions: Dict[Tuple[Tuple[str, str], ...], Dict[str, Tuple[str, object]]] = {}
+        for (dimensions, name), entry in metrics.items():
+            by_dimensions.setdefault(dimensions, {})[name] = entry
+
+        timestamp_ms = int((timestamp if timestamp is not None else time.time()) * 1000)
+        emitted = 0
+        for dimensions, entries in by_dimensions.items():
+            for document in self._documents(dict(dimensions), entries, timestamp_ms):
+                try:
+                    self.sink.emit(document)
+                    emitted += 1
+                except Exception as e:
+                    logger.warning(f"Failed to emit metrics: {str(e)}")
+        return emitted
+
+    def _documents(self, dimensions: Dict[str, str], entries: Dict[str, Tuple[str, object]], timestamp_ms: int):
+        """
+        Split one dimension set into EMF documents within the per-document limits.
+        """
+        names = sorted(entries)
+        # Observation lists longer than EMF_MAX_VALUES continue in later documents
+        offset = 0
+        while True:
+            document = dict(dimensions)
+            definitions = []
+            for name in names:
+                unit, value = entries[name]
+                if isinstance(value, list):
+                    value = value[offset:offset + EMF_MAX_VALUES]
+                    if not value:
+                        continue
+                elif offset:
+                    continue
+                document[name] = value
+                definitions.append({'Name': name, 'Unit': unit})
+            if not definitions:
+                return
+            for start in range(0, len(definitions), EMF_MAX_METRICS):
+                chunk = definitions[start:start + EMF_MAX_METRICS]
+                yield {
+                    '_aws': {
+                        'Timestamp': timestamp_ms,
+                        'CloudWatchMetrics': [{
+                            'Namespace': self.namespace,
+                            'Dimensions': [sorted(dimensions)],
+                            'Metrics': chunk
+                        }]
+                    },
+                    **dimensions,
+                    **{definition['Name']: document[definition['Name']] for definition in chunk}
+                }
+            offset += EMF_MAX_VALUES
+
+class Timer:
+    """
+    Observes the wall time spent in a with block, in milliseconds.
+    """
+
+    def __init__(self, recorder: MetricsRecorder, name: str, dimensions: Dict[str, str]):
+        self.recorder = recorder
+        self.name = name
+        self.dimensions = dimensions
+
+    def __enter__(self) -> 'Timer':
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.recorder.observe(self.name, (time.perf_counter() - self.started) * 1000, MILLISECONDS, **self.dimensions)
@@ -0,0 +1,189 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+# process_pool.py
+
+import collections
+import concurrent.futures
+import multiprocessing
+import os
+import queue
+import threading
+from typing import Any, Callable, Iterable, Iterator, Optional
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+def available_cpus() -> int:
+    """
+    Number of CPUs this process may run on.
+    """
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def _worker_main(conn) -> None:
+    """
+    Worker loop: run (func, args) tasks received over the pipe until told to stop.
+    """
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        func, args = task
+        try:
+            conn.send((True, func(*args)))
+        except Exception as e:
+            conn.send((False, f"{type(e).__name__}: {str(e)}"))
+
+class WorkerPool:
+    """
+    A small process pool built only on Process and Pipe. Lambda has no
+    /dev/shm, so multiprocessing.Pool and ProcessPoolExecutor (which need
+    POSIX semaphores) cannot start there.
+
+    Tasks of every caller share one queue. A thread per worker sends it one
+    task at a time and completes the caller's future with the result, so
+    several files parse concurrently and a caller busy with uploads does not
+    leave the workers idle. imap() returns each caller's results in its
+    submission order, so callers keep the record order of the input.
+    """
+
+    def __init__(self, workers: int):
+        """
+        Args:
+            workers (int): Number of worker processes to start
+        """
+        self.workers = []
+        self._tasks: 'queue.Queue[Optional[tuple]]' = queue.Queue()
+        for _ in range(max(1, workers)):
+            parent_conn, child_conn = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_worker_main, args=(child_conn,), daemon=True)
+            process.start()
+            child_conn.close()
+            self.workers.append((process, parent_conn))
+        # Started after every worker has forked
+        self._threads = [
+            threading.Thread(target=self._serve, args=(index,), name=f"sanitize-pool-{index}", daemon=True)
+            for index in range(len(self.workers))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    @property
+    def size(self) -> int:
+        return len(self.workers)
+
+    def is_alive(self) -> bool:
+        return all(process.is_alive() for process, _ in self.workers)
+
+    def _serve(self, index: int) -> None:
+        """
+        Feeds queued tasks to one worker until close(); once the worker has
+        died, fails the tasks it takes so no caller waits forever.
+        """
+        conn = self.workers[index][1]
+        dead = False
+        while True:
+            task = self._tasks.get()
+            if task is None:
+                if not dead:
+                    try:
+                        conn.send(None)
+                        conn.close()
+                    except OSError:
+                        pass
+                return
+            future, func, args = task
+            if not future.set_running_or_notify_cancel():
+                continue
+            if dead:
+                future.set_exception(RuntimeError(f"Worker process {index} exited unexpectedly"))
+                continue
+            try:
+                conn.send((func, args))
+                ok, result = conn.recv()
+            except (EOFError, OSError):
+                dead = True
+                future.set_exception(RuntimeError(f"Worker process {index} exited unexpectedly"))
+                continue
+            if ok:
+                future.set_result(result)
+            else:
+                future.set_exception(RuntimeError(f"Worker task failed: {result}"))
+
+    def submit(self, func: Callable, args: tuple) -> concurrent.futures.Future:
+        """
+        Queue func(*args) for the next free worker.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the result; raises RuntimeError if the task
+            raised in the worker or the worker died
+        """
+        future = concurrent.futures.Future()
+        self._tasks.put((future, func, args))
+        return future
+
+    def imap(self, func: Callable, args_iterable: Iterable[tuple]) -> Iterator[Any]:
+        """
+        Run func(*args) for each args tuple across the workers, yielding results
+        in input order. Each caller keeps at most one task per worker queued,
+        so concurrent callers share the workers.
+
+        Args:
+            func (Callable): A module-level (picklable) function
+            args_iterable (Iterable[tuple]): Argument tuples, consumed lazily
+        Yields:
+            The result of each call
+        Raises:
+            RuntimeError: If a task raised in the worker or a worker died
+        """
+        pending = collections.deque()
+        try:
+            for args in args_iterable:
+                if len(pending) >= self.size:
+                    yield pending.popleft().result()
+                pending.append(self.submit(func, args))
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            # Tasks not started yet are dropped; running ones finish unread
+            for future in pending:
+                future.cancel()
+
+    def close(self) -> None:
+        """
+        Ask workers to exit once queued tasks have run, and wait for them.
+        """
+        for _ in self._threads:
+            self._tasks.put(None)
+        for thread in self._threads:
+            thread.join(timeout=5)
+        for process, _ in self.workers:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self._threads = []
+        self.workers = []
+
+_shared_pool: Optional[WorkerPool] = None
+_shared_pool_lock = threading.Lock()
+
+def shared_pool(workers: int) -> WorkerPool:
+    """
+    Process-wide pool kept across warm invocations; rebuilt if its size
+    changes or a worker has died.
+    """
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is not None and (_shared_pool.size != workers or not _shared_pool.is_alive()):
+            _shared_pool.close()
+            _shared_pool = None
+        if _shared_pool is None:
+            logger.info(f"Starting sanitize worker pool with {workers} processes")
+            _shared_pool = WorkerPool(workers)
+        return _shared_pool
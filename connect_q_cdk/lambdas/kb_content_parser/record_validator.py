@@ -0,0 +1,159 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+# record_validator.py
+
+import json
+from typing import Dict, FrozenSet, Iterable, Mapping, Optional, Tuple
+
+# Reasons an article is rejected for
+MISSING = 'missing'
+WRONG_TYPE = 'type'
+TOO_LONG = 'length'
+NOT_ALLOWED = 'value'
+NOT_AN_OBJECT = 'not_object'
+
+# Field reported for lines that decode to something other than a JSON object
+RECORD = '(record)'
+
+# Fields every article needs, besides the content field
+BASE_REQUIRED_FIELDS = ('Id', 'Title', 'ArticleNumber')
+
+# JSON types AppFlow writes for each Salesforce data_type of a projection
+DATA_TYPES: Dict[str, Tuple[type, ...]] = {
+    'id': (str,),
+    'reference': (str,),
+    'string': (str,),
+    'textarea': (str,),
+    'picklist': (str,),
+    'url': (str,),
+    'email': (str,),
+    'phone': (str,),
+    'date': (str,),
+    'datetime': (str,),
+    'boolean': (bool,),
+    'int': (int,),
+    'double': (int, float),
+    'currency': (int, float),
+    'percent': (int, float),
+}
+
+Reject = Tuple[str, str]
+
+class RecordValidator:
+    """
+    Checks decoded export lines against a schema compiled once from the
+    Salesforce task configuration: required fields, the JSON type of each
+    projected field, length limits and the values the flow filters on.
+    """
+    __slots__ = ('required_fields', '_checks')
+
+    def __init__(self, required_fields: Iterable[str], field_types: Optional[Mapping[str, Tuple[type, ...]]] = None,
+                 max_lengths: Optional[Mapping[str, int]] = None,
+                 allowed_values: Optional[Mapping[str, Iterable[str]]] = None):
+        """
+        Args:
+            required_fields (Iterable[str]): Fields that must be present and non-empty
+            field_types (Mapping[str, Tuple[type, ...]]): Accepted JSON types of a field, when not null
+            max_lengths (Mapping[str, int]): Longest accepted string value of a field
+            allowed_values (Mapping[str, Iterable[str]]): Accepted values of a field, when not null
+        """
+        field_types = field_types or {}
+        max_lengths = max_lengths or {}
+        allowed: Dict[str, FrozenSet[str]] = {field: frozenset(values) for field, values in (allowed_values or {}).items()}
+        self.required_fields: Tuple[str, ...] = tuple(dict.fromkeys(required_fields))
+        # One (field, types, max_length, allowed values) entry per checked field
+        self._checks = tuple(
+            (field, field_types.get(field), max_lengths.get(field), allowed.get(field))
+            for field in dict.fromkeys([*field_types, *max_lengths, *allowed])
+        )
+
+    @classmethod
+    def from_tasks(cls, tasks: Mapping, content_field: str) -> 'RecordValidator':
+        """
+        Compile the "tasks" of the salesforce configuration.
+
+        Projections give the data_type (and optional max_length) of each field,
+        VALIDATE_NON_NULL validations add required fields and EQUAL_TO filters
+        give the accepted values of their field.
+
+        Args:
+            tasks (Mapping): With optional projections, filters and validations lists
+            content_field (str): Name of the rich text content field, always required
+        Returns:
+            RecordValidator: The compiled validator
+        Raises:
+            ValueError: If an entry is malformed or names an unknown data_type
+        """
+        required = [*BASE_REQUIRED_FIELDS, content_field]
+        field_types, max_lengths, allowed_values = {}, {}, {}
+        try:
+            for projection in tasks.get('projections', []):
+                field, data_type = projection['field'], projection['data_type']
+                if data_type not in DATA_TYPES:
+                    raise ValueError(f"Unknown data_type '{data_type}' for field {field}")
+                field_types[field] = DATA_TYPES[data_type]
+                if projection.get('max_length') is not None:
+                    max_length = projection['max_length']
+                    if not isinstance(max_length, int) or max_length <= 0:
+                        raise ValueError(f"max_length of field {field} must be a positive integer, got {max_length!r}")
+                    max_lengths[field] = max_length
+            for validation in tasks.get('validations', []):
+                if validation['operator'] == 'VALIDATE_NON_NULL':
+                    required.append(validation['field'])
+            for task_filter in tasks.get('filters', []):
+                if task_filter['operator'] == 'EQUAL_TO' and task_filter.get('values'):
+                    allowed_values[task_filter['field']] = task_filter['values']
+        except (KeyError, TypeError, AttributeError) as e:
+            raise ValueError(f"Malformed record schema: {e!r}") from e
+        return cls(required, field_types, max_lengths, allowed_values)
+
+    @classmethod
+    def from_json(cls, record_schema: str, content_field: str) -> 'RecordValidator':
+        """
+        Compile a RECORD_SCHEMA value, the JSON of the salesforce "tasks"
+        configuration. An empty schema only checks the required fields.
+
+        Raises:
+            ValueError: If the schema is not valid JSON or is malformed
+        """
+        if not record_schema:
+            return cls([*BASE_REQUIRED_FIELDS, content_field])
+        try:
+            tasks = json.loads(record_schema)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"RECORD_SCHEMA is not valid JSON: {str(e)}") from e
+        if not isinstance(tasks, dict):
+            raise ValueError("RECORD_SCHEMA must be a JSON object")
+        return cls.from_tasks(tasks, content_field)
+
+    def rejects(self, article) -> Tuple[Reject, ...]:
+        """
+        Args:
+            article: A decoded JSON line
+        Returns:
+            Tuple[Tuple[str, str], ...]: (field, reason) of every failed check; empty if the article is valid
+        """
+        if not isinstance(article, dict):
+            return ((RECORD, NOT_AN_OBJECT),)
+        failures = [(field, MISSING) for field in self.required_fields if not article.get(field)]
+        for field, types, max_length, allowed in self._checks:
+            value = article.get(field)
+            if value is None:
+                continue
+            if types is not None and (not isinstance(value, types) or (isinstance(value, bool) and bool not in types)):
+                failures.append((field, WRONG_TYPE))
+            elif max_length is not None and isinstance(value, str) and len(value) > max_length:
+                failures.append((field, TOO_LONG))
+            elif allowed is not None and (not isinstance(value, str) or value not in allowed):
+                failures.append((field, NOT_ALLOWED))
+        return tuple(failures)
+
+def format_rejects(rejects: Mapping[Reject, int]) -> str:
+    """
+    e.g. "Title missing 3, PublishStatus value 1", most frequent first.
+    """
+    return ', '.join(
+        f"{field} {reason} {count}"
+        for (field, reason), count in sorted(rejects.items(), key=lambda item: (-item[1], item[0]))
+    )
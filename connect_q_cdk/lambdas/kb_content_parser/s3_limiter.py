@@ -0,0 +1,225 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+# s3_limiter.py
+
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional, TypeVar
+from botocore.exceptions import ClientError
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar('T')
+
+# Error codes S3 (and the AWS SDKs) use when a request is throttled
+THROTTLING_ERROR_CODES = frozenset({
+    'SlowDown', 'Throttling', 'ThrottlingException', 'RequestLimitExceeded', 'TooManyRequests', '503'
+})
+
+# Attempts of a throttled request, after botocore's own retries, before the error is raised
+THROTTLED_ATTEMPTS = 3
+
+# Backoff of a throttled attempt: full jitter, capped
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 10.0
+
+def is_throttling_error(error: ClientError) -> bool:
+    """
+    Whether S3 rejected a request because of its request rate.
+    """
+    response = error.response
+    return (response.get('Error', {}).get('Code') in THROTTLING_ERROR_CODES
+            or response.get('ResponseMetadata', {}).get('HTTPStatusCode') == 503)
+
+class TokenBucket:
+    """
+    Client-side request rate limit shared by every thread of the execution
+    environment: up to burst requests at once, refilled at rate per second.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        """
+        Args:
+            rate (float): Requests per second; 0 disables the limit
+            burst (Optional[float]): Bucket size; defaults to one second of requests
+            clock (Callable[[], float]): Monotonic clock, injectable for tests
+            sleep (Callable[[float], None]): Sleep function, injectable for tests
+        """
+        if rate < 0:
+            raise ValueError(f"Request rate must not be negative, got {rate}")
+        self.rate = rate
+        self.burst = max(1.0, burst if burst is not None else rate)
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._refilled = clock()
+
+    def acquire(self) -> float:
+        """
+        Take a token, waiting for one if the bucket is empty.
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        if not self.rate:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate)
+                self._refilled = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            self._sleep(delay)
+            waited += delay
+
+class AdaptiveLimiter:
+    """
+    Additive-increase/multiplicative-decrease limit on concurrent S3 write
+    requests. Every request completed within latency_target grows the limit by
+    about one slot per limit requests; a throttled request, or one slower than
+    latency_target, multiplies it by backoff. Requests already in flight when
+    the limit was cut do not cut it again, so one burst of SlowDown errors is
+    one decrease. Throttled requests are retried with jittered backoff, and
+    every attempt first takes a token from the shared TokenBucket.
+    """
+
+    def __init__(self, initial: int, maximum: int, minimum: int = 1, latency_target: float = 0,
+                 backoff: float = 0.5, rate_limit: Optional[TokenBucket] = None,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        """
+        Args:
+            initial (int): Starting concurrency limit
+            maximum (int): Largest limit; at most the threads that issue requests
+            minimum (int): Smallest limit
+            latency_target (float): Seconds above which a completed request counts as congestion; 0 disables
+            backoff (float): Factor applied to the limit on congestion
+            rate_limit (Optional[TokenBucket]): Request rate limit; unlimited if None
+            clock (Callable[[], float]): Monotonic clock, injectable for tests
+            sleep (Callable[[float], None]): Sleep function, injectable for tests
+        """
+        if not 1 <= minimum <= maximum:
+            raise ValueError(f"Concurrency limits must satisfy 1 <= minimum <= maximum, got {minimum} and {maximum}")
+        if not 0 < backoff < 1:
+            raise ValueError(f"Backoff must be between 0 and 1, got {backoff}")
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.rate_limit = rate_limit or TokenBucket(0)
+        self._clock = clock
+        self._sleep = sleep
+        self._random = random.Random()
+        self._condition = threading.Condition()
+        self._limit = float(min(max(initial, minimum), maximum))
+        self._in_flight = 0
+        self._decreased_at = float('-inf')
+        self._reset_counters()
+
+    def _reset_counters(self) -> None:
+        self._lowest = self._limit
+        self._peak_in_flight = self._in_flight
+        self._throttled = 0
+        self._decreases = 0
+        self._slot_wait = 0.0
+        self._token_wait = 0.0
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def run(self, request: Callable[[], T]) -> T:
+        """
+        Send a request within the limits, retrying it while S3 throttles it.
+
+        Args:
+            request (Callable[[], T]): Makes one S3 request
+        Returns:
+            T: What the request returned
+        Raises:
+            ClientError: The error of the request; a throttling error after THROTTLED_ATTEMPTS attempts
+        """
+        for attempt in range(THROTTLED_ATTEMPTS):
+            token_wait = self.rate_limit.acquire()
+            started = self._acquire_slot(token_wait)
+            try:
+                result = request()
+            except ClientError as e:
+                throttled = is_throttling_error(e)
+                self._release(started, congested=throttled, throttled=throttled)
+                if not throttled or attempt == THROTTLED_ATTEMPTS - 1:
+                    raise
+                delay = self._random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+                logger.info(f"S3 throttled a write, retrying in {delay:.2f}s with concurrency limit {self.limit}")
+                self._sleep(delay)
+                continue
+            except BaseException:
+                self._release(started)
+                raise
+            latency = self._clock() - started
+            self._release(started, congested=bool(self.latency_target) and latency > self.latency_target, succeeded=True)
+            return result
+
+    def _acquire_slot(self, token_wait: float) -> float:
+        """
+        Wait until fewer than limit requests are in flight and take a slot.
+
+        Returns:
+            float: Clock time the request starts at
+        """
+        with self._condition:
+            waiting_since = self._clock()
+            while self._in_flight >= int(self._limit):
+                self._condition.wait()
+            started = self._clock()
+            self._in_flight += 1
+            self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+            self._slot_wait += started - waiting_since
+            self._token_wait += token_wait
+            return started
+
+    def _release(self, started: float, congested: bool = False, throttled: bool = False,
+                 succeeded: bool = False) -> None:
+        with self._condition:
+            self._in_flight -= 1
+            if throttled:
+                self._throttled += 1
+            if congested:
+                if started >= self._decreased_at:
+                    self._limit = max(float(self.minimum), self._limit * self.backoff)
+                    self._lowest = min(self._lowest, self._limit)
+                    self._decreases += 1
+                    self._decreased_at = self._clock()
+            elif succeeded:
+                self._limit = min(float(self.maximum), self._limit + 1 / self._limit)
+            self._condition.notify_all()
+
+    def snapshot(self, reset: bool = True) -> Dict[str, float]:
+        """
+        The limiter state, and counters since the last reset.
+
+        Returns:
+            Dict[str, float]: limit, lowest_limit, peak_in_flight, throttled, decreases,
+            slot_wait_seconds and token_wait_seconds
+        """
+        with self._condition:
+            state = {
+                'limit': int(self._limit),
+                'lowest_limit': int(self._lowest),
+                'peak_in_flight': self._peak_in_flight,
+                'throttled': self._throttled,
+                'decreases': self._decreases,
+                'slot_wait_seconds': self._slot_wait,
+                'token_wait_seconds': self._token_wait,
+            }
+            if reset:
+                self._reset_counters()
+            return state
@@ -5,17 +5,194 @@
 import boto3
 import json
 import os
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
 from botocore.exceptions import ClientError
 from botocore.config import Config
+from article_parser import ArticleParser, ArticleRecord, ParseStats, parse_lines_task, parse_slice_task
+from checkpoint import (DEFAULT_CHECKPOINT_PREFIX, DEFAULT_DEADLINE_MARGIN_SECONDS, Checkpoint, Deadline,
+                        DeadlineReached, ReadProgress, S3CheckpointStore)
 from html_sanitizer import HTMLSanitizer
+from known_objects import DEFAULT_KNOWN_OBJECTS_MAX_ENTRIES, KnownObjects
+from lob_router import LobRouter
+from record_validator import RecordValidator, format_rejects
+from s3_limiter import AdaptiveLimiter, TokenBucket
+from metrics import BYTES, COUNT, MILLISECONDS, MetricsRecorder
+from process_pool import available_cpus, shared_pool
+from sanitize_cache import shared_cache
+from spill_file import SpillBudget, SpillFile
+from tombstones import TOMBSTONE_SUBPREFIX, S3TombstoneStore
+from write_ledger import Claim, WriteLedger, record_version
+import collections
 import concurrent.futures
+import gzip
+import hashlib
+import io
+import itertools
+import threading
 from logger import get_logger
 from urllib.parse import unquote_plus
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 # Configure logging
 logger = get_logger(__name__)  
 
+# Per-record outcomes returned by the batch operations; also the count names
+# in the controller response
+SUCCESSFUL = 'successful'
+FAILED = 'failed'
+SKIPPED = 'skipped'
+
+# How articles are parsed and sanitized: in the handler process, or fanned
+# out to a pool of worker processes to use more than one vCPU
+SANITIZE_MODES = ('thread', 'process')
+
+# Content-Encoding of uploaded HTML; 'br' needs the optional brotli package
+IDENTITY = 'identity'
+OUTPUT_ENCODINGS = (IDENTITY, 'gzip', 'br')
+
+# Most keys a single DeleteObjects request accepts
+DELETE_OBJECTS_MAX_KEYS = 1000
+
+# User metadata keys of uploaded HTML: the SHA-256 of the HTML, and the
+# LastModifiedDate and ArticleNumber of the Salesforce version it came from
+CONTENT_DIGEST_METADATA_KEY = 'content-sha256'
+SOURCE_MODIFIED_METADATA_KEY = 'source-last-modified'
+ARTICLE_NUMBER_METADATA_KEY = 'article-number'
+
+# Export objects at least this large are read with concurrent ranged GETs of
+# RANGE_PART_SIZE bytes instead of a single stream; 0 disables ranged reads
+DEFAULT_RANGE_THRESHOLD = 64 * 1024 * 1024
+DEFAULT_RANGE_PART_SIZE = 8 * 1024 * 1024
+
+# Export objects at least this large are downloaded to ephemeral storage and
+# memory-mapped, as long as they fit in EPHEMERAL_STORAGE; 0 disables spilling
+DEFAULT_SPILL_THRESHOLD = 256 * 1024 * 1024
+DEFAULT_EPHEMERAL_STORAGE = 512 * 1024 * 1024
+
+# Spilled parts are streamed to the file in chunks of this size, so a part
+# is never held in memory whole
+SPILL_WRITE_CHUNK_SIZE = 1024 * 1024
+
+# Conditional puts are retried this many times when another writer changes
+# the object between the HEAD and the PUT
+CONDITIONAL_WRITE_ATTEMPTS = 3
+
+class StoredObject(NamedTuple):
+    """
+    What is known about an uploaded HTML object.
+    """
+    etag: Optional[str]
+    digest: Optional[str]
+    source_modified: Optional[str]
+
+def is_newer(stored_modified: Optional[str], source_modified: Optional[str]) -> bool:
+    """
+    Whether the stored object comes from a later Salesforce version than the record.
+    """
+    return bool(stored_modified and source_modified and stored_modified > source_modified)
+
+def is_precondition_failure(error: ClientError) -> bool:
+    """
+    Whether a conditional request lost a race with another writer.
+    """
+    return error.response['Error']['Code'] in ('PreconditionFailed', 'ConditionalRequestConflict', '412', '409')
+
+def object_changed_error(s3_key: str) -> ClientError:
+    """
+    The error raised when the parts of one read came from different versions of an object.
+    """
+    return ClientError(
+        {'Error': {'Code': 'PreconditionFailed', 'Message': f"{s3_key} changed while it was being read"}},
+        'GetObject'
+    )
+
+def when_all(futures: List[concurrent.futures.Future], callback: Callable[[], None]) -> None:
+    """
+    Calls callback once every future has finished, or immediately if there are none.
+    """
+    if not futures:
+        callback()
+        return
+    lock = threading.Lock()
+    remaining = [len(futures)]
+
+    def finished(_):
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            callback()
+
+    for future in futures:
+        future.add_done_callback(finished)
+
+def content_digest(content: str, encoding: str = IDENTITY) -> str:
+    """
+    Returns the hex SHA-256 digest of sanitized HTML content. Compressed
+    uploads mix in the encoding, so changing OUTPUT_ENCODING rewrites objects.
+    """
+    digest = hashlib.sha256(content.encode('utf-8'))
+    if encoding != IDENTITY:
+        digest.update(f"\0{encoding}".encode('utf-8'))
+    return digest.hexdigest()
+
+def compress_html(content: str, encoding: str) -> bytes:
+    """
+    Compresses sanitized HTML for upload with the given Content-Encoding.
+
+    Args:
+        content (str): Sanitized HTML.
+        encoding (str): 'gzip' or 'br'.
+
+    Returns:
+        bytes: The compressed UTF-8 body.
+    """
+    data = content.encode('utf-8')
+    if encoding == 'gzip':
+        # Fixed mtime keeps the body deterministic for identical content
+        return gzip.compress(data, compresslevel=6, mtime=0)
+    if encoding == 'br':
+        return brotli.compress(data, mode=brotli.MODE_TEXT, quality=5)
+    raise ValueError(f"Unsupported output encoding: {encoding}")
+
+def iter_batches(records: Iterable, batch_size: int) -> Iterator[List]:
+    """
+    Groups a stream of records (or raw lines) into lists of at most batch_size items.
+    """
+    iterator = iter(records)
+    while True:
+        batch = list(itertools.islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+def completed_outcomes(outcome: str, count: int) -> List[concurrent.futures.Future]:
+    """
+    Returns count already-resolved futures for records that need no S3 request.
+    """
+    futures = []
+    for _ in range(count):
+        future = concurrent.futures.Future()
+        future.set_result(outcome)
+        futures.append(future)
+    return futures
+
+def resolve_outcomes(request: concurrent.futures.Future, futures: List[concurrent.futures.Future]) -> None:
+    """
+    Completes per-file futures from a request future that resolves to a list of outcomes.
+    """
+    try:
+        outcomes = request.result()
+    except Exception as e:
+        logger.error(f"S3 request failed: {str(e)}")
+        outcomes = [FAILED] * len(futures)
+    for future, outcome in zip(futures, outcomes):
+        future.set_result(outcome)
+
 # Configure boto3 with retries and timeouts
 boto3_config = Config(
     retries=dict(
@@ -27,11 +204,85 @@ boto3_config = Config(
 )
 
 class S3Manager:
-    def __init__(self, config):
-        self.s3_client = boto3.client('s3', config=boto3_config)
+    def __init__(self, config, s3_client=None, metrics: Optional[MetricsRecorder] = None, checkpoints=None,
+                 sqs_client=None, tombstones=None):
+        # One shared executor runs every S3 request and the connection pool
+        # matches it. The requests that write articles (HEAD, PUT, DeleteObjects)
+        # start at MAX_THREADS concurrent requests and write_limiter adapts that
+        # between 1 and S3_MAX_CONCURRENCY
+        max_concurrency = max(config['MAX_THREADS'], config.get('S3_MAX_CONCURRENCY', config['MAX_THREADS']))
+        self.s3_client = s3_client or boto3.client(
+            's3', config=boto3_config.merge(Config(max_pool_connections=max_concurrency))
+        )
+        self.io_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix='s3-io'
+        )
+        self.write_limiter = AdaptiveLimiter(
+            config['MAX_THREADS'], max_concurrency, latency_target=config.get('S3_LATENCY_TARGET', 0),
+            rate_limit=TokenBucket(config.get('S3_REQUEST_RATE', 0))
+        )
+        # Export files from one event are read and sanitized concurrently, so the
+        # next file downloads while another is sanitizing; their uploads share
+        # io_executor
+        self.object_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=config.get('OBJECT_CONCURRENCY', 4), thread_name_prefix='s3-object'
+        )
         self.config = config
-        self.sanitizer = HTMLSanitizer()
+        # Compiled once; a malformed LOB_MAPPING fails here rather than in every batch
+        self.lob_router = LobRouter.parse(config.get('LOB_MAPPING', ''))
+        if config.get('SANITIZE_MODE', 'thread') not in SANITIZE_MODES:
+            raise ValueError(f"Unknown SANITIZE_MODE '{config['SANITIZE_MODE']}', expected one of: {', '.join(SANITIZE_MODES)}")
+        self.sanitizer = HTMLSanitizer(cache=shared_cache())
         self.content_field = os.environ.get('CONTENT_FIELD', 'Content__c')
+        # Compiled once; a malformed RECORD_SCHEMA fails here like LOB_MAPPING
+        self.record_schema = config.get('RECORD_SCHEMA', '')
+        self.article_parser = ArticleParser(
+            self.content_field, self.sanitizer, RecordValidator.from_json(self.record_schema, self.content_field)
+        )
+        self.skip_unchanged = config.get('SKIP_UNCHANGED', True)
+        self.output_encoding = config.get('OUTPUT_ENCODING', IDENTITY)
+        if self.output_encoding not in OUTPUT_ENCODINGS:
+            raise ValueError(f"Unknown OUTPUT_ENCODING '{self.output_encoding}', expected one of: {', '.join(OUTPUT_ENCODINGS)}")
+        if self.output_encoding == 'br' and brotli is None:
+            raise ValueError("OUTPUT_ENCODING 'br' requires the brotli package")
+        self.range_threshold = config.get('RANGE_THRESHOLD', DEFAULT_RANGE_THRESHOLD)
+        self.range_part_size = config.get('RANGE_PART_SIZE', DEFAULT_RANGE_PART_SIZE)
+        if self.range_part_size <= 0:
+            raise ValueError(f"RANGE_PART_SIZE must be positive, got {self.range_part_size}")
+        self.spill_threshold = config.get('SPILL_THRESHOLD', DEFAULT_SPILL_THRESHOLD)
+        # Ephemeral storage shared by concurrent spills, less what the sanitize
+        # cache may keep on disk
+        spill_bytes = config.get('EPHEMERAL_STORAGE', DEFAULT_EPHEMERAL_STORAGE)
+        if self.sanitizer.cache is not None and self.sanitizer.cache.disk_dir:
+            spill_bytes -= self.sanitizer.cache.disk_max_bytes
+        self.spill_budget = SpillBudget(spill_bytes, config.get('SPILL_DIR'))
+        # StoredObject (None when absent) of objects this manager has written or
+        # looked up, keyed by (bucket, key), so most articles need no HEAD request.
+        # Kept across warm invocations; writes conditional on the cached ETag
+        # catch entries made stale by other execution environments
+        self.known_objects = KnownObjects(config.get('KNOWN_OBJECTS_MAX_ENTRIES', DEFAULT_KNOWN_OBJECTS_MAX_ENTRIES))
+        # Newest article version scheduled per output key; cleared per invocation
+        self.ledger = WriteLedger()
+        # Stage timings and counters, emitted as EMF once per invocation
+        self.metrics = metrics if metrics is not None else MetricsRecorder.from_env()
+        # Files still being read shortly before the invocation deadline are
+        # checkpointed and continued by another invocation; without a store
+        # they are read to the end
+        if checkpoints is None and config.get('CHECKPOINT_BUCKET'):
+            checkpoints = S3CheckpointStore(
+                self.s3_client, config['CHECKPOINT_BUCKET'], config.get('CHECKPOINT_PREFIX', DEFAULT_CHECKPOINT_PREFIX)
+            )
+        self.checkpoints = checkpoints
+        # Versions that deleted HTML objects, kept next to the checkpoints; without
+        # a store a delayed older export can recreate a deleted article
+        if tombstones is None and config.get('CHECKPOINT_BUCKET'):
+            tombstones = S3TombstoneStore(
+                self.s3_client, config['CHECKPOINT_BUCKET'],
+                config.get('CHECKPOINT_PREFIX', DEFAULT_CHECKPOINT_PREFIX) + TOMBSTONE_SUBPREFIX
+            )
+        self.tombstones = tombstones
+        self.deadline_margin = config.get('DEADLINE_MARGIN', DEFAULT_DEADLINE_MARGIN_SECONDS)
+        self.sqs_client = sqs_client or (boto3.client('sqs', config=boto3_config) if config.get('QUEUE_URL') else None)
     
     def list_s3_objects(self, bucket: str, prefix: str = '') -> List[str]:
         """
@@ -52,62 +303,288 @@ class S3Manager:
             logger.error(f"Error listing objects in bucket {bucket}: {str(e)}")
             raise
     
-    def read_s3_object(self, bucket: str, s3_key: str) -> List[Dict]:
+    def read_s3_object(self, bucket: str, s3_key: str, size: Optional[int] = None) -> List[ArticleRecord]:
         """
         Reads a JSON object from S3 and returns its contents.
 
         Args:
             bucket (str): The name of the S3 bucket.
             key (str): The key of the S3 object.
+            size (Optional[int]): The object size from the S3 event, if known.
 
         Returns:
-            List[Dict]: A list of dictionaries representing the JSON objects read from the S3 object.
+            List[ArticleRecord]: The sanitized articles read from the S3 object.
+        """
+        return list(self.iter_s3_object(bucket, s3_key, size))
+
+    def iter_s3_object(self, bucket: str, s3_key: str, size: Optional[int] = None,
+                       progress: Optional[ReadProgress] = None) -> Iterator[ArticleRecord]:
+        """
+        Streams a JSON Lines object from S3, yielding each valid article as soon
+        as it has been sanitized so callers never hold the whole file in memory.
+        Objects of at least SPILL_THRESHOLD bytes are spilled to ephemeral
+        storage when they fit, and objects of at least RANGE_THRESHOLD bytes are
+        otherwise downloaded in parallel byte ranges; articles are yielded in
+        file order either way.
+
+        Args:
+            bucket (str): The name of the S3 bucket.
+            s3_key (str): The key of the S3 object.
+            size (Optional[int]): The object size from the S3 event, if known.
+            progress (Optional[ReadProgress]): Offset to start at and deadline to stop reading at, if given;
+                its offset is advanced past every line handed to the parser.
+
+        Yields:
+            ArticleRecord: A sanitized article.
         """
         try:
             logger.info(f"Reading object {s3_key} from bucket {bucket}")
+            stats = ParseStats()
+            start = progress.offset if progress is not None else 0
+            remaining = size - start if size is not None else None
+            if remaining is not None and self.spill_threshold and remaining >= self.spill_threshold \
+                    and self.spill_budget.reserve(remaining):
+                articles = self.iter_spilled(bucket, s3_key, size, stats, progress)
+            else:
+                if remaining is not None and self.range_threshold and remaining >= self.range_threshold:
+                    lines = self.iter_ranged_lines(bucket, s3_key, size, progress)
+                else:
+                    with self.metrics.timer('S3GetLatency', Lob=self.lob_router.route(s3_key).lob):
+                        response = self.s3_client.get_object(
+                            Bucket=bucket, Key=s3_key, **({'Range': f"bytes={start}-"} if start else {})
+                        )
+                    if progress is not None and not progress.check_etag(response.get('ETag')):
+                        raise object_changed_error(s3_key)
+                    lines = response['Body']._raw_stream
+                if progress is not None:
+                    lines = progress.lines(lines)
+
+                if self.config.get('SANITIZE_MODE') == 'process':
+                    articles = self.iter_parsed_in_processes(lines, stats)
+                else:
+                    articles = (self.article_parser.parse_line(line, stats) for line in lines)
+
+            record_count = 0
             try:
-                response = self.s3_client.get_object(Bucket=bucket, Key=s3_key)
-            except ClientError as e:
-                if e.response['Error']['Code'] == 'NoSuchKey':
-                    logger.error(f"Object {s3_key} not found in bucket {bucket}")
-                    return []
-                raise
-            
-            articles = []
-            # Use streaming to process the file in chunks
-            for line in response['Body']._raw_stream:
-                line = line.decode('utf-8').strip()
-                if not line:
-                    continue
-                    
-                try:
-                    article = json.loads(line)
-                    if not self.validate_article(article):
+                for article in articles:
+                    if article is None:
                         continue
-                    
-                    # Process valid articles with dict comprehension
-                    sanitized_article = {
-                        **article,
-                        'Title': self.sanitizer.sanitize_html(article['Title']),
-                        self.content_field: self.sanitizer.sanitize_html(article[self.content_field])
-                    }
-                    articles.append(sanitized_article)
-                    
-                except json.JSONDecodeError as e:
-                    logger.error(f"Error parsing JSON line: {line[:100]}... Error: {str(e)}")
-                    continue
-                except Exception as e:
-                    logger.error(f"Error processing line: {str(e)}")
-                    continue
-            
-            logger.info(f"Successfully read {len(articles)} records from {s3_key}")
-            return articles
+                    record_count += 1
+                    yield article
+            finally:
+                self.record_parse_stats(self.lob_router.route(s3_key).lob, stats)
+                if stats.rejects:
+                    logger.warning(f"Rejected articles in {s3_key}: {format_rejects(stats.rejects)}")
+
+            logger.info(f"Successfully read {record_count} records from {s3_key}")
             
         except ClientError as e:
             error_code = e.response['Error']['Code']
+            if error_code == 'NoSuchKey':
+                logger.error(f"Object {s3_key} not found in bucket {bucket}")
+                return
             logger.error(f"Error reading S3 object {s3_key}: {error_code} - {str(e)}")
             raise
 
+    def iter_ranged_lines(self, bucket: str, s3_key: str, size: int,
+                          progress: Optional[ReadProgress] = None) -> Iterator[bytes]:
+        """
+        Downloads an object as RANGE_PART_SIZE byte ranges on the I/O executor,
+        at most MAX_THREADS parts ahead of the reader, and yields its
+        lines in file order. A line crossing a part boundary is carried over and
+        completed by the next part, so lines are the same as a single stream's.
+
+        Args:
+            bucket (str): The name of the S3 bucket.
+            s3_key (str): The key of the S3 object.
+            size (int): The object size in bytes.
+            progress (Optional[ReadProgress]): Gives the line-aligned offset to start at and the ETag
+                of the object version already read, if any.
+
+        Yields:
+            bytes: A line, including its trailing newline.
+
+        Raises:
+            ClientError: If a part could not be read, e.g. the object was replaced mid-read.
+        """
+        version = progress if progress is not None else ReadProgress()
+        ranges = self.part_ranges(size, version.offset)
+        window = self.config['MAX_THREADS']
+        pending = collections.deque(
+            self.io_executor.submit(self.get_range, bucket, s3_key, first, last)
+            for first, last in itertools.islice(ranges, window)
+        )
+        logger.info(f"Reading {size} bytes of {s3_key} in ranges of {self.range_part_size} bytes")
+
+        carry = b''
+        try:
+            while pending:
+                part_etag, data = pending.popleft().result()
+                for first, last in itertools.islice(ranges, 1):
+                    pending.append(self.io_executor.submit(self.get_range, bucket, s3_key, first, last))
+                # Every part must come from the same version of the object
+                if not version.check_etag(part_etag):
+                    raise object_changed_error(s3_key)
+                end = data.rfind(b'\n')
+                if end == -1:
+                    carry += data
+                    continue
+                start = data.index(b'\n') + 1
+                yield carry + data[:start]
+                yield from io.BytesIO(data[start:end + 1])
+                carry = data[end + 1:]
+            if carry:
+                yield carry
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def record_parse_stats(self, lob: str, stats: ParseStats) -> None:
+        """
+        Adds the counters of one read to the invocation's metrics.
+        """
+        self.metrics.count('BytesRead', stats.bytes, BYTES, Lob=lob)
+        self.metrics.count('LinesDecoded', stats.lines, Lob=lob)
+        self.metrics.count('MalformedLines', stats.malformed, Lob=lob)
+        self.metrics.count('SanitizeCpuTime', stats.sanitize_seconds * 1000, MILLISECONDS, Lob=lob)
+        for (field, reason), count in stats.rejects.items():
+            self.metrics.count('ValidationRejects', count, Lob=lob, Field=field, Reason=reason)
+
+    def record_limiter_state(self) -> None:
+        """
+        Adds the write limiter's state since the last call to the invocation's metrics.
+        """
+        state = self.write_limiter.snapshot()
+        self.metrics.observe('S3WriteConcurrencyLimit', state['limit'], COUNT)
+        self.metrics.observe('S3WriteConcurrencyLowest', state['lowest_limit'], COUNT)
+        self.metrics.observe('S3WritePeakInFlight', state['peak_in_flight'], COUNT)
+        self.metrics.count('S3WriteThrottles', state['throttled'])
+        self.metrics.count('S3WriteBackoffs', state['decreases'])
+        self.metrics.count('S3WriteSlotWait', state['slot_wait_seconds'] * 1000, MILLISECONDS)
+        self.metrics.count('S3WriteRateLimitWait', state['token_wait_seconds'] * 1000, MILLISECONDS)
+
+    def part_ranges(self, size: int, start: int = 0) -> Iterator[Tuple[int, int]]:
+        """
+        Yields:
+            Tuple[int, int]: First and last byte of each RANGE_PART_SIZE part of an object of size bytes,
+            from byte start
+        """
+        for first in range(start, size, self.range_part_size):
+            yield first, min(first + self.range_part_size, size) - 1
+
+    def get_range(self, bucket: str, s3_key: str, first: int, last: int) -> Tuple[str, bytes]:
+        """
+        Returns:
+            Tuple[str, bytes]: The ETag of the object and the bytes first to last inclusive
+        """
+        with self.metrics.timer('S3GetLatency', Lob=self.lob_router.route(s3_key).lob):
+            response = self.s3_client.get_object(Bucket=bucket, Key=s3_key, Range=f"bytes={first}-{last}")
+            return response['ETag'], response['Body'].read()
+
+    def iter_spilled(self, bucket: str, s3_key: str, size: int, stats: Optional[ParseStats] = None,
+                     progress: Optional[ReadProgress] = None) -> Iterator[Optional[ArticleRecord]]:
+        """
+        Downloads an object into ephemeral storage with parallel ranged GETs,
+        at most MAX_THREADS parts at a time, each streamed to the file in
+        SPILL_WRITE_CHUNK_SIZE chunks; then memory-maps it and indexes its
+        line offsets once. In process mode the
+        workers parse disjoint line-aligned slices straight from the file, so
+        only offsets cross the pipe; otherwise lines are parsed from the map.
+        The file is deleted and its spill_budget reservation released when the
+        iterator finishes.
+
+        Args:
+            bucket (str): The name of the S3 bucket.
+            s3_key (str): The key of the S3 object.
+            size (int): The object size in bytes; the bytes from the start offset on are already reserved
+                in spill_budget.
+            stats (Optional[ParseStats]): Counters of the read, if given.
+            progress (Optional[ReadProgress]): Offset to start at and deadline to stop parsing at, if given.
+
+        Yields:
+            Optional[ArticleRecord]: A sanitized article, or None for a rejected line in thread mode.
+        """
+        spill = None
+        offset = progress.offset if progress is not None else 0
+        try:
+            spill = SpillFile(size - offset, self.spill_budget.directory)
+
+            def fetch_part(first: int, last: int) -> str:
+                with self.metrics.timer('S3GetLatency', Lob=self.lob_router.route(s3_key).lob):
+                    response = self.s3_client.get_object(Bucket=bucket, Key=s3_key, Range=f"bytes={first}-{last}")
+                    position = first - offset
+                    for chunk in response['Body'].iter_chunks(SPILL_WRITE_CHUNK_SIZE):
+                        spill.write_at(position, chunk)
+                        position += len(chunk)
+                return response['ETag']
+
+            ranges = self.part_ranges(size, offset)
+            pending = collections.deque(
+                self.io_executor.submit(fetch_part, first, last)
+                for first, last in itertools.islice(ranges, self.config['MAX_THREADS'])
+            )
+            etags = set()
+            try:
+                while pending:
+                    etags.add(pending.popleft().result())
+                    for first, last in itertools.islice(ranges, 1):
+                        pending.append(self.io_executor.submit(fetch_part, first, last))
+            finally:
+                # Parts still being written must finish before the file is closed
+                for future in pending:
+                    future.cancel()
+                concurrent.futures.wait(pending)
+            if len(etags) > 1 or (progress is not None and not progress.check_etag(etags.pop())):
+                raise object_changed_error(s3_key)
+
+            spill.index()
+            logger.info(f"Spilled {size - offset} bytes of {s3_key} to {spill.path}, {spill.line_count} lines")
+            if self.config.get('SANITIZE_MODE') == 'process':
+                pool = shared_pool(self.config.get('SANITIZE_WORKERS') or available_cpus())
+                slices = spill.slices(self.config.get('SANITIZE_CHUNK_SIZE', 50))
+                if progress is not None:
+                    slices = progress.slices(slices, offset)
+                tasks = (
+                    (self.content_field, self.sanitizer.parser, self.record_schema, spill.path, start, end)
+                    for start, end in slices
+                )
+                for articles, task_stats in pool.imap(parse_slice_task, tasks):
+                    if stats is not None:
+                        stats.merge(task_stats)
+                    yield from articles
+            else:
+                lines = spill.lines()
+                if progress is not None:
+                    lines = progress.lines(lines)
+                for line in lines:
+                    yield self.article_parser.parse_line(line, stats)
+        finally:
+            if spill is not None:
+                spill.close()
+            self.spill_budget.release(size - offset)
+
+    def iter_parsed_in_processes(self, lines: Iterable[bytes], stats: Optional[ParseStats] = None) -> Iterator[ArticleRecord]:
+        """
+        Parses and sanitizes lines in the worker process pool, SANITIZE_CHUNK_SIZE
+        lines per task, yielding articles in file order.
+
+        Args:
+            lines (Iterable[bytes]): Raw lines of the export file.
+            stats (Optional[ParseStats]): Receives the counters of every task, if given.
+
+        Yields:
+            ArticleRecord: A sanitized article.
+        """
+        pool = shared_pool(self.config.get('SANITIZE_WORKERS') or available_cpus())
+        tasks = (
+            (self.content_field, self.sanitizer.parser, self.record_schema, chunk)
+            for chunk in iter_batches(lines, self.config.get('SANITIZE_CHUNK_SIZE', 50))
+        )
+        for articles, task_stats in pool.imap(parse_lines_task, tasks):
+            if stats is not None:
+                stats.merge(task_stats)
+            yield from articles
+
     def validate_article(self, article: Dict) -> bool:
         """
         Validate required fields in the article
@@ -116,22 +593,64 @@ class S3Manager:
         Returns:
             bool: True if article is valid, False otherwise
         """
-        REQUIRED_FIELDS = frozenset({"Id", "Title", "ArticleNumber", self.content_field})
-        
-        if not isinstance(article, dict):
-            logger.error("Article data must be a dictionary")
-            return False
+        return self.article_parser.validate_article(article)
 
-        missing_fields = {field for field in REQUIRED_FIELDS if not article.get(field)}
-        if missing_fields:
-            logger.error(f"Invalid or missing required fields: {', '.join(missing_fields)}")
-            return False
-        
-        return True
+    def get_stored_object(self, bucket: str, key: str, recheck_absent: bool = False) -> Optional[StoredObject]:
+        """
+        Returns the ETag and metadata of an existing HTML object.
+
+        Args:
+            bucket (str): The name of the S3 bucket.
+            key (str): The key of the HTML object.
+            recheck_absent (bool): Look up an object cached as absent by an earlier invocation again. Deletes
+                need this: unlike a conditional write, nothing would catch an object created since.
+
+        Returns:
+            Optional[StoredObject]: The stored object, or None if it does not exist. Digest and
+            source version are None for objects uploaded before they were recorded.
+
+        Raises:
+            ClientError: If the object could not be inspected; writing blindly could
+            replace a newer version.
+        """
+        known = self.cached_object(bucket, key, recheck_absent)
+        if known is not False:
+            return known
 
-    def save_html_batch(self, html_files: List[Tuple[str, str, str, str]]) -> List[bool]:
+        try:
+            with self.metrics.timer('S3HeadLatency', Lob=self.lob_router.lob_for_bucket(bucket)):
+                response = self.write_limiter.run(lambda: self.s3_client.head_object(Bucket=bucket, Key=key))
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+                self.known_objects[(bucket, key)] = None
+                return None
+            logger.warning(f"Could not read metadata for {key}: {e.response['Error'].get('Message', str(e))}")
+            raise
+
+        metadata = response.get('Metadata', {})
+        stored = StoredObject(
+            response.get('ETag'),
+            metadata.get(CONTENT_DIGEST_METADATA_KEY),
+            metadata.get(SOURCE_MODIFIED_METADATA_KEY)
+        )
+        self.known_objects[(bucket, key)] = stored
+        return stored
+
+    def cached_object(self, bucket: str, key: str, recheck_absent: bool = False) -> Union[StoredObject, None, bool]:
+        """
+        Returns:
+            Union[StoredObject, None, bool]: The cached stored object, None if cached as absent, or False
+            if it has to be looked up.
         """
-        Saves multiple HTML files to S3 in batch.
+        known = self.known_objects.get((bucket, key), False)
+        if known is None and recheck_absent:
+            return self.known_objects.get((bucket, key), False, current=True)
+        return known
+
+    def save_html_batch(self, html_files: List[Tuple[str, str, str, str]]) -> List[str]:
+        """
+        Saves multiple HTML files to S3 in batch. Files whose content matches the
+        digest already stored for their key are skipped.
 
         Args:
             html_files (List[Tuple[str, str, str, str]]): A list of tuples where each tuple contains:
@@ -141,47 +660,121 @@ class S3Manager:
                 - prefix (str): The prefix to use for the S3 key.
 
         Returns:
-            List[bool]: A list of boolean values indicating the success (True) or failure (False) of each save operation.
+            List[str]: The outcome of each save operation: SUCCESSFUL, SKIPPED or FAILED.
         """
         if not html_files:
             return []
 
-        # Define common parameters
-        common_params = {
-            'ContentType': 'text/html',
-            'CacheControl': 'max-age=3600'
-        }
+        # Compress in the calling thread so upload threads only do I/O
+        bodies = [self.encode_body(file_tuple[0]) for file_tuple in html_files]
+        return list(self.io_executor.map(self.save_html_file, html_files, bodies))
+
+    def encode_body(self, content: str) -> Optional[bytes]:
+        """
+        Returns the compressed upload body for OUTPUT_ENCODING, or None when
+        HTML is uploaded uncompressed.
+        """
+        if self.output_encoding == IDENTITY or not content:
+            return None
+        return compress_html(content, self.output_encoding)
+
+    def save_html_file(self, file_tuple: Tuple[str, str, str, str, str], body: Optional[bytes] = None,
+                       source: Optional[ArticleRecord] = None) -> str:
+        """
+        Saves one HTML file to S3 unless the stored object comes from a newer
+        Salesforce version or its content digest is unchanged. The put is
+        conditional on the object not having changed since it was inspected.
+        An unchanged object from an older version keeps its content but gets
+        the record's version metadata, so older exports still lose to it. A
+        missing object is not created from a version older than the one that
+        deleted it, if a tombstone store is configured.
+
+        Args:
+            file_tuple (Tuple[str, str, str, str, str]): content, title, urlName, bucket and prefix.
+            body (Optional[bytes]): The content compressed by encode_body(), uploaded with Content-Encoding.
+            source (Optional[ArticleRecord]): The article record, for its LastModifiedDate and ArticleNumber.
 
-        # Use ThreadPoolExecutor for parallel uploads
-        with concurrent.futures.ThreadPoolExecutor(max_workers=self.config['MAX_THREADS']) as executor:
-            def upload_file(file_tuple):
-                content, title, urlName, bucket, prefix = file_tuple
+        Returns:
+            str: SUCCESSFUL, SKIPPED or FAILED.
+        """
+        content, title, urlName, bucket, prefix = file_tuple
+        try:
+            key = f"{prefix}{urlName}.html"
+            encoding = IDENTITY if body is None else self.output_encoding
+            digest = content_digest(content, encoding)
+            source_modified = source.last_modified_date if source is not None else None
+            metadata = {CONTENT_DIGEST_METADATA_KEY: digest}
+            if source_modified:
+                metadata[SOURCE_MODIFIED_METADATA_KEY] = source_modified
+            if source is not None and source.article_number:
+                metadata[ARTICLE_NUMBER_METADATA_KEY] = str(source.article_number)
+
+            for _ in range(CONDITIONAL_WRITE_ATTEMPTS):
+                stored = self.get_stored_object(bucket, key)
+                if stored is not None and is_newer(stored.source_modified, source_modified):
+                    logger.info(f"Skipping {key}: stored version from {stored.source_modified} is newer than {source_modified}")
+                    return SKIPPED
+                if stored is None and self.tombstones is not None:
+                    deleted = self.tombstones.load(bucket, key)
+                    if is_newer(deleted, source_modified):
+                        logger.info(f"Skipping {key}: deleted by version from {deleted}, newer than {source_modified}")
+                        return SKIPPED
+                unchanged = self.skip_unchanged and stored is not None and stored.digest == digest
+                if unchanged and not (stored.etag and is_newer(source_modified, stored.source_modified)):
+                    logger.debug(f"Skipping unchanged HTML file: {key}")
+                    return SKIPPED
+
+                headers = {
+                    'Metadata': metadata,
+                    'ContentType': 'text/html',
+                    'CacheControl': 'max-age=3600',
+                    **({} if body is None else {'ContentEncoding': encoding})
+                }
+                if unchanged:
+                    # The content is current but the record is newer: copy the
+                    # object onto itself with the record's version metadata, so a
+                    # delayed export older than the record cannot replace it
+                    request = lambda: self.s3_client.copy_object(
+                        Bucket=bucket, Key=key, CopySource={'Bucket': bucket, 'Key': key},
+                        CopySourceIfMatch=stored.etag, MetadataDirective='REPLACE', **headers
+                    )
+                else:
+                    # Only replace the object that was inspected, or create a new one
+                    condition = {'IfMatch': stored.etag} if stored is not None and stored.etag else {'IfNoneMatch': '*'}
+                    request = lambda: self.s3_client.put_object(
+                        Bucket=bucket, Key=key, Body=content if body is None else body, **headers, **condition
+                    )
                 try:
-                    key = f"{prefix}{urlName}.html"
-                    try:
-                        self.s3_client.put_object(
-                            Bucket=bucket,
-                            Key=key,
-                            Body=content,
-                            **common_params
-                        )
-                    except ClientError as e:
-                        logger.error(f"Failed to upload {key}: {e.response['Error']['Message']}")
-                        return False
-                    logger.debug(f"Successfully saved HTML file: {key}")
-                    return True
-                except Exception as e:
-                    logger.error(f"Error saving HTML file for {title}: {str(e)}")
-                    return False
-
-            # Execute uploads in parallel and collect results
-            results = list(executor.map(upload_file, html_files))
+                    with self.metrics.timer('S3PutLatency', Lob=self.lob_router.lob_for_bucket(bucket)):
+                        response = self.write_limiter.run(request)
+                except ClientError as e:
+                    # A copy whose source was deleted meanwhile fails with NoSuchKey
+                    if is_precondition_failure(e) or (unchanged and e.response['Error']['Code'] in ('404', 'NoSuchKey')):
+                        logger.info(f"{key} changed while uploading, re-reading its metadata")
+                        self.metrics.count('S3PutConflicts', Lob=self.lob_router.lob_for_bucket(bucket))
+                        self.known_objects.pop((bucket, key), None)
+                        continue
+                    logger.error(f"Failed to upload {key}: {e.response['Error']['Message']}")
+                    self.metrics.count('S3PutErrors', Lob=self.lob_router.lob_for_bucket(bucket))
+                    return FAILED
+                etag = response['CopyObjectResult'].get('ETag') if unchanged else response.get('ETag')
+                self.known_objects[(bucket, key)] = StoredObject(etag, digest, source_modified)
+                if unchanged:
+                    logger.debug(f"Recorded version {source_modified} of unchanged HTML file: {key}")
+                    return SKIPPED
+                logger.debug(f"Successfully saved HTML file: {key}")
+                return SUCCESSFUL
 
-        return results
-    
-    def delete_html_batch(self, files_to_delete: List[Tuple[str, str, str]]) -> List[bool]:
+            logger.error(f"Failed to upload {key}: it changed during {CONDITIONAL_WRITE_ATTEMPTS} conditional attempts")
+            return FAILED
+        except Exception as e:
+            logger.error(f"Error saving HTML file for {title}: {str(e)}")
+            return FAILED
+
+    def delete_html_batch(self, files_to_delete: List[Tuple[str, str, str]]) -> List[str]:
         """
-        Deletes multiple HTML files from S3 in batch.
+        Deletes multiple HTML files from S3 in batch, using one DeleteObjects
+        request per output bucket and 1000 keys.
 
         Args:
             files_to_delete (List[Tuple[str, str, str]]): A list of tuples where each tuple contains:
@@ -190,190 +783,504 @@ class S3Manager:
                 - prefix (str): The prefix used in the S3 key.
 
         Returns:
-            List[bool]: A list of boolean values indicating the success (True) or failure (False) of each delete operation.
+            List[str]: The outcome of each delete operation: SUCCESSFUL or FAILED.
         """
         if not files_to_delete:
             return []
 
-        # Use ThreadPoolExecutor for parallel deletions
-        with concurrent.futures.ThreadPoolExecutor(max_workers=self.config['MAX_THREADS']) as executor:
-            def delete_file(file_tuple):
-                title, urlName, bucket, prefix = file_tuple
-                try:
-                    key = f"{prefix}{urlName}.html"
-                    try:
-                        self.s3_client.delete_object(
-                            Bucket=bucket,
-                            Key=key
-                        )
-                    except ClientError as e:
-                        logger.error(f"Failed to delete {key}: {e.response['Error']['Message']}")
-                        return False
-                    logger.debug(f"Successfully deleted HTML file: {key}")
-                    return True
-                except Exception as e:
-                    logger.error(f"Error deleting HTML file for {title}: {str(e)}")
-                    return False
-
-            # Execute deletions in parallel and collect results
-            results = list(executor.map(delete_file, files_to_delete))
-
-        return results  
-    
+        return [future.result() for future in self.submit_deletes(files_to_delete)]
+
+    def submit_deletes(self, files_to_delete: List[Tuple[str, str, str, str]],
+                       claims: Optional[List[Optional[Claim]]] = None) -> List[concurrent.futures.Future]:
+        """
+        Queues DeleteObjects requests for the files on the shared I/O executor,
+        grouped by bucket in chunks of at most DELETE_OBJECTS_MAX_KEYS keys.
+
+        Args:
+            files_to_delete (List[Tuple[str, str, str, str]]): title, urlName, bucket and prefix of each file.
+            claims (Optional[List[Optional[Claim]]]): Write ledger claim of each file, from claim_write();
+                None for a file means a newer version is already claimed and it is skipped.
+
+        Returns:
+            List[concurrent.futures.Future]: One future per file, in input order, resolving to SUCCESSFUL,
+            SKIPPED or FAILED.
+        """
+        futures = []
+        ready_by_bucket: Dict[str, List[Tuple[Tuple[str, str, str, str], Optional[Claim], concurrent.futures.Future]]] = {}
+        for index, file_tuple in enumerate(files_to_delete):
+            bucket = file_tuple[2]
+            if claims is None:
+                future = concurrent.futures.Future()
+                ready_by_bucket.setdefault(bucket, []).append((file_tuple, None, future))
+                futures.append(future)
+                continue
+
+            claim = claims[index]
+            if claim is None:
+                logger.debug(f"Skipping delete of {file_tuple[1]}: a newer version is already scheduled")
+                futures.extend(completed_outcomes(SKIPPED, 1))
+            elif claim.previous is None:
+                ready_by_bucket.setdefault(bucket, []).append((file_tuple, claim, claim.future))
+                futures.append(claim.future)
+            else:
+                claim.when_ready(lambda bucket=bucket, entry=(file_tuple, claim, claim.future): self.send_deletes(bucket, [entry]))
+                futures.append(claim.future)
+
+        for bucket, entries in ready_by_bucket.items():
+            self.send_deletes(bucket, entries)
+
+        return futures
+
+    def send_deletes(self, bucket: str, entries: List[Tuple[Tuple[str, str, str, str], Optional[Claim], concurrent.futures.Future]]) -> None:
+        """
+        Submits DeleteObjects requests of at most DELETE_OBJECTS_MAX_KEYS keys for
+        (file_tuple, claim, future) entries of one bucket, resolving each future.
+        Stored versions of claimed keys are looked up in parallel first.
+        """
+        for start in range(0, len(entries), DELETE_OBJECTS_MAX_KEYS):
+            chunk = entries[start:start + DELETE_OBJECTS_MAX_KEYS]
+            lookups = [
+                self.io_executor.submit(self.get_stored_object, bucket, f"{prefix}{urlName}.html", True)
+                for (_, urlName, _, prefix), claim, _ in chunk
+                if claim is not None and self.cached_object(bucket, f"{prefix}{urlName}.html", True) is False
+            ]
+
+            def submit(chunk=chunk):
+                request = self.io_executor.submit(
+                    self.delete_html_chunk, bucket, [file_tuple for file_tuple, _, _ in chunk], [claim for _, claim, _ in chunk]
+                )
+                request.add_done_callback(
+                    lambda done: resolve_outcomes(done, [future for _, _, future in chunk])
+                )
+
+            when_all(lookups, submit)
+
+    def delete_html_chunk(self, bucket: str, files_to_delete: List[Tuple[str, str, str, str]],
+                          claims: Optional[List[Optional[Claim]]] = None) -> List[str]:
+        """
+        Deletes up to DELETE_OBJECTS_MAX_KEYS HTML files from one bucket with a single DeleteObjects request.
+
+        Args:
+            bucket (str): The name of the S3 bucket.
+            files_to_delete (List[Tuple[str, str, str, str]]): title, urlName, bucket and prefix of each file.
+            claims (Optional[List[Optional[Claim]]]): Write ledger claim of each file. Claimed files are
+                skipped when superseded by a newer version in this invocation or when the stored object
+                comes from a newer Salesforce version, and are deleted only if unchanged since inspected.
+                Their version is recorded as a tombstone when a tombstone store is configured.
+
+        Returns:
+            List[str]: SUCCESSFUL, SKIPPED or FAILED for each file; keys reported in the response Errors fail.
+        """
+        keys = [f"{prefix}{urlName}.html" for _, urlName, _, prefix in files_to_delete]
+        results: List[Optional[str]] = [None] * len(keys)
+        objects = {}
+        for index, key in enumerate(keys):
+            claim = claims[index] if claims else None
+            if claim is None:
+                objects.setdefault(key, {'Key': key})
+                continue
+            if not self.ledger.is_current((bucket, key), claim):
+                logger.debug(f"Skipping delete of {key}: superseded by a newer version")
+                results[index] = SKIPPED
+                continue
+            try:
+                stored = self.get_stored_object(bucket, key, recheck_absent=True)
+            except Exception as e:
+                logger.error(f"Failed to delete {key}: {str(e)}")
+                results[index] = FAILED
+                continue
+            if stored is None:
+                results[index] = self.record_deletion(bucket, key, claim.version[0], only_if_newer=True)
+            elif is_newer(stored.source_modified, claim.version[0]):
+                logger.info(f"Skipping delete of {key}: stored version from {stored.source_modified} is newer than {claim.version[0]}")
+                results[index] = SKIPPED
+            else:
+                objects[key] = {'Key': key, 'ETag': stored.etag} if stored.etag else {'Key': key}
+
+        if not objects:
+            return results
+
+        lob = self.lob_router.lob_for_bucket(bucket)
+        try:
+            with self.metrics.timer('S3DeleteLatency', Lob=lob):
+                response = self.write_limiter.run(lambda: self.s3_client.delete_objects(
+                    Bucket=bucket,
+                    Delete={'Objects': list(objects.values()), 'Quiet': True}
+                ))
+        except ClientError as e:
+            logger.error(f"Failed to delete {len(objects)} HTML files from {bucket}: {e.response['Error']['Message']}")
+            self.metrics.count('S3DeleteErrors', len(objects), Lob=lob)
+            return [FAILED if result is None else result for result in results]
+        except Exception as e:
+            logger.error(f"Error deleting {len(objects)} HTML files from {bucket}: {str(e)}")
+            self.metrics.count('S3DeleteErrors', len(objects), Lob=lob)
+            return [FAILED if result is None else result for result in results]
+
+        errors = {error.get('Key'): error for error in response.get('Errors', [])}
+        if errors:
+            self.metrics.count('S3DeleteErrors', len(errors), Lob=lob)
+        for index, key in enumerate(keys):
+            if results[index] is not None:
+                continue
+            if key in errors:
+                # A PreconditionFailed error means another writer changed the object;
+                # the message is retried and the stored version re-checked
+                logger.error(f"Failed to delete {key}: {errors[key].get('Code')} - {errors[key].get('Message')}")
+                self.known_objects.pop((bucket, key), None)
+                results[index] = FAILED
+                continue
+            self.known_objects[(bucket, key)] = None
+            logger.debug(f"Successfully deleted HTML file: {key}")
+            claim = claims[index] if claims else None
+            results[index] = self.record_deletion(bucket, key, claim.version[0]) if claim is not None else SUCCESSFUL
+        return results
+
+    def record_deletion(self, bucket: str, key: str, source_modified: Optional[str], only_if_newer: bool = False) -> str:
+        """
+        Records the version that deleted an HTML object in the tombstone store.
+        A successful delete never has a newer tombstone: the object would have
+        come from a newer version and not been deleted.
+
+        Args:
+            only_if_newer (bool): Keep an existing newer tombstone, for objects that were already absent.
+
+        Returns:
+            str: SUCCESSFUL, or FAILED if the tombstone could not be written; the message is then retried.
+        """
+        if self.tombstones is None or not source_modified:
+            return SUCCESSFUL
+        try:
+            if only_if_newer:
+                deleted = self.tombstones.load(bucket, key)
+                if deleted is not None and not is_newer(source_modified, deleted):
+                    return SUCCESSFUL
+            self.tombstones.save(bucket, key, source_modified)
+            return SUCCESSFUL
+        except Exception as e:
+            logger.error(f"Failed to record the deletion of {key}: {str(e)}")
+            return FAILED
+
+    def claim_write(self, record: ArticleRecord, bucket: str, prefix: str) -> Optional[Claim]:
+        """
+        Claims the record's output key in the write ledger.
+
+        Returns:
+            Optional[Claim]: The claim, or None if a newer version of the article is already claimed.
+        """
+        return self.ledger.claim((bucket, f"{prefix}{record.url_name}.html"), record_version(record))
+
+    def schedule_save(self, file_tuple: Tuple[str, str, str, str, str], claim: Optional[Claim],
+                      source: Optional[ArticleRecord] = None) -> concurrent.futures.Future:
+        """
+        Queues one upload on the shared I/O executor once the operation of any
+        superseded claim for the same key has finished.
+
+        Args:
+            file_tuple (Tuple[str, str, str, str, str]): content, title, urlName, bucket and prefix.
+            claim (Optional[Claim]): The write ledger claim from claim_write().
+            source (Optional[ArticleRecord]): The article record, for the version metadata.
+
+        Returns:
+            concurrent.futures.Future: Resolves to SUCCESSFUL, SKIPPED or FAILED; SKIPPED when a newer
+            version of the article is claimed before the upload starts.
+        """
+        content, _, urlName, bucket, prefix = file_tuple
+        key = f"{prefix}{urlName}.html"
+        if claim is None:
+            logger.debug(f"Skipping upload of {key}: a newer version is already scheduled")
+            return completed_outcomes(SKIPPED, 1)[0]
+
+        # Compressed here, on the thread reading the export file
+        body = self.encode_body(content)
+
+        def upload():
+            if not self.ledger.is_current((bucket, key), claim):
+                logger.debug(f"Skipping upload of {key}: superseded by a newer version")
+                return [SKIPPED]
+            return [self.save_html_file(file_tuple, body, source)]
+
+        claim.when_ready(
+            lambda: self.io_executor.submit(upload).add_done_callback(lambda done: resolve_outcomes(done, [claim.future]))
+        )
+        return claim.future
+
     def get_lob_bucket_mapping(self) -> Dict[str, str]:
         """
-        Parse the LOB_MAPPING environment variable to create a mapping of LOB prefixes to bucket names.
+        The LOB prefixes of LOB_MAPPING and their bucket names, as compiled into lob_router.
         
         Returns:
             Dict[str, str]: A dictionary mapping LOB prefixes to their corresponding bucket names
         """
-        mapping = {}
-        lob_mapping_str = self.config.get('LOB_MAPPING', '')
-        
-        for mapping_pair in lob_mapping_str.split(','):
-            if ':' in mapping_pair:
-                prefix, bucket = mapping_pair.strip().split(':')
-                mapping[prefix] = bucket
-                
-        return mapping
+        return dict(self.lob_router.mapping)
 
-    def process_batch(self, records: List[Dict], lob_prefix: str) -> List[bool]:
+    def process_batch(self, records: List[ArticleRecord], lob_prefix: str) -> List[str]:
         """
         Process a batch of records and save them as HTML files to S3.
 
         Args:
-            records (List[Dict]): A list of dictionaries representing the records to process.
+            records (List[ArticleRecord]): The sanitized articles to process.
+            lob_prefix (str): The LOB prefix to determine the output bucket.
+
+        Returns:
+            List[str]: The outcome (SUCCESSFUL, SKIPPED or FAILED) of saving or deleting each HTML file.
+        """
+        return [future.result() for future in self.submit_batch(records, lob_prefix)]
+
+    def submit_batch(self, records: List[ArticleRecord], lob_prefix: str) -> List[concurrent.futures.Future]:
+        """
+        Queues the uploads and deletes for a batch of records on the shared I/O
+        executor without waiting for them.
+
+        Args:
+            records (List[ArticleRecord]): The sanitized articles to process.
             lob_prefix (str): The LOB prefix to determine the output bucket.
 
         Returns:
-            List[bool]: A list of boolean values indicating the success or failure of saving each HTML file.
+            List[concurrent.futures.Future]: One future per record, each resolving to SUCCESSFUL, SKIPPED
+            or FAILED; records that can be neither saved nor deleted are SKIPPED.
         """
         if not records:
             return []
 
         try:
             # Get the output bucket for this LOB
-            lob_bucket_mapping = self.get_lob_bucket_mapping()
-            if lob_prefix not in lob_bucket_mapping:
+            output_bucket = self.lob_router.bucket_for(lob_prefix)
+            if output_bucket is None:
                 logger.error(f"No output bucket mapping found for LOB prefix: {lob_prefix}")
-                return [False] * len(records)
-                
-            output_bucket = lob_bucket_mapping[lob_prefix]
+                return completed_outcomes(FAILED, len(records))
+
             output_prefix = ""  # We don't need a prefix since we're using dedicated buckets
 
             # Use list comprehension instead of append in a loop
-            files_to_save = [
-                (record.get(self.content_field), record.get("Title"), record.get("UrlName"), output_bucket, output_prefix)
-                for record in records
-                if record.get(self.content_field) and record.get("Title") and record.get("UrlName")
-                and record.get("PublishStatus") == "Online"                
+            records_to_save = [
+                record for record in records
+                if record.content and record.title and record.url_name
+                and record.publish_status == "Online"
             ]
 
-            files_to_delete = [
-                (record.get("Title"), record.get("UrlName"), output_bucket, output_prefix)
-                for record in records
-                if record.get("Title") and record.get("UrlName") 
-                and record.get("PublishStatus") == "Archived"
+            records_to_delete = [
+                record for record in records
+                if record.title and record.url_name
+                and record.publish_status == "Archived"
             ]
 
-            results = []
-
-            # Process files to save
-            if files_to_save:
-                save_results = self.save_html_batch(files_to_save)
-                results.extend(save_results)
+            # Claim every output key in the write ledger before queuing anything,
+            # so only the newest version of each article in the batch is written
+            save_claims = [self.claim_write(record, output_bucket, output_prefix) for record in records_to_save]
+            delete_claims = [self.claim_write(record, output_bucket, output_prefix) for record in records_to_delete]
 
-            # Process files to delete
-            if files_to_delete:
-                delete_results = self.delete_html_batch(files_to_delete)
-                results.extend(delete_results)
+            futures = [
+                self.schedule_save(
+                    (record.content, record.title, record.url_name, output_bucket, output_prefix),
+                    claim,
+                    record
+                )
+                for record, claim in zip(records_to_save, save_claims)
+            ]
+            futures.extend(self.submit_deletes(
+                [(record.title, record.url_name, output_bucket, output_prefix) for record in records_to_delete],
+                delete_claims
+            ))
 
-            # If no files were processed, return False for each record
-            return results if results else [False] * len(records)
+            # Records that can be neither saved nor deleted, such as drafts or
+            # articles without a UrlName, would fail on every redelivery
+            ineligible = len(records) - len(records_to_save) - len(records_to_delete)
+            if ineligible:
+                logger.info(f"Skipping {ineligible} records that cannot be saved or deleted")
+                futures.extend(completed_outcomes(SKIPPED, ineligible))
+            return futures
         
         except Exception as e:
             logger.error(f"Error processing batch: {str(e)}")
-            return [False] * len(records)
+            return completed_outcomes(FAILED, len(records))
 
     
-    def process_s3_object(self, bucket: str, s3_key: str) -> Tuple[int, int]:
+    def process_s3_object(self, bucket: str, s3_key: str, size: Optional[int] = None,
+                          deadline: Optional[Deadline] = None) -> Tuple[int, int, int]:
         """
-        Process a single S3 object and return success/failure counts.
+        Process a single S3 object and return success/failure/skip counts.
+        A file with a checkpoint is resumed from its offset. When the deadline
+        passes before the end of the file, reading stops, the records already
+        read are written and a checkpoint is saved.
 
         Args:
             bucket (str): The name of the S3 bucket.
             s3_key (str): The key of the S3 object.
+            size (Optional[int]): The object size from the S3 event, if known.
+            deadline (Optional[Deadline]): When to stop reading; needs a checkpoint store.
 
         Returns:
-            Tuple[int, int]: A tuple containing the count of successfully processed records and the count of failed records.
+            Tuple[int, int, int]: A tuple containing the count of successfully processed records, the count of failed
+            records and the count of records skipped because their content was unchanged. The failed count of a
+            resumed file includes failures of earlier invocations, so its message is retried.
+
+        Raises:
+            DeadlineReached: If the file was checkpointed before its end; it carries this invocation's counts.
+            Exception: If the object could not be read; the SQS message should be retried.
         """
         try:
-            # Extract LOB prefix from the S3 key
-            key_parts = s3_key.split('/')
-            if not key_parts:
-                logger.error(f"Invalid S3 key format: {s3_key}")
-                return 0, 0
-                
-            lob_prefix = key_parts[0]  # The first part of the key should be the LOB prefix
-            
-            json_records = self.read_s3_object(bucket, s3_key)
-            
-            # Create generator for batches instead of list comprehension
-            def batch_generator():
-                for i in range(0, len(json_records), self.config['BATCH_SIZE']):
-                    yield json_records[i:i + self.config['BATCH_SIZE']]
-            
-            successful = failed = 0
+            # The longest configured prefix of the key's directory is the LOB prefix
+            lob_prefix = self.lob_router.route(s3_key).lob
+            checkpoint = self.resume_checkpoint(bucket, s3_key)
+            if checkpoint is not None:
+                progress = ReadProgress(checkpoint.offset, deadline, checkpoint.etag)
+            else:
+                progress = ReadProgress(0, deadline if self.checkpoints is not None else None)
             
-            # Process batches using thread pool
-            with concurrent.futures.ThreadPoolExecutor(max_workers=self.config['MAX_THREADS']) as executor:
-                futures = [
-                    executor.submit(self.process_batch, batch, lob_prefix)
-                    for batch in batch_generator()
-                ]
-                
-                # Process results as they complete
-                for future in concurrent.futures.as_completed(futures):
-                    batch_result = future.result()
-                    successful += sum(batch_result)
-                    failed += len(batch_result) - sum(batch_result)
-            
-            return successful, failed
+            outcomes = {SUCCESSFUL: 0, FAILED: 0, SKIPPED: 0}
+            max_in_flight = self.config.get('MAX_IN_FLIGHT_BATCHES', self.config['MAX_THREADS'])
+
+            def collect(batch_futures):
+                for future in batch_futures:
+                    outcomes[future.result()] += 1
+
+            # Batches are uploaded while the rest of the file is still being read
+            # and sanitized; at most max_in_flight batches are held in memory.
+            # The executor runs tasks in submission order, so the oldest batch
+            # is the first to finish.
+            in_flight = collections.deque()
+            try:
+                for batch in iter_batches(self.iter_s3_object(bucket, s3_key, size, progress), self.config['BATCH_SIZE']):
+                    if len(in_flight) >= max_in_flight:
+                        collect(in_flight.popleft())
+                    in_flight.append(self.submit_batch(batch, lob_prefix))
+
+                while in_flight:
+                    collect(in_flight.popleft())
+            finally:
+                # When reading fails partway, the batches already queued finish
+                # before the error propagates, so no write runs after the
+                # invocation has returned
+                for batch_futures in in_flight:
+                    concurrent.futures.wait(batch_futures)
             
+            for outcome, count in outcomes.items():
+                self.metrics.count(f"Records{outcome.capitalize()}", count, Lob=lob_prefix)
+            successful, failed, skipped = outcomes[SUCCESSFUL], outcomes[FAILED], outcomes[SKIPPED]
+
+            if progress.stopped:
+                previous = checkpoint or Checkpoint(None, 0, 0, 0, 0, 0)
+                saved = Checkpoint(
+                    progress.etag, progress.offset, previous.successful + successful, previous.failed + failed,
+                    previous.skipped + skipped, previous.invocations + 1
+                )
+                self.checkpoints.save(bucket, s3_key, saved)
+                self.metrics.count('Checkpoints', Lob=lob_prefix)
+                logger.info(f"Checkpointed {s3_key} at byte {saved.offset} with {deadline.remaining():.1f}s to the deadline")
+                raise DeadlineReached(saved, successful, failed, skipped)
+
+            if checkpoint is not None:
+                self.checkpoints.delete(bucket, s3_key)
+                logger.info(f"Finished {s3_key} in {checkpoint.invocations + 1} invocations: "
+                            f"{checkpoint.successful + successful} successful, {checkpoint.failed + failed} failed, "
+                            f"{checkpoint.skipped + skipped} skipped")
+                failed += checkpoint.failed
+            return successful, failed, skipped
+
+        except DeadlineReached:
+            raise
         except Exception as e:
             logger.error(f"Error processing object {s3_key}: {str(e)}")  # Fixed variable name
-            return 0, 0
+            raise
 
-    def controller(self, event):   
+    def resume_checkpoint(self, bucket: str, s3_key: str) -> Optional[Checkpoint]:
+        """
+        Returns the checkpoint of a partly processed file, or None to read it
+        from the start. A checkpoint of an object that has since been replaced
+        or deleted is discarded.
+        """
+        if self.checkpoints is None:
+            return None
+        checkpoint = self.checkpoints.load(bucket, s3_key)
+        if checkpoint is None:
+            return None
+
+        try:
+            etag = self.s3_client.head_object(Bucket=bucket, Key=s3_key).get('ETag')
+        except ClientError as e:
+            if e.response['Error']['Code'] not in ('404', 'NoSuchKey', 'NotFound'):
+                raise
+            etag = None
+        if etag is None or (checkpoint.etag is not None and etag != checkpoint.etag):
+            logger.info(f"Discarding the checkpoint of {s3_key}: the object was replaced or deleted")
+            self.checkpoints.delete(bucket, s3_key)
+            return None
+
+        logger.info(f"Resuming {s3_key} at byte {checkpoint.offset} after {checkpoint.invocations} invocations")
+        self.metrics.count('Resumes', Lob=self.lob_router.route(s3_key).lob)
+        return checkpoint
+
+    def send_continuation(self, message_body: str) -> bool:
+        """
+        Sends the S3 notification of a checkpointed file to QUEUE_URL again, so
+        the next invocation resumes it without waiting for the visibility timeout.
+
+        Returns:
+            bool: False if no queue is configured or sending failed; the message must then be redelivered.
+        """
+        if self.sqs_client is None:
+            return False
+        try:
+            self.sqs_client.send_message(QueueUrl=self.config['QUEUE_URL'], MessageBody=message_body)
+            return True
+        except Exception as e:
+            logger.error(f"Failed to send continuation message: {str(e)}")
+            return False
+
+    def close(self) -> None:
+        """
+        Shuts down the object and I/O executors once queued work has finished.
+        """
+        self.object_executor.shutdown(wait=True)
+        self.io_executor.shutdown(wait=True)
+
+    def controller(self, event, context=None):   
         """
         Processes an S3 event triggered by an SQS message.
 
         Args:
             event (dict): A dictionary containing SQS messages with S3 event details.
+            context: The Lambda context object; with a checkpoint store, files still being read near its
+                deadline are checkpointed and continued by a later invocation.
 
         Returns:
-            dict: A dictionary containing the status code and a message with the count of successful and failed records processed.
+            dict: A dictionary containing the status code and a message with the count of successful, failed and
+            skipped (unchanged, superseded or unwritable) records, plus the batchItemFailures listing the messageIds
+            whose object could not be read or had records that failed, so SQS redelivers only those messages.
         """        
-        def create_response(status_code, message, successful=0, failed=0):
+        def create_response(status_code, message, successful=0, failed=0, skipped=0, failed_message_ids=()):
             return {
                 'statusCode': status_code,
                 'body': json.dumps({
                     'message': message,
-                    'successful': successful,
-                    'failed': failed
-                })
+                    SUCCESSFUL: successful,
+                    FAILED: failed,
+                    SKIPPED: skipped
+                }),
+                'batchItemFailures': [{'itemIdentifier': message_id} for message_id in failed_message_ids]
             }
 
         try:           
             if not event.get('Records'):
                 return create_response(204, 'No Content')
+
+            self.known_objects.new_invocation()
+            self.ledger.clear()
+            if self.tombstones is not None:
+                self.tombstones.refresh()
+            deadline = Deadline.from_context(context, self.deadline_margin) if self.checkpoints is not None else None
+            total_successful = total_failed = total_skipped = 0
             
-            total_successful = total_failed = 0
-            
-            # Process S3 events
+            # Parse S3 events. Malformed messages can never succeed, so they are
+            # logged and dropped rather than retried into the dead-letter queue
+            objects = []
             for record in event['Records']:
                 try:
                     sqs_message_body = json.loads(record['body'])
+                    if sqs_message_body.get('Event') == 's3:TestEvent':
+                        logger.info("Ignoring s3:TestEvent message")
+                        continue
+
                     s3_records = sqs_message_body.get('Records', [])
                     
                     if not s3_records or 's3' not in s3_records[0]:
@@ -383,19 +1290,64 @@ class S3Manager:
                     s3_event = s3_records[0]['s3']
                     bucket = s3_event['bucket']['name']
                     key = unquote_plus(s3_event['object']['key'])
+                    size = s3_event['object'].get('size')
+                    if self.checkpoints is not None and key.startswith(self.checkpoints.prefix):
+                        logger.debug(f"Ignoring checkpoint object {key}")
+                        continue
                     
                     logger.info(f"Processing S3 object - bucket: {bucket}, key: {key}")
-                    successful, failed = self.process_s3_object(bucket, key)
-                    total_successful += successful
-                    total_failed += failed
+                    objects.append((record.get('messageId'), record['body'], bucket, key, size))
 
-                except (json.JSONDecodeError, KeyError) as e:
+                except (json.JSONDecodeError, KeyError, AttributeError) as e:
                     logger.error(f"Error processing record: {str(e)}")
                     continue
+
+            # Process the objects concurrently, at most OBJECT_CONCURRENCY at a time
+            futures = [
+                (message_id, body, self.object_executor.submit(self.process_s3_object, bucket, key, size, deadline))
+                for message_id, body, bucket, key, size in objects
+            ]
+            failed_message_ids = []
+            for message_id, body, future in futures:
+                try:
+                    successful, failed, skipped = future.result()
+                except DeadlineReached as e:
+                    # Failures so far are carried in the checkpoint and reported when the file is finished
+                    total_successful += e.successful
+                    total_failed += e.failed
+                    total_skipped += e.skipped
+                    if self.send_continuation(body):
+                        self.metrics.count('Continuations')
+                    else:
+                        # Redelivery resumes from the checkpoint after the visibility timeout
+                        failed_message_ids.append(message_id)
+                    continue
+                except Exception:
+                    failed_message_ids.append(message_id)
+                    continue
+                total_successful += successful
+                total_failed += failed
+                total_skipped += skipped
+                # Records already written are skipped as unchanged on redelivery
+                if failed:
+                    failed_message_ids.append(message_id)
             
-            logger.info(f"Processing complete. Total Successful: {total_successful}, Total Failed: {total_failed}")
-            return create_response(200, 'Processing complete', total_successful, total_failed)
+            logger.info(f"Processing complete. Total Successful: {total_successful}, Total Failed: {total_failed}, "
+                        f"Total Skipped: {total_skipped}")
+            if self.sanitizer.cache is not None:
+                logger.info(f"Sanitize cache stats: {json.dumps(self.sanitizer.cache.stats())}")
+            if failed_message_ids:
+                logger.warning(f"Reporting {len(failed_message_ids)} failed messages for redelivery")
+            return create_response(200, 'Processing complete', total_successful, total_failed, total_skipped,
+                                   failed_message_ids)
                 
         except Exception as e:
             logger.error(f"Fatal error in controller: {str(e)}")
-            return create_response(500, 'Internal server error')
+            # An empty batchItemFailures would acknowledge the whole batch
+            return create_response(500, 'Internal server error',
+                                   failed_message_ids=[record.get('messageId') for record in event['Records']])
+        finally:
+            # One set of EMF documents per invocation, whatever its outcome
+            if event.get('Records'):
+                self.record_limiter_state()
+            self.metrics.flush()
@@ -0,0 +1,241 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+# sanitize_cache.py
+
+from collections import OrderedDict
+from typing import Dict, Optional
+import hashlib
+import os
+import tempfile
+import threading
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+def cache_key(html_content: str, rules_version: str) -> str:
+    """
+    Digest identifying a raw HTML body under a given set of sanitizer rules.
+
+    Args:
+        html_content (str): Raw HTML content
+        rules_version (str): Identifies the sanitizer rules and parser backend
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    digest = hashlib.sha256(rules_version.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(html_content.encode('utf-8', 'surrogatepass'))
+    return digest.hexdigest()
+
+class SanitizeCache:
+    """
+    Two-tier memo of sanitized HTML keyed by cache_key(): an in-process LRU
+    that survives warm invocations, and an optional directory (e.g. under
+    /tmp) for entries evicted from memory. Both tiers are size bounded and
+    evict least recently used entries first.
+    """
+
+    def __init__(self, max_entries: int = 4096, max_bytes: int = 64 * 1024 * 1024,
+                 disk_dir: Optional[str] = None, disk_max_bytes: int = 256 * 1024 * 1024):
+        """
+        Args:
+            max_entries (int): Maximum entries kept in memory
+            max_bytes (int): Maximum characters of sanitized HTML kept in memory
+            disk_dir (str): Directory for the disk tier; None disables it
+            disk_max_bytes (int): Maximum bytes stored in the disk tier
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+
+        self._lock = threading.Lock()
+        self._memory: OrderedDict = OrderedDict()
+        self._memory_bytes = 0
+        # Disk entries in LRU order with their file sizes
+        self._disk: OrderedDict = OrderedDict()
+        self._disk_bytes = 0
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if self.disk_dir:
+            self._load_disk_index()
+
+    @classmethod
+    def from_env(cls) -> 'SanitizeCache':
+        """
+        Build a cache from SANITIZE_CACHE_ENTRIES, SANITIZE_CACHE_MAX_MB,
+        SANITIZE_CACHE_DIR and SANITIZE_CACHE_DISK_MB.
+        """
+        return cls(
+            max_entries=int(os.environ.get('SANITIZE_CACHE_ENTRIES', '4096')),
+            max_bytes=int(os.environ.get('SANITIZE_CACHE_MAX_MB', '64')) * 1024 * 1024,
+            disk_dir=os.environ.get('SANITIZE_CACHE_DIR') or None,
+            disk_max_bytes=int(os.environ.get('SANITIZE_CACHE_DISK_MB', '256')) * 1024 * 1024
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 or bool(self.disk_dir)
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up sanitized HTML, promoting disk hits back into memory.
+        """
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return value
+            on_disk = key in self._disk
+
+        if on_disk:
+            value = self._read_disk(key)
+            if value is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                    if key in self._disk:
+                        self._disk.move_to_end(key)
+                self._put_memory(key, value)
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, value: str) -> None:
+        """
+        Store sanitized HTML in memory, spilling evicted entries to disk.
+        """
+        self._put_memory(key, value)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Hit/miss counters and current tier sizes since the cache was created.
+        """
+        with self._lock:
+            return {
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'memory_entries': len(self._memory),
+                'memory_bytes': self._memory_bytes,
+                'disk_entries': len(self._disk),
+                'disk_bytes': self._disk_bytes
+            }
+
+    def _put_memory(self, key: str, value: str) -> None:
+        evicted = []
+        with self._lock:
+            if self.max_entries <= 0 or len(value) > self.max_bytes:
+                evicted.append((key, value))
+            else:
+                if key in self._memory:
+                    self._memory_bytes -= len(self._memory.pop(key))
+                self._memory[key] = value
+                self._memory_bytes += len(value)
+                while len(self._memory) > self.max_entries or self._memory_bytes > self.max_bytes:
+                    old_key, old_value = self._memory.popitem(last=False)
+                    self._memory_bytes -= len(old_value)
+                    self.evictions += 1
+                    evicted.append((old_key, old_value))
+
+        if self.disk_dir:
+            for old_key, old_value in evicted:
+                self._write_disk(old_key, old_value)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.html")
+
+    def _load_disk_index(self) -> None:
+        """
+        Index entries left by an earlier invocation in this execution environment.
+        """
+        try:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            entries = []
+            for entry in os.scandir(self.disk_dir):
+                if entry.is_file() and entry.name.endswith('.html'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, entry.name[:-len('.html')], stat.st_size))
+        except OSError as e:
+            logger.warning(f"Disabling sanitize cache directory {self.disk_dir}: {str(e)}")
+            self.disk_dir = None
+            return
+
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+        self._evict_disk()
+
+    def _read_disk(self, key: str) -> Optional[str]:
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            with self._lock:
+                self._disk_bytes -= self._disk.pop(key, 0)
+            return None
+
+    def _write_disk(self, key: str, value: str) -> None:
+        data = value.encode('utf-8')
+        if len(data) > self.disk_max_bytes:
+            return
+        try:
+            # Write then rename so readers never see a partial entry
+            fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            logger.warning(f"Failed to write sanitize cache entry {key}: {str(e)}")
+            return
+
+        with self._lock:
+            self._disk_bytes -= self._disk.pop(key, 0)
+            self._disk[key] = len(data)
+            self._disk_bytes += len(data)
+        self._evict_disk()
+
+    def _evict_disk(self) -> None:
+        while True:
+            with self._lock:
+                if self._disk_bytes <= self.disk_max_bytes or not self._disk:
+                    return
+                key, size = self._disk.popitem(last=False)
+                self._disk_bytes -= size
+                self.evictions += 1
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+_shared_cache: Optional[SanitizeCache] = None
+_shared_cache_lock = threading.Lock()
+
+def shared_cache() -> SanitizeCache:
+    """
+    Process-wide cache, created from the environment on first use and kept
+    for the lifetime of the execution environment.
+    """
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = SanitizeCache.from_env()
+        return _shared_cache
+
+def _reset_after_fork() -> None:
+    # A forked worker may inherit a lock held by another thread of the parent;
+    # give it a fresh cache of its own instead.
+    global _shared_cache, _shared_cache_lock
+    _shared_cache = None
+    _shared_cache_lock = threading.Lock()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,157 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+# spill_file.py
+
+from array import array
+from typing import Iterator, List, Optional, Tuple
+import io
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+class SpillBudget:
+    """
+    Bytes of ephemeral storage export files may be spilled to. Objects from
+    one event are read concurrently, so each spill reserves its size up front
+    and a file that does not fit falls back to reading from S3 directly.
+    """
+
+    def __init__(self, max_bytes: int, directory: Optional[str] = None):
+        """
+        Args:
+            max_bytes (int): Most bytes spilled at the same time
+            directory (str): Where spill files are created; defaults to the temp dir (/tmp in Lambda)
+        """
+        self.max_bytes = max_bytes
+        self.directory = directory or tempfile.gettempdir()
+        self._lock = threading.Lock()
+        self._reserved = 0
+
+    def reserve(self, size: int) -> bool:
+        """
+        Args:
+            size (int): Bytes needed
+        Returns:
+            bool: True if the bytes were reserved and must be released afterwards
+        """
+        with self._lock:
+            if self._reserved + size > self.max_bytes:
+                return False
+            if shutil.disk_usage(self.directory).free < size:
+                return False
+            self._reserved += size
+            return True
+
+    def release(self, size: int) -> None:
+        with self._lock:
+            self._reserved -= size
+
+    @property
+    def reserved(self) -> int:
+        with self._lock:
+            return self._reserved
+
+class SpillFile:
+    """
+    A downloaded export file in ephemeral storage, memory-mapped once fully
+    written. index() records the offset of every line once, so the file can
+    be split into line-aligned slices that worker processes read from the
+    same path instead of receiving the raw lines over a pipe.
+    """
+
+    def __init__(self, size: int, directory: str):
+        """
+        Args:
+            size (int): Size of the object in bytes; the file is preallocated
+            directory (str): Directory to create the file in
+        """
+        self.size = size
+        fd, self.path = tempfile.mkstemp(prefix='export-', suffix='.jsonl', dir=directory)
+        self._fd = fd
+        os.ftruncate(fd, size)
+        self._map: Optional[mmap.mmap] = None
+        # Start offset of every line, followed by the end of the file
+        self.offsets = array('q')
+
+    def write_at(self, offset: int, data: bytes) -> None:
+        """
+        Write a downloaded part at its offset; safe to call from several threads.
+        """
+        view = memoryview(data)
+        while view:
+            written = os.pwrite(self._fd, view, offset)
+            view = view[written:]
+            offset += written
+
+    def index(self) -> None:
+        """
+        Map the completed file and record where each line starts.
+        """
+        self._map = mmap.mmap(self._fd, self.size, access=mmap.ACCESS_READ)
+        offsets = self.offsets
+        find = self._map.find
+        start = 0
+        while start < self.size:
+            offsets.append(start)
+            end = find(b'\n', start)
+            start = self.size if end == -1 else end + 1
+        offsets.append(self.size)
+
+    @property
+    def line_count(self) -> int:
+        return max(0, len(self.offsets) - 1)
+
+    def lines(self) -> Iterator[bytes]:
+        """
+        Yields:
+            bytes: Each line, including its trailing newline
+        """
+        offsets = self.offsets
+        for i in range(self.line_count):
+            yield self._map[offsets[i]:offsets[i + 1]]
+
+    def slices(self, lines_per_slice: int) -> Iterator[Tuple[int, int]]:
+        """
+        Args:
+            lines_per_slice (int): Lines in each slice
+        Yields:
+            Tuple[int, int]: Start and end byte offsets of consecutive whole-line slices
+        """
+        for i in range(0, self.line_count, lines_per_slice):
+            yield self.offsets[i], self.offsets[min(i + lines_per_slice, self.line_count)]
+
+    def close(self) -> None:
+        """
+        Unmap and delete the file.
+        """
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+def read_slice_lines(path: str, start: int, end: int) -> List[bytes]:
+    """
+    Read the lines between two line-aligned offsets of a spill file.
+
+    Args:
+        path (str): The spill file
+        start (int): Offset of the first line
+        end (int): Offset just past the last line
+    Returns:
+        List[bytes]: The lines, including their trailing newlines
+    """
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        data = mapped[start:end]
+    return io.BytesIO(data).readlines()
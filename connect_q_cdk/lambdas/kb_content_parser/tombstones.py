@@ -0,0 +1,106 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+# tombstones.py
+
+import json
+import threading
+from typing import Dict, Optional, Set, Tuple
+from botocore.exceptions import ClientError
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+# Prefix of tombstones below the checkpoint prefix; bucket names cannot
+# contain underscores, so it never collides with a checkpoint key
+TOMBSTONE_SUBPREFIX = '_tombstones/'
+
+class S3TombstoneStore:
+    """
+    Remembers the Salesforce version that deleted each HTML object, as small
+    JSON objects under a prefix of a bucket outside the LOB buckets. Deleting
+    an object also deletes its version metadata, so without a tombstone a
+    delayed export of an older version would create the object again.
+
+    The tombstones of a bucket are listed once until refresh() is called, so
+    only keys that have one cost a GET; most articles being created have none.
+    Tombstones other execution environments write after the listing are not
+    seen until the next refresh().
+    """
+
+    def __init__(self, s3_client, bucket: str, prefix: str):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+        # Keys with a tombstone, per LOB bucket listed since the last refresh()
+        self._listed: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def key(self, bucket: str, key: str) -> str:
+        return f"{self.prefix}{bucket}/{key}.json"
+
+    def refresh(self) -> None:
+        """
+        Forgets the listings, e.g. at the start of an invocation.
+        """
+        with self._lock:
+            self._listed.clear()
+
+    def listed_keys(self, bucket: str) -> Set[str]:
+        """
+        Returns:
+            Set[str]: Keys of the bucket's HTML objects that have a tombstone
+        """
+        with self._lock:
+            if bucket not in self._listed:
+                prefix = f"{self.prefix}{bucket}/"
+                keys = set()
+                paginator = self.s3_client.get_paginator('list_objects_v2')
+                for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+                    keys.update(obj['Key'][len(prefix):-len('.json')] for obj in page.get('Contents', []))
+                logger.debug(f"Found {len(keys)} tombstones of {bucket}")
+                self._listed[bucket] = keys
+            return self._listed[bucket]
+
+    def load(self, bucket: str, key: str) -> Optional[str]:
+        """
+        Returns:
+            Optional[str]: LastModifiedDate of the version that deleted the object, or None
+        """
+        if key not in self.listed_keys(bucket):
+            return None
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket, Key=self.key(bucket, key))
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                return None
+            raise
+        return json.loads(response['Body'].read())['source_modified']
+
+    def save(self, bucket: str, key: str, source_modified: str) -> None:
+        self.s3_client.put_object(Bucket=self.bucket, Key=self.key(bucket, key),
+                                  Body=json.dumps({'source_modified': source_modified}),
+                                  ContentType='application/json')
+        with self._lock:
+            if bucket in self._listed:
+                self._listed[bucket].add(key)
+
+class InMemoryTombstoneStore:
+    """
+    Keeps tombstones in memory, e.g. for tests and local harnesses.
+    """
+
+    def __init__(self):
+        self.tombstones: Dict[Tuple[str, str], str] = {}
+        self._lock = threading.Lock()
+
+    def refresh(self) -> None:
+        pass
+
+    def load(self, bucket: str, key: str) -> Optional[str]:
+        with self._lock:
+            return self.tombstones.get((bucket, key))
+
+    def save(self, bucket: str, key: str, source_modified: str) -> None:
+        with self._lock:
+            self.tombstones[(bucket, key)] = source_modified
@@ -0,0 +1,100 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+# write_ledger.py
+
+import concurrent.futures
+import threading
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+# Rank of each PublishStatus when two versions of an article carry the same
+# LastModifiedDate: a published version wins over an archived one
+PUBLISH_STATUS_RANK = {
+    'Archived': 0,
+    'Online': 1
+}
+
+def record_version(record) -> Tuple[str, int]:
+    """
+    Orders versions of the same article: by LastModifiedDate (ISO 8601 UTC
+    strings from Salesforce sort chronologically), then by PUBLISH_STATUS_RANK.
+
+    Args:
+        record (ArticleRecord): An article record
+    Returns:
+        Tuple[str, int]: A comparable version
+    """
+    return record.last_modified_date or '', PUBLISH_STATUS_RANK.get(record.publish_status, -1)
+
+class Claim:
+    """
+    The right to write or delete one output key for a given source version.
+    """
+
+    def __init__(self, version: Tuple[str, int], previous: Optional[concurrent.futures.Future]):
+        """
+        Args:
+            version (Tuple[str, int]): The record_version() of the claiming record
+            previous (Future): Outcome of the claim this one superseded, if any
+        """
+        self.version = version
+        self.previous = previous
+        # Resolves to the outcome of this claim's S3 operation
+        self.future = concurrent.futures.Future()
+
+    def when_ready(self, start: Callable[[], None]) -> None:
+        """
+        Calls start once the operation of the superseded claim has finished, so
+        operations on the same key never overlap and the newest runs last.
+        """
+        if self.previous is None:
+            start()
+        else:
+            self.previous.add_done_callback(lambda _: start())
+
+class WriteLedger:
+    """
+    Newest source version scheduled for each output key during one invocation.
+
+    A record older than the version already claimed for its key is dropped
+    before any S3 call. A newer (or equal, i.e. later in the file) record
+    supersedes the claim: the superseded operation turns into a no-op if it
+    has not started yet, and the new one runs after it otherwise. Each key
+    therefore ends in the state of its newest version regardless of the order
+    in which batches and files finish.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._claims: Dict[Hashable, Claim] = {}
+
+    def claim(self, key: Hashable, version: Tuple[str, int]) -> Optional[Claim]:
+        """
+        Args:
+            key (Hashable): The output object, e.g. (bucket, key)
+            version (Tuple[str, int]): The record_version() of the record
+        Returns:
+            Optional[Claim]: The new claim, or None if a newer version is already claimed
+        """
+        with self._lock:
+            current = self._claims.get(key)
+            if current is not None and version < current.version:
+                return None
+            claim = Claim(version, current.future if current is not None else None)
+            self._claims[key] = claim
+            return claim
+
+    def is_current(self, key: Hashable, claim: Claim) -> bool:
+        """
+        Whether claim is still the newest for key; checked when the operation starts.
+        """
+        with self._lock:
+            return self._claims.get(key) is claim
+
+    def clear(self) -> None:
+        with self._lock:
+            self._claims.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._claims)
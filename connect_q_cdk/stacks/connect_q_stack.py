@@ -10,6 +10,7 @@ from aws_cdk import (
     aws_s3_notifications as s3n,
     aws_lambda_event_sources as lambda_event_sources,
     Duration,
+    Size,
     RemovalPolicy,
     aws_kms as kms,
     aws_wisdom as wisdom,
@@ -28,6 +29,10 @@ from ..common.resource_manager import ResourceManager
 AIPromptTemplateConfigurationProperty = dict[str, dict[str, str]]
 TextFullAIPromptEditTemplateConfigurationProperty = dict[str, str]
 
+# Key prefix in the import bucket where the KB content parser keeps the
+# checkpoints of export files it could not finish within its timeout
+KB_CHECKPOINT_PREFIX = "_checkpoints/"
+
 class ConnectQStack(Stack):
     """Stack for Connect Q infrastructure including Salesforce Knowledge Base integration."""
 
@@ -121,12 +126,28 @@ class ConnectQStack(Stack):
             Tags.of(lob_output_buckets[lob]).add("Resource", f"Salesforce-{lob_name}-Knowledge")
             Tags.of(lob_output_buckets[lob]).add("LOB", lob)
 
-        # Create SQS queue for S3 events
+        # Dead-letter queue for S3 events whose file keeps failing, e.g. because
+        # of a record S3 rejects on every attempt
+        lambda_config = self._resource_manager.raw_config["lambda"]
+        kb_import_dlq = sqs.Queue(
+            self,
+            self._resource_manager.generate_resource_name("Queue", "sfkb-import-dlq"),
+            queue_name=f"{env_name}-sfkb-import-dlq-{Stack.of(self).region.replace('-', '')}",
+            retention_period=Duration.days(14),
+            removal_policy=RemovalPolicy.DESTROY
+        )
+
+        # Create SQS queue for S3 events. AWS recommends a visibility timeout of
+        # at least six times the function timeout for SQS event sources
         kb_import_queue = sqs.Queue(
             self,
             self._resource_manager.generate_resource_name("Queue", "sfkb-import"),
             queue_name=f"{env_name}-sfkb-import-queue-{Stack.of(self).region.replace('-', '')}",
-            visibility_timeout=Duration.seconds(300),
+            visibility_timeout=Duration.seconds(6 * lambda_config["timeout"]),
+            dead_letter_queue=sqs.DeadLetterQueue(
+                max_receive_count=lambda_config.get("max_receive_count", 5),
+                queue=kb_import_dlq
+            ),
             removal_policy=RemovalPolicy.DESTROY
         )
 
@@ -134,6 +155,9 @@ class ConnectQStack(Stack):
         Tags.of(kb_import_queue).add("Environment", env_name)
         Tags.of(kb_import_queue).add("Service", "ConnectQ")
         Tags.of(kb_import_queue).add("Resource", "SalesforceKnowledgeQueue")
+        Tags.of(kb_import_dlq).add("Environment", env_name)
+        Tags.of(kb_import_dlq).add("Service", "ConnectQ")
+        Tags.of(kb_import_dlq).add("Resource", "SalesforceKnowledgeDeadLetterQueue")
 
         # Add SQS access policy for S3 notifications
         kb_import_queue.add_to_resource_policy(
@@ -733,10 +757,32 @@ class ConnectQStack(Stack):
                 "LOB_MAPPING": ",".join([f"{lob.lower().replace(' ', '-')}-kb:{lob_output_buckets[lob].bucket_name}" for lob in self._resource_manager.raw_config["LOBs"]]),
                 "BATCH_SIZE": str(self._resource_manager.raw_config["lambda"]["batch_size"]),
                 "MAX_THREADS": str(self._resource_manager.raw_config["lambda"]["max_threads"]),
-                "CONTENT_FIELD": self._resource_manager.raw_config["salesforce"]["content_field"]
+                "CONTENT_FIELD": self._resource_manager.raw_config["salesforce"]["content_field"],
+                "HTML_PARSER": self._resource_manager.raw_config["lambda"].get("html_parser", "streaming"),
+                "SANITIZE_MODE": self._resource_manager.raw_config["lambda"].get("sanitize_mode", "thread"),
+                "OUTPUT_ENCODING": self._resource_manager.raw_config["lambda"].get("output_encoding", "identity"),
+                "RANGE_THRESHOLD_MB": str(self._resource_manager.raw_config["lambda"].get("range_threshold_mb", 64)),
+                "RANGE_PART_SIZE_MB": str(self._resource_manager.raw_config["lambda"].get("range_part_size_mb", 8)),
+                "SPILL_THRESHOLD_MB": str(self._resource_manager.raw_config["lambda"].get("spill_threshold_mb", 256)),
+                "EPHEMERAL_STORAGE_MB": str(self._resource_manager.raw_config["lambda"].get("ephemeral_storage_mb", 512)),
+                "S3_MAX_CONCURRENCY": str(self._resource_manager.raw_config["lambda"].get("s3_max_concurrency", self._resource_manager.raw_config["lambda"]["max_threads"])),
+                "S3_REQUEST_RATE": str(self._resource_manager.raw_config["lambda"].get("s3_request_rate", 0)),
+                "S3_LATENCY_TARGET_MS": str(self._resource_manager.raw_config["lambda"].get("s3_latency_target_ms", 0)),
+                # Files not finished before the timeout are checkpointed under CHECKPOINT_PREFIX
+                # of INPUT_BUCKET and their notification is sent to QUEUE_URL again
+                "CHECKPOINT_PREFIX": KB_CHECKPOINT_PREFIX,
+                "DEADLINE_MARGIN_MS": str(self._resource_manager.raw_config["lambda"].get("deadline_margin_ms", 30000)),
+                "QUEUE_URL": kb_import_queue.queue_url,
+                # The parser validates records against the same projections, filters and validations as the flow
+                "RECORD_SCHEMA": json.dumps(
+                    {name: self._resource_manager.raw_config["salesforce"]["tasks"].get(name, [])
+                     for name in ("projections", "filters", "validations")},
+                    separators=(",", ":")
+                )
             },
             timeout=Duration.seconds(self._resource_manager.raw_config["lambda"]["timeout"]),
             memory_size=self._resource_manager.raw_config["lambda"]["memory_size"],
+            ephemeral_storage_size=Size.mebibytes(self._resource_manager.raw_config["lambda"].get("ephemeral_storage_mb", 512)),
             layers=[layers_stack.api_layer]
         )
         kb_content_parser.node.add_dependency(layers_stack)
@@ -748,22 +794,30 @@ class ConnectQStack(Stack):
         Tags.of(kb_content_parser).add("Service", "ConnectQ")
         Tags.of(kb_content_parser).add("Resource", "KnowledgeContentParser")
 
-        # Grant Lambda permissions to access S3 buckets
+        # Grant Lambda permissions to access S3 buckets (read on LOB buckets
+        # lets the parser compare stored content digests before writing)
         kb_import_bucket.grant_read(kb_content_parser)
         for lob_bucket in lob_output_buckets.values():
-            lob_bucket.grant_write(kb_content_parser)
+            lob_bucket.grant_read_write(kb_content_parser)
+        kb_import_bucket.grant_put(kb_content_parser, f"{KB_CHECKPOINT_PREFIX}*")
+        kb_import_bucket.grant_delete(kb_content_parser, f"{KB_CHECKPOINT_PREFIX}*")
+        kb_import_queue.grant_send_messages(kb_content_parser)
 
-        # Configure S3 notification to SQS
-        kb_import_bucket.add_event_notification(
-            s3.EventType.OBJECT_CREATED,
-            s3n.SqsDestination(kb_import_queue)
-        )
+        # Configure S3 notification to SQS for the LOB export prefixes only, so
+        # checkpoint objects do not trigger the parser
+        for lob in self._resource_manager.raw_config["LOBs"]:
+            kb_import_bucket.add_event_notification(
+                s3.EventType.OBJECT_CREATED,
+                s3n.SqsDestination(kb_import_queue),
+                s3.NotificationKeyFilter(prefix=f"{lob.lower().replace(' ', '-')}-kb/")
+            )
 
         # Add SQS trigger to Lambda
         sqs_event_source = lambda_event_sources.SqsEventSource(
             kb_import_queue,
             batch_size=self._resource_manager.raw_config["lambda"]["batch_size"],
-            max_batching_window=Duration.seconds(30)  # Add batching window to support larger batch sizes
+            max_batching_window=Duration.seconds(30),  # Add batching window to support larger batch sizes
+            report_batch_item_failures=True  # Only messages listed in batchItemFailures are redelivered
         )
         kb_content_parser.add_event_source(sqs_event_source)
         kb_content_parser.node.add_dependency(kb_import_queue)
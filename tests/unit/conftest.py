@@ -0,0 +1,10 @@
+import os
+import sys
+
+# The Lambda sources use flat imports (e.g. `from logger import get_logger`),
+# so put the function directory on the path the same way the runtime does.
+KB_CONTENT_PARSER_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "..", "connect_q_cdk", "lambdas", "kb_content_parser")
+)
+if KB_CONTENT_PARSER_DIR not in sys.path:
+    sys.path.insert(0, KB_CONTENT_PARSER_DIR)
@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+import article_parser
+from article_parser import ArticleParser, ArticleRecord
+from html_sanitizer import HTMLSanitizer
+
+ARTICLE = {
+    "Id": "ka000001",
+    "Title": "Café <b>rules</b>",
+    "ArticleNumber": "000000001",
+    "Content__c": "<p>über&nbsp;text \U0001F600</p>",
+    "Score": 1e-7,
+    "Views": 12345678901234567890,
+}
+
+LINES = [
+    json.dumps(ARTICLE).encode("utf-8") + b"\n",
+    json.dumps(ARTICLE, ensure_ascii=False).encode("utf-8") + b"\r\n",
+    # Only the stdlib accepts these; the fast path must fall back to it
+    json.dumps({**ARTICLE, "Score": float("nan")}).encode("utf-8"),
+    json.dumps({**ARTICLE, "Title": "lone \ud800 surrogate"}).encode("utf-8"),
+    " ".encode("utf-8") + json.dumps(ARTICLE).encode("utf-8") + " ".encode("utf-8"),
+    b"   \n",
+    b"null\n",
+    b"[1, 2]\n",
+    b"{\"Id\": \"ka0\", \"Title\": \n",
+    json.dumps({**ARTICLE, "Title": ""}).encode("utf-8"),
+]
+
+
+@pytest.fixture
+def parser():
+    return ArticleParser("Content__c", HTMLSanitizer())
+
+
+def parse_all(parser, lines):
+    return [parser.parse_line(line) for line in lines]
+
+
+@pytest.mark.skipif(article_parser.orjson is None, reason="orjson not installed")
+def test_fast_path_matches_stdlib(parser, monkeypatch):
+    fast = parse_all(parser, LINES)
+    monkeypatch.setattr(article_parser, "orjson", None)
+
+    assert parse_all(parser, LINES) == fast
+    assert fast.count(None) == 5
+
+
+def test_parse_line_keeps_only_the_record_fields(parser):
+    record = parser.parse_line(json.dumps({**ARTICLE, "IsDeleted": False}).encode("utf-8"))
+
+    assert isinstance(record, ArticleRecord)
+    assert not hasattr(record, "__dict__")
+    assert record.id == ARTICLE["Id"]
+    assert record.article_number == ARTICLE["ArticleNumber"]
+    assert record.content == parser.sanitizer.sanitize_html(ARTICLE["Content__c"])
+
+
+def test_malformed_line_is_logged_and_skipped(parser, caplog):
+    assert parser.parse_line(b"{\"Id\": \"ka0\", \"Title\": \n") is None
+    assert "Error parsing JSON line" in caplog.text
@@ -0,0 +1,128 @@
+import io
+import types
+
+import pytest
+from botocore.exceptions import ClientError
+
+from checkpoint import Checkpoint, Deadline, InMemoryCheckpointStore, ReadProgress, S3CheckpointStore
+
+LINES = [b'{"Id": "1"}\n', b'{"Id": "22"}\n', b'{"Id": "333"}\n']
+
+
+class TickingClock:
+    """Advances one second every time it is read."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        self.now += 1
+        return self.now
+
+
+class FakeCheckpointClient:
+    def __init__(self):
+        self.objects = {}
+
+    def get_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise ClientError({"Error": {"Code": "NoSuchKey"}}, "GetObject")
+        return {"Body": io.BytesIO(self.objects[(Bucket, Key)].encode())}
+
+    def put_object(self, Bucket, Key, Body, ContentType):
+        self.objects[(Bucket, Key)] = Body
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop((Bucket, Key), None)
+
+
+def test_lines_are_read_to_the_end_without_a_deadline():
+    progress = ReadProgress(offset=10)
+
+    assert list(progress.lines(LINES)) == LINES
+    assert progress.offset == 10 + sum(map(len, LINES))
+    assert not progress.stopped
+
+
+def test_lines_stop_at_the_deadline_after_at_least_one_line():
+    progress = ReadProgress(deadline=Deadline(0, clock=lambda: 1))
+
+    assert list(progress.lines(LINES)) == LINES[:1]
+    assert progress.offset == len(LINES[0])
+    assert progress.stopped
+
+
+def test_lines_stop_once_the_deadline_passes():
+    progress = ReadProgress(deadline=Deadline(1.5, clock=TickingClock()))
+
+    assert list(progress.lines(LINES)) == LINES[:2]
+    assert progress.offset == len(LINES[0]) + len(LINES[1])
+
+
+def test_slices_track_the_offset_of_the_object():
+    progress = ReadProgress(offset=100, deadline=Deadline(0, clock=lambda: 1))
+
+    assert list(progress.slices([(0, 40), (40, 90)], base=100)) == [(0, 40)]
+    assert progress.offset == 140
+    assert progress.stopped
+
+
+def test_etag_must_not_change_while_reading():
+    progress = ReadProgress()
+
+    assert progress.check_etag(None)
+    assert progress.check_etag('"a"')
+    assert progress.etag == '"a"'
+    assert not progress.check_etag('"b"')
+    assert not ReadProgress(etag='"a"').check_etag('"b"')
+
+
+def test_deadline_from_context_reserves_the_margin():
+    context = types.SimpleNamespace(get_remaining_time_in_millis=lambda: 60000)
+    deadline = Deadline.from_context(context, margin=15, clock=lambda: 100.0)
+
+    assert deadline.expires_at == 145.0
+    assert deadline.remaining() == 45.0
+    assert not deadline.expired()
+    assert Deadline.from_context(None) is None
+    assert Deadline.from_context(object()) is None
+
+
+def test_checkpoint_round_trips_as_json():
+    checkpoint = Checkpoint('"a"', 120, 3, 1, 0, 2)
+
+    assert Checkpoint.from_json(checkpoint.to_json()) == checkpoint
+
+
+@pytest.mark.parametrize("store_factory", [
+    lambda: S3CheckpointStore(FakeCheckpointClient(), "checkpoints"),
+    InMemoryCheckpointStore,
+])
+def test_store_saves_loads_and_deletes(store_factory):
+    store = store_factory()
+    checkpoint = Checkpoint('"a"', 120, 3, 1, 0, 1)
+
+    assert store.load("input", "lob1-kb/export.json") is None
+    store.save("input", "lob1-kb/export.json", checkpoint)
+    assert store.load("input", "lob1-kb/export.json") == checkpoint
+    assert store.load("input", "lob2-kb/export.json") is None
+    store.delete("input", "lob1-kb/export.json")
+    assert store.load("input", "lob1-kb/export.json") is None
+
+
+def test_s3_store_keeps_checkpoints_under_its_prefix():
+    client = FakeCheckpointClient()
+    store = S3CheckpointStore(client, "checkpoints", prefix="_state/")
+
+    store.save("input", "lob1-kb/export.json", Checkpoint(None, 1, 1, 0, 0, 1))
+
+    assert list(client.objects) == [("checkpoints", "_state/input/lob1-kb/export.json.json")]
+
+
+def test_s3_store_raises_other_errors():
+    class DeniedClient(FakeCheckpointClient):
+        def get_object(self, Bucket, Key):
+            raise ClientError({"Error": {"Code": "AccessDenied"}}, "GetObject")
+
+    with pytest.raises(ClientError):
+        S3CheckpointStore(DeniedClient(), "checkpoints").load("input", "lob1-kb/export.json")
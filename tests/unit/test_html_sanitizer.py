@@ -0,0 +1,114 @@
+import random
+
+import pytest
+from bs4 import BeautifulSoup
+
+from benchmarks.synthetic_articles import ARTICLE_SHAPES, generate_article_html
+from html_sanitizer import (HTML_PARSER, PARSER_BACKENDS, STREAMING, HTMLSanitizer,
+                            default_parser_backend, is_backend_installed)
+
+
+def legacy_sanitize(html_content):
+    """Reference copy of the original multi-pass implementation."""
+    if not html_content:
+        return ""
+    soup = BeautifulSoup(html_content, 'html.parser')
+    for tag in soup.find_all():
+        if tag.name == 'a' and 'target' in tag.attrs:
+            del tag['target']
+        if tag.name == 'b':
+            tag.name = 'strong'
+    for table in soup.find_all('table'):
+        if 'border' in table.attrs:
+            table['border'] = '1'
+        for attr in list(table.attrs):
+            if attr not in ['border']:
+                del table[attr]
+    for link in soup.find_all('a'):
+        for attr in list(link.attrs):
+            if attr not in ['href', 'title']:
+                del link[attr]
+    for img in soup.find_all('img'):
+        for attr in list(img.attrs):
+            if attr not in ['src', 'alt', 'title']:
+                del img[attr]
+    html_content = str(soup)
+    html_content = html_content.replace('\xa0', ' ')
+    html_content = html_content.replace('\n', ' ')
+    return html_content
+
+
+CASES = [
+    '<p style="color:red">Hello&nbsp;<b>world</b></p>\n<p>next</p>',
+    '<a href="/x?a=1&amp;b=2" target="_blank" rel="noopener" title=\'say "hi"\'>link</a>',
+    '<a href="#" title="it\'s &quot;quoted&quot;">both quotes</a>',
+    '<table border="0" cellpadding="3" class="grid"><tr><td class="a b">1 &lt; 2</td></tr></table>',
+    '<table width="100%"><tr><td>no border</td></tr></table>',
+    '<img src="/i.png" alt="x" width="10" style="a"><br><hr/>',
+    '<!DOCTYPE html><!-- comment & stuff --><p>after</p>',
+    '<script>if (a < b && c > d) {}</script><style>p > a { x: 1 }</style>',
+    '<div><p>unclosed<span>deep</div>stray</em>text',
+    '<input disabled><option selected value="">o</option>',
+    '<meta charset="ISO-8859-1"><meta content="text/html; charset=ISO-8859-1" http-equiv="Content-type">',
+    '<o:p></o:p><B>UPPER</B><![CDATA[x]]><?php echo 1 ?>',
+    'plain text only & nothing else',
+    '<p>' + '<span>' * 200 + 'nested' + '</span>' * 200 + '</p>',
+]
+
+
+@pytest.mark.parametrize("html", CASES)
+def test_sanitize_html_matches_legacy_output(html):
+    assert HTMLSanitizer(HTML_PARSER).sanitize_html(html) == legacy_sanitize(html)
+
+
+@pytest.mark.parametrize("html", CASES)
+def test_streaming_backend_matches_legacy_output(html):
+    assert HTMLSanitizer(STREAMING).sanitize_html(html) == legacy_sanitize(html)
+
+
+CHARREFS = ["&#0;", "&#x0;", "&#xD800;", "&#xDFFF;", "&#55296;", "&#x110000;", "&#99999999999;",
+            "&#128;", "&#x81;", "&#x9F;", "&#13;", "&#65;", "&#x1F600;", "&#xFFFE;", "&#x;", "&#12a;"]
+
+
+@pytest.mark.parametrize("charref", CHARREFS)
+def test_streaming_backend_matches_legacy_charrefs(charref):
+    html = f'<p title="{charref}">a{charref}b</p>'
+    sanitized = HTMLSanitizer(STREAMING).sanitize_html(html)
+
+    assert sanitized == legacy_sanitize(html)
+    # Every output must be encodable, e.g. for the content digest
+    sanitized.encode("utf-8")
+
+
+@pytest.mark.parametrize("backend", PARSER_BACKENDS)
+@pytest.mark.parametrize("shape", sorted(ARTICLE_SHAPES))
+def test_backends_conform_on_article_corpus(backend, shape):
+    if not is_backend_installed(backend):
+        pytest.skip(f"{backend} is not installed")
+    html = generate_article_html(random.Random(7), **ARTICLE_SHAPES[shape])
+    assert HTMLSanitizer(backend).sanitize_html(html) == legacy_sanitize(html)
+
+
+def test_parser_backend_selection(monkeypatch):
+    monkeypatch.delenv("HTML_PARSER", raising=False)
+    assert HTMLSanitizer().parser == default_parser_backend()
+    monkeypatch.setenv("HTML_PARSER", HTML_PARSER)
+    assert HTMLSanitizer().parser == HTML_PARSER
+    assert HTMLSanitizer(STREAMING).parser == STREAMING
+    with pytest.raises(ValueError):
+        HTMLSanitizer("not-a-parser")
+
+
+@pytest.mark.parametrize("html", [None, ""])
+def test_sanitize_html_empty_input(html):
+    assert HTMLSanitizer().sanitize_html(html) == ""
+
+
+def test_sanitize_html_applies_rules():
+    html = ('<table border="0" style="x"><tr><td><b>Bold</b> '
+            '<a href="/kb" target="_blank" class="c">kb</a> '
+            '<img src="/i.png" alt="i" onerror="x"></td></tr></table>')
+    assert HTMLSanitizer().sanitize_html(html) == (
+        '<table border="1"><tr><td><strong>Bold</strong> '
+        '<a href="/kb">kb</a> <img alt="i" src="/i.png"/></td></tr></table>'
+    )
@@ -0,0 +1,40 @@
+import pytest
+
+from known_objects import KnownObjects
+
+
+def test_least_recently_used_entries_are_evicted():
+    known = KnownObjects(max_entries=2)
+    known[("bucket", "a")] = "A"
+    known[("bucket", "b")] = "B"
+    assert known.get(("bucket", "a")) == "A"
+
+    known[("bucket", "c")] = "C"
+
+    assert ("bucket", "b") not in known
+    assert len(known) == 2
+    assert known.get(("bucket", "b"), False) is False
+
+
+def test_entries_survive_invocations_unless_current_is_required():
+    known = KnownObjects()
+    known[("bucket", "a")] = None
+    known.new_invocation()
+
+    assert known.get(("bucket", "a"), False) is None
+    assert known.get(("bucket", "a"), False, current=True) is False
+    known[("bucket", "a")] = None
+    assert known.get(("bucket", "a"), False, current=True) is None
+
+
+def test_pop_and_disabled_cache():
+    known = KnownObjects()
+    known[("bucket", "a")] = "A"
+    assert known.pop(("bucket", "a")) == "A"
+    assert known.pop(("bucket", "a"), "gone") == "gone"
+
+    disabled = KnownObjects(max_entries=0)
+    disabled[("bucket", "a")] = "A"
+    assert ("bucket", "a") not in disabled
+    with pytest.raises(ValueError):
+        KnownObjects(max_entries=-1)
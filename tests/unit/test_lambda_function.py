@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+import lambda_function
+import s3_manager
+
+LOB_MAPPING = "credit-kb:credit-bucket"
+
+
+@pytest.fixture
+def clients(monkeypatch):
+    """Count boto3 S3 clients built, and start each test without a cached manager."""
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    monkeypatch.setenv("LOB_MAPPING", LOB_MAPPING)
+    created = []
+    real_client = s3_manager.boto3.client
+
+    def counting_client(*args, **kwargs):
+        created.append(args)
+        return real_client(*args, **kwargs)
+
+    monkeypatch.setattr(s3_manager.boto3, "client", counting_client)
+    monkeypatch.setattr(lambda_function, "_manager", None)
+    monkeypatch.setattr(lambda_function, "_manager_fingerprint", None)
+    yield created
+    if lambda_function._manager is not None:
+        lambda_function._manager.close()
+
+
+def test_warm_invocations_reuse_manager(clients):
+    first = lambda_function.lambda_handler({"Records": []}, None)
+    manager = lambda_function._manager
+    second = lambda_function.lambda_handler({"Records": []}, None)
+
+    assert first["statusCode"] == second["statusCode"] == 204
+    assert lambda_function._manager is manager
+    assert len(clients) == 1
+
+
+def test_config_change_rebuilds_manager(clients, monkeypatch):
+    old = lambda_function.get_manager()
+    monkeypatch.setenv("BATCH_SIZE", "5")
+    new = lambda_function.get_manager()
+
+    assert new is not old
+    assert new.config["BATCH_SIZE"] == 5
+    assert old.io_executor._shutdown
+    assert len(clients) == 2
+
+
+def test_missing_configuration_is_reported_per_invocation(clients, monkeypatch):
+    monkeypatch.delenv("LOB_MAPPING")
+    with pytest.raises(ValueError, match="LOB_MAPPING"):
+        lambda_function.lambda_handler({"Records": [{"body": json.dumps({})}]}, None)
@@ -0,0 +1,62 @@
+import pytest
+
+from lob_router import LobRouter, Route
+
+
+def test_parse_maps_prefixes_to_buckets():
+    router = LobRouter.parse(" credit-kb:credit-bucket , auto-kb:auto-bucket,")
+
+    assert dict(router.mapping) == {"credit-kb": "credit-bucket", "auto-kb": "auto-bucket"}
+    assert router.route("credit-kb/export.jsonl") == Route("credit-kb", "credit-bucket")
+    assert router.route("unknown-kb/export.jsonl") == Route("unknown-kb", None)
+    assert len(LobRouter.parse("")) == 0
+
+
+def test_longest_prefix_of_the_directory_wins():
+    router = LobRouter.parse("credit-kb:credit-bucket,credit-kb/cards:cards-bucket")
+
+    assert router.route("credit-kb/cards/export.jsonl") == Route("credit-kb/cards", "cards-bucket")
+    assert router.route("credit-kb/loans/export.jsonl") == Route("credit-kb", "credit-bucket")
+    assert router.route("credit-kb/cards") == Route("credit-kb", "credit-bucket")
+    assert router.route("credit-kb/cardsx/export.jsonl") == Route("credit-kb", "credit-bucket")
+
+
+def test_default_bucket_receives_unmatched_keys():
+    router = LobRouter.parse("credit-kb:credit-bucket,*:unrouted-bucket")
+
+    assert router.route("other-kb/export.jsonl") == Route("other-kb", "unrouted-bucket")
+    assert router.bucket_for("other-kb") == "unrouted-bucket"
+    assert "*" not in router.mapping
+
+
+def test_lob_for_bucket():
+    router = LobRouter.parse("credit-kb:credit-bucket")
+
+    assert router.lob_for_bucket("credit-bucket") == "credit-kb"
+    assert router.lob_for_bucket("import") == "import"
+
+
+@pytest.mark.parametrize("lob_mapping", [
+    "credit-kb",
+    "credit-kb:",
+    ":credit-bucket",
+    "credit-kb:credit-bucket:extra",
+    "credit-kb:Credit_Bucket",
+    "/credit-kb:credit-bucket",
+    "credit-kb/:credit-bucket",
+    "credit-kb//cards:credit-bucket",
+    "credit-kb:credit-bucket,credit-kb:other-bucket",
+    "*:credit-bucket,*:other-bucket",
+])
+def test_malformed_mapping_is_rejected(lob_mapping):
+    with pytest.raises(ValueError):
+        LobRouter.parse(lob_mapping)
+
+
+def test_router_is_immutable():
+    router = LobRouter.parse("credit-kb:credit-bucket")
+
+    with pytest.raises(AttributeError):
+        router.default_bucket = "other-bucket"
+    with pytest.raises(TypeError):
+        router.mapping["auto-kb"] = "auto-bucket"
@@ -0,0 +1,49 @@
+from metrics import EMF_MAX_VALUES, InMemorySink, MetricsRecorder
+
+
+def test_flush_emits_one_emf_document_per_dimension_set():
+    sink = InMemorySink()
+    recorder = MetricsRecorder("Test/Namespace", sink)
+    recorder.count("LinesDecoded", 10, Lob="credit-kb")
+    recorder.count("LinesDecoded", 5, Lob="credit-kb")
+    recorder.observe("S3GetLatency", 12.5, Lob="credit-kb")
+    recorder.count("ValidationRejects", 2, Lob="credit-kb", Field="Title")
+
+    assert recorder.flush(timestamp=1700000000) == 2
+
+    by_field = {document.get("Field"): document for document in sink.documents}
+    document = by_field[None]
+    assert document["_aws"] == {
+        "Timestamp": 1700000000000,
+        "CloudWatchMetrics": [{
+            "Namespace": "Test/Namespace",
+            "Dimensions": [["Lob"]],
+            "Metrics": [{"Name": "LinesDecoded", "Unit": "Count"}, {"Name": "S3GetLatency", "Unit": "Milliseconds"}],
+        }],
+    }
+    assert (document["Lob"], document["LinesDecoded"], document["S3GetLatency"]) == ("credit-kb", 15, [12.5])
+    assert by_field["Title"]["_aws"]["CloudWatchMetrics"][0]["Dimensions"] == [["Field", "Lob"]]
+    assert by_field["Title"]["ValidationRejects"] == 2
+
+
+def test_flush_resets_and_splits_long_observation_lists():
+    sink = InMemorySink()
+    recorder = MetricsRecorder(sink=sink)
+    for value in range(EMF_MAX_VALUES + 1):
+        recorder.observe("S3PutLatency", value, Lob="auto-kb")
+    recorder.count("RecordsSuccessful", 3, Lob="auto-kb")
+
+    assert recorder.flush() == 2
+    assert [len(document["S3PutLatency"]) for document in sink.documents] == [EMF_MAX_VALUES, 1]
+    assert sink.total("RecordsSuccessful", Lob="auto-kb") == 3
+    assert recorder.flush() == 0
+
+
+def test_timer_observes_milliseconds():
+    sink = InMemorySink()
+    recorder = MetricsRecorder(sink=sink)
+    with recorder.timer("S3DeleteLatency", Lob="credit-kb"):
+        pass
+    recorder.flush()
+
+    assert len(sink.values("S3DeleteLatency", Lob="credit-kb")) == 1
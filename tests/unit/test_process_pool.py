@@ -0,0 +1,100 @@
+import io
+import os
+import threading
+
+import pytest
+
+from process_pool import WorkerPool, shared_pool
+
+
+def square_with_pid(value):
+    return value * value, os.getpid()
+
+
+def fail_on_three(value):
+    if value == 3:
+        raise ValueError("three")
+    return value
+
+
+@pytest.fixture
+def pool():
+    pool = WorkerPool(3)
+    yield pool
+    pool.close()
+
+
+def test_imap_preserves_order_across_workers(pool):
+    results = list(pool.imap(square_with_pid, ((i,) for i in range(20))))
+
+    assert [square for square, _ in results] == [i * i for i in range(20)]
+    assert os.getpid() not in {pid for _, pid in results}
+
+
+def test_imap_reports_task_errors_and_stays_usable(pool):
+    with pytest.raises(RuntimeError, match="ValueError: three"):
+        list(pool.imap(fail_on_three, ((i,) for i in range(6))))
+
+    assert list(pool.imap(fail_on_three, [(1,), (2,)])) == [1, 2]
+
+
+def test_abandoned_imap_leaves_pool_in_sync(pool):
+    results = pool.imap(square_with_pid, ((i,) for i in range(10)))
+    assert next(results)[0] == 0
+    results.close()
+
+    assert [square for square, _ in pool.imap(square_with_pid, [(5,)])] == [25]
+
+
+def test_paused_caller_does_not_block_other_callers(pool):
+    first = pool.imap(square_with_pid, ((i,) for i in range(10)))
+    assert next(first)[0] == 0
+
+    # While the first caller waits, e.g. on uploads, another one runs to completion
+    assert [square for square, _ in pool.imap(square_with_pid, ((i,) for i in range(5)))] == [0, 1, 4, 9, 16]
+    assert [square for square, _ in first] == [i * i for i in range(1, 10)]
+
+
+def test_concurrent_callers_each_get_their_own_results_in_order(pool):
+    results = {}
+
+    def run(offset):
+        results[offset] = [square for square, _ in pool.imap(square_with_pid, ((offset + i,) for i in range(30)))]
+
+    threads = [threading.Thread(target=run, args=(offset,)) for offset in (0, 100, 200)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == {offset: [(offset + i) ** 2 for i in range(30)] for offset in (0, 100, 200)}
+
+
+def test_dead_worker_fails_tasks_instead_of_hanging():
+    pool = WorkerPool(1)
+    pool.workers[0][0].kill()
+    pool.workers[0][0].join()
+
+    with pytest.raises(RuntimeError, match="exited unexpectedly"):
+        list(pool.imap(square_with_pid, [(1,), (2,)]))
+    assert not pool.is_alive()
+    pool.close()
+
+
+def test_shared_pool_is_reused_and_replaced_when_resized():
+    first = shared_pool(2)
+    assert shared_pool(2) is first
+
+    second = shared_pool(1)
+    assert second is not first and second.size == 1
+    assert first.size == 0
+
+
+def test_process_pool_benchmark_runs(monkeypatch):
+    # Keeps the benchmark in step with the task signatures
+    from benchmarks import bench_process_pool
+
+    monkeypatch.setenv("SANITIZE_CACHE_ENTRIES", "0")
+    timings = bench_process_pool.run(4, chunk_size=2, worker_counts=[1], out=io.StringIO())
+
+    assert set(timings) == {"thread", "process x1"}
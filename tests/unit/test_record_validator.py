@@ -0,0 +1,102 @@
+import json
+import os
+
+import pytest
+
+from record_validator import RecordValidator, format_rejects
+
+TASKS = {
+    "filters": [
+        {"field": "PublishStatus", "operator": "EQUAL_TO", "data_type": "picklist", "values": ["Online", "Archived"]}
+    ],
+    "projections": [
+        {"field": "Id", "data_type": "id", "max_length": 18},
+        {"field": "Title", "data_type": "string", "max_length": 20},
+        {"field": "ArticleNumber", "data_type": "string"},
+        {"field": "Content__c", "data_type": "textarea"},
+        {"field": "PublishStatus", "data_type": "picklist"},
+        {"field": "UrlName", "data_type": "string"},
+        {"field": "IsDeleted", "data_type": "boolean"},
+    ],
+    "validations": [
+        {"field": "UrlName", "operator": "VALIDATE_NON_NULL", "action": "DropRecord"}
+    ],
+}
+
+ARTICLE = {
+    "Id": "ka000001",
+    "Title": "Rules",
+    "ArticleNumber": "000000001",
+    "Content__c": "<p>text</p>",
+    "PublishStatus": "Online",
+    "UrlName": "rules",
+    "IsDeleted": False,
+}
+
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "config", "config.dev.json")
+
+
+@pytest.fixture
+def validator():
+    return RecordValidator.from_json(json.dumps(TASKS), "Content__c")
+
+
+def test_valid_article_has_no_rejects(validator):
+    assert validator.rejects(ARTICLE) == ()
+    assert validator.rejects({**ARTICLE, "IsDeleted": None}) == ()
+
+
+def test_large_article_passes_the_dev_config_schema():
+    with open(CONFIG_PATH) as f:
+        tasks = json.load(f)["salesforce"]["tasks"]
+    # Built the way the stack builds RECORD_SCHEMA
+    record_schema = json.dumps({name: tasks.get(name, []) for name in ("projections", "filters", "validations")})
+    validator = RecordValidator.from_json(record_schema, "Content__c")
+
+    article = {**ARTICLE, "Title": "T" * 255, "Content__c": "<p>" + "x" * (1024 * 1024) + "</p>"}
+
+    assert validator.rejects(article) == ()
+
+
+@pytest.mark.parametrize("overrides, expected", [
+    ({"Title": ""}, ("Title", "missing")),
+    ({"UrlName": None}, ("UrlName", "missing")),
+    ({"Title": 7}, ("Title", "type")),
+    ({"IsDeleted": "false"}, ("IsDeleted", "type")),
+    ({"Title": "x" * 21}, ("Title", "length")),
+    ({"PublishStatus": "Draft"}, ("PublishStatus", "value")),
+])
+def test_each_reason_is_reported(validator, overrides, expected):
+    assert validator.rejects({**ARTICLE, **overrides}) == (expected,)
+
+
+def test_every_failed_check_is_reported(validator):
+    rejects = validator.rejects({**ARTICLE, "Id": "", "Content__c": None, "PublishStatus": "Draft"})
+
+    assert set(rejects) == {("Id", "missing"), ("Content__c", "missing"), ("PublishStatus", "value")}
+    assert validator.rejects([ARTICLE]) == (("(record)", "not_object"),)
+
+
+def test_empty_schema_checks_required_fields_only():
+    validator = RecordValidator.from_json("", "Body__c")
+
+    assert validator.required_fields == ("Id", "Title", "ArticleNumber", "Body__c")
+    assert validator.rejects({**ARTICLE, "Body__c": "text", "PublishStatus": "Draft", "Title": 7}) == ()
+
+
+@pytest.mark.parametrize("record_schema", [
+    "{",
+    "[]",
+    json.dumps({"projections": [{"field": "Id"}]}),
+    json.dumps({"projections": [{"field": "Id", "data_type": "blob"}]}),
+    json.dumps({"projections": [{"field": "Id", "data_type": "id", "max_length": 0}]}),
+    json.dumps({"validations": [{"operator": "VALIDATE_NON_NULL"}]}),
+])
+def test_malformed_schema_is_rejected(record_schema):
+    with pytest.raises(ValueError):
+        RecordValidator.from_json(record_schema, "Content__c")
+
+
+def test_format_rejects_lists_most_frequent_first():
+    assert format_rejects({("Title", "missing"): 1, ("PublishStatus", "value"): 3}) == "PublishStatus value 3, Title missing 1"
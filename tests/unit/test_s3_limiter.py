@@ -0,0 +1,163 @@
+import threading
+import time
+
+import pytest
+from botocore.exceptions import ClientError
+
+import s3_limiter
+from s3_limiter import AdaptiveLimiter, TokenBucket, is_throttling_error
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+def slow_down():
+    return ClientError({"Error": {"Code": "SlowDown", "Message": "Please reduce your request rate."},
+                        "ResponseMetadata": {"HTTPStatusCode": 503}}, "PutObject")
+
+
+def test_throttling_errors_are_recognized():
+    assert is_throttling_error(slow_down())
+    assert is_throttling_error(ClientError({"Error": {"Code": "ServiceUnavailable"},
+                                            "ResponseMetadata": {"HTTPStatusCode": 503}}, "PutObject"))
+    assert not is_throttling_error(ClientError({"Error": {"Code": "AccessDenied"}}, "PutObject"))
+
+
+def test_token_bucket_limits_the_rate_after_a_burst():
+    clock = FakeClock()
+    bucket = TokenBucket(10, burst=2, clock=clock, sleep=clock.sleep)
+
+    waits = [bucket.acquire() for _ in range(6)]
+
+    assert waits[:2] == [0.0, 0.0]
+    assert clock.now == pytest.approx(0.4)
+    assert TokenBucket(0).acquire() == 0.0
+
+
+def test_limit_grows_additively_while_healthy():
+    limiter = AdaptiveLimiter(4, 8)
+    for _ in range(4):
+        limiter.run(lambda: None)
+
+    assert limiter.limit == 4
+    for _ in range(5):
+        limiter.run(lambda: None)
+    assert limiter.limit == 5
+    for _ in range(200):
+        limiter.run(lambda: None)
+    assert limiter.limit == 8
+
+
+def test_throttled_request_halves_the_limit_and_is_retried(monkeypatch):
+    clock = FakeClock()
+    limiter = AdaptiveLimiter(8, 16, clock=clock, sleep=clock.sleep)
+    attempts = []
+
+    def request():
+        attempts.append(clock.now)
+        if len(attempts) < 3:
+            raise slow_down()
+        return "ok"
+
+    assert limiter.run(request) == "ok"
+    assert len(attempts) == 3
+    assert limiter.limit == 2
+    state = limiter.snapshot()
+    assert (state["throttled"], state["decreases"], state["lowest_limit"]) == (2, 2, 2)
+    assert limiter.snapshot()["throttled"] == 0
+
+
+def test_throttling_is_raised_after_the_last_attempt():
+    clock = FakeClock()
+    limiter = AdaptiveLimiter(4, 4, minimum=2, clock=clock, sleep=clock.sleep)
+
+    def request():
+        raise slow_down()
+
+    with pytest.raises(ClientError):
+        limiter.run(request)
+    assert limiter.limit == 2
+    assert limiter.snapshot()["throttled"] == s3_limiter.THROTTLED_ATTEMPTS
+
+
+def test_other_errors_do_not_change_the_limit():
+    limiter = AdaptiveLimiter(4, 8)
+
+    def request():
+        raise ClientError({"Error": {"Code": "AccessDenied"}}, "PutObject")
+
+    with pytest.raises(ClientError):
+        limiter.run(request)
+    assert limiter.limit == 4
+
+
+def test_slow_requests_count_as_congestion():
+    clock = FakeClock()
+    limiter = AdaptiveLimiter(8, 8, latency_target=1.0, clock=clock, sleep=clock.sleep)
+
+    limiter.run(lambda: clock.sleep(0.5))
+    assert limiter.limit == 8
+    limiter.run(lambda: clock.sleep(2.0))
+    assert limiter.limit == 4
+
+
+def test_one_burst_of_throttling_is_one_decrease():
+    limiter = AdaptiveLimiter(8, 8, sleep=lambda seconds: None)
+    started = threading.Barrier(8)
+    calls = []
+
+    def request():
+        calls.append(1)
+        if len(calls) <= 8:
+            started.wait()
+            raise slow_down()
+
+    threads = [threading.Thread(target=limiter.run, args=(request,)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert limiter.snapshot()["decreases"] == 1
+
+
+def test_concurrency_never_exceeds_the_limit():
+    limiter = AdaptiveLimiter(2, 2)
+    lock = threading.Lock()
+    in_flight, peak = [0], [0]
+
+    def request():
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        time.sleep(0.01)
+        with lock:
+            in_flight[0] -= 1
+
+    threads = [threading.Thread(target=limiter.run, args=(request,)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert peak[0] == 2
+    assert limiter.snapshot()["peak_in_flight"] == 2
+
+
+def test_invalid_limits_are_rejected():
+    with pytest.raises(ValueError):
+        AdaptiveLimiter(4, 2, minimum=3)
+    with pytest.raises(ValueError):
+        AdaptiveLimiter(4, 8, backoff=1)
+    with pytest.raises(ValueError):
+        TokenBucket(-1)
@@ -0,0 +1,920 @@
+import gzip
+import hashlib
+import io
+import json
+import threading
+import time
+import types
+
+import pytest
+from botocore.exceptions import ClientError
+
+import s3_limiter
+import s3_manager
+from article_parser import ArticleRecord
+from checkpoint import Deadline, DeadlineReached, InMemoryCheckpointStore
+from lob_router import LobRouter
+from metrics import InMemorySink, MetricsRecorder
+from s3_manager import S3Manager, iter_batches
+from tombstones import InMemoryTombstoneStore
+
+LOB_MAPPING = "credit-kb:credit-bucket,auto-kb:auto-bucket"
+
+
+class FakeBody:
+    def __init__(self, data, on_line=None):
+        self._lines = io.BytesIO(data).readlines()
+        self._on_line = on_line
+
+    @property
+    def _raw_stream(self):
+        for line in self._lines:
+            if self._on_line:
+                self._on_line()
+            yield line
+
+    def read(self):
+        return b"".join(self._lines)
+
+    def iter_chunks(self, chunk_size=1024):
+        data = self.read()
+        for start in range(0, len(data), chunk_size):
+            yield data[start:start + chunk_size]
+
+
+class FakeS3Client:
+    """Minimal in-memory stand-in for the boto3 S3 client calls S3Manager makes."""
+
+    def __init__(self):
+        self.objects = {}
+        self.metadata = {}
+        self.calls = []
+        self.lines_read = 0
+        self.lines_read_at_first_put = None
+        self.threads = set()
+        self.undeletable = set()
+        self.encodings = {}
+        self.ranges = []
+        self._lock = threading.Lock()
+
+    def _count_line(self):
+        self.lines_read += 1
+
+    def get_object(self, Bucket, Key, Range=None, **kwargs):
+        with self._lock:
+            self.calls.append(("get_object", Bucket, Key))
+            if Range:
+                self.ranges.append(Range)
+        if (Bucket, Key) not in self.objects:
+            raise ClientError({"Error": {"Code": "NoSuchKey", "Message": "missing"}}, "GetObject")
+        data = self.objects[(Bucket, Key)]
+        if Range:
+            first, _, last = Range[len("bytes="):].partition("-")
+            data = data[int(first):int(last) + 1 if last else None]
+        return {"Body": FakeBody(data, self._count_line), "ETag": self.etag(Bucket, Key)}
+
+    def etag(self, Bucket, Key):
+        body = self.objects[(Bucket, Key)]
+        return '"%s"' % hashlib.md5(body if isinstance(body, bytes) else body.encode("utf-8")).hexdigest()
+
+    def head_object(self, Bucket, Key, **kwargs):
+        with self._lock:
+            self.calls.append(("head_object", Bucket, Key))
+            if (Bucket, Key) not in self.objects:
+                raise ClientError({"Error": {"Code": "404", "Message": "Not Found"}}, "HeadObject")
+            return {"ETag": self.etag(Bucket, Key), "Metadata": self.metadata.get((Bucket, Key), {})}
+
+    def put_object(self, Bucket, Key, Body, Metadata=None, IfMatch=None, IfNoneMatch=None, **kwargs):
+        with self._lock:
+            self.threads.add(threading.current_thread().name)
+            self.calls.append(("put_object", Bucket, Key))
+            exists = (Bucket, Key) in self.objects
+            if (IfNoneMatch == "*" and exists) or (IfMatch and (not exists or self.etag(Bucket, Key) != IfMatch)):
+                raise ClientError({"Error": {"Code": "PreconditionFailed", "Message": "At least one of the pre-conditions you specified did not hold"}}, "PutObject")
+            if self.lines_read_at_first_put is None:
+                self.lines_read_at_first_put = self.lines_read
+            self.objects[(Bucket, Key)] = Body
+            self.metadata[(Bucket, Key)] = dict(Metadata or {})
+            self.encodings[(Bucket, Key)] = kwargs.get("ContentEncoding")
+            return {"ETag": self.etag(Bucket, Key)}
+
+    def copy_object(self, Bucket, Key, CopySource, Metadata=None, CopySourceIfMatch=None, **kwargs):
+        with self._lock:
+            self.calls.append(("copy_object", Bucket, Key))
+            source = (CopySource["Bucket"], CopySource["Key"])
+            if source not in self.objects:
+                raise ClientError({"Error": {"Code": "NoSuchKey", "Message": "missing"}}, "CopyObject")
+            if CopySourceIfMatch and self.etag(*source) != CopySourceIfMatch:
+                raise ClientError({"Error": {"Code": "PreconditionFailed", "Message": "At least one of the pre-conditions you specified did not hold"}}, "CopyObject")
+            self.objects[(Bucket, Key)] = self.objects[source]
+            self.metadata[(Bucket, Key)] = dict(Metadata or {})
+            return {"CopyObjectResult": {"ETag": self.etag(Bucket, Key)}}
+
+    def count(self, operation):
+        return sum(1 for call in self.calls if call[0] == operation)
+
+    def delete_objects(self, Bucket, Delete, **kwargs):
+        keys = [obj["Key"] for obj in Delete["Objects"]]
+        assert len(keys) <= 1000
+        with self._lock:
+            self.calls.append(("delete_objects", Bucket, tuple(keys)))
+            errors = []
+            for obj in Delete["Objects"]:
+                key = obj["Key"]
+                if key in self.undeletable:
+                    errors.append({"Key": key, "Code": "AccessDenied", "Message": "Access Denied"})
+                elif "ETag" in obj and (Bucket, key) in self.objects and self.etag(Bucket, key) != obj["ETag"]:
+                    errors.append({"Key": key, "Code": "PreconditionFailed", "Message": "Precondition Failed"})
+                else:
+                    self.objects.pop((Bucket, key), None)
+        return {"Errors": errors} if errors else {}
+
+
+def make_article(index, status="Online", **overrides):
+    article = {
+        "Id": f"ka0{index:05d}",
+        "Title": f"Article <b>{index}</b>",
+        "ArticleNumber": f"{index:09d}",
+        "UrlName": f"article-{index}",
+        "PublishStatus": status,
+        "LastModifiedDate": "2024-05-01T10:00:00.000Z",
+        "Content__c": f"<p>Body {index}&nbsp;text</p>",
+    }
+    article.update(overrides)
+    return article
+
+
+def make_record(index, status="Online", **overrides):
+    return ArticleRecord.from_article(make_article(index, status, **overrides), "Content__c")
+
+
+def to_jsonl(articles):
+    return "".join(json.dumps(article) + "\n" for article in articles).encode("utf-8")
+
+
+@pytest.fixture
+def s3_client():
+    return FakeS3Client()
+
+
+@pytest.fixture
+def metrics_sink():
+    return InMemorySink()
+
+
+@pytest.fixture
+def manager(monkeypatch, s3_client, metrics_sink):
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    manager = S3Manager({"BATCH_SIZE": 25, "MAX_THREADS": 4, "LOB_MAPPING": LOB_MAPPING}, s3_client=s3_client,
+                        metrics=MetricsRecorder(sink=metrics_sink))
+    yield manager
+    manager.close()
+
+
+def test_iter_batches_groups_stream():
+    assert list(iter_batches(iter(range(7)), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert list(iter_batches([], 3)) == []
+
+
+def test_read_s3_object_sanitizes_and_skips_invalid_lines(manager, s3_client):
+    body = to_jsonl([make_article(1), make_article(2, Title="")]) + b"\nnot json\n"
+    s3_client.objects[("import", "credit-kb/export.jsonl")] = body
+
+    records = manager.read_s3_object("import", "credit-kb/export.jsonl")
+
+    assert [record.id for record in records] == ["ka000001"]
+    assert records[0].title == "Article <strong>1</strong>"
+    assert records[0].content == "<p>Body 1 text</p>"
+
+
+def test_read_s3_object_missing_key_returns_empty(manager):
+    assert manager.read_s3_object("import", "credit-kb/missing.jsonl") == []
+
+
+def test_ranged_read_matches_single_stream(manager, s3_client):
+    body = to_jsonl([make_article(1), make_article(2, Title="")]) + b"\nnot json\n" + to_jsonl(
+        make_article(i, Content__c="<p>" + "x" * (i * 37) + "</p>") for i in range(3, 40)
+    )
+    s3_client.objects[("import", "credit-kb/export.jsonl")] = body
+    streamed = manager.read_s3_object("import", "credit-kb/export.jsonl")
+
+    # Parts far smaller than a line: most lines span several ranges
+    manager.range_threshold, manager.range_part_size = 1, 97
+    ranged = manager.read_s3_object("import", "credit-kb/export.jsonl", size=len(body))
+
+    assert ranged == streamed
+    assert len(ranged) == 38
+    assert len(s3_client.ranges) == -(-len(body) // 97)
+
+
+def test_ranged_read_below_threshold_uses_single_stream(manager, s3_client):
+    body = to_jsonl([make_article(1)])
+    s3_client.objects[("import", "credit-kb/export.jsonl")] = body
+    manager.range_threshold = len(body) + 1
+
+    assert len(manager.read_s3_object("import", "credit-kb/export.jsonl", size=len(body))) == 1
+    assert s3_client.ranges == []
+
+
+def test_ranged_read_fails_when_object_changes(manager, s3_client, monkeypatch):
+    body = to_jsonl(make_article(i) for i in range(20))
+    s3_client.objects[("import", "credit-kb/export.jsonl")] = body
+    manager.range_threshold, manager.range_part_size = 1, 256
+    get_object = s3_client.get_object
+
+    # Part 8 is only requested once part 0 has been read, so the object is
+    # replaced between the two
+    def get_object_replaced(Bucket, Key, Range=None, **kwargs):
+        if Range == f"bytes={8 * 256}-{9 * 256 - 1}":
+            s3_client.objects[(Bucket, Key)] = body + b"\n"
+        return get_object(Bucket, Key, Range=Range, **kwargs)
+
+    monkeypatch.setattr(s3_client, "get_object", get_object_replaced)
+
+    with pytest.raises(ClientError):
+        manager.read_s3_object("import", "credit-kb/export.jsonl", size=len(body))
+
+
+def test_process_s3_object_saves_online_and_deletes_archived(manager, s3_client):
+    s3_client.objects[("credit-bucket", "article-2.html")] = "old"
+    body = to_jsonl([make_article(1), make_article(2, status="Archived")])
+    s3_client.objects[("import", "credit-kb/export.jsonl")] = body
+
+    assert manager.process_s3_object("import", "credit-kb/export.jsonl") == (2, 0, 0)
+    assert s3_client.objects[("credit-bucket", "article-1.html")] == "<p>Body 1 text</p>"
+    assert ("credit-bucket", "article-2.html") not in s3_client.objects
+
+
+def test_process_s3_object_uploads_while_streaming(manager, s3_client):
+    manager.config["MAX_IN_FLIGHT_BATCHES"] = 1
+    body = to_jsonl(make_article(i) for i in range(200))
+    s3_client.objects[("import", "credit-kb/export.jsonl")] = body
+
+    assert manager.process_s3_object("import", "credit-kb/export.jsonl") == (200, 0, 0)
+    # With one batch in flight, uploads start before the third batch is read
+    assert s3_client.lines_read_at_first_put <= 2 * manager.config["BATCH_SIZE"]
+
+
+def test_read_error_waits_for_queued_uploads(manager, s3_client, monkeypatch):
+    manager.config["MAX_IN_FLIGHT_BATCHES"] = 4
+    s3_client.objects[("import", "credit-kb/export.jsonl")] = to_jsonl(make_article(i) for i in range(100))
+    put_object = s3_client.put_object
+
+    def fail_after_60_lines():
+        s3_client.lines_read += 1
+        if s3_client.lines_read > 60:
+            raise ConnectionError("connection reset")
+
+    def slow_put(**kwargs):
+        time.sleep(0.01)
+        return put_object(**kwargs)
+
+    monkeypatch.setattr(s3_client, "_count_line", fail_after_60_lines)
+    monkeypatch.setattr(s3_client, "put_object", slow_put)
+
+    with pytest.raises(ConnectionError):
+        manager.process_s3_object("import", "credit-kb/export.jsonl")
+    # Both complete batches were written before the error propagated
+    assert s3_client.count("put_object") == 50
+
+
+def test_unchanged_articles_are_skipped(manager, s3_client):
+    s3_client.objects[("import", "credit-kb/export.jsonl")] = to_jsonl([make_article(1), make_article(2)])
+    assert manager.process_s3_object("import", "credit-kb/export.jsonl") == (2, 0, 0)
+
+    # A fresh manager has no cached digests and falls back to HEAD metadata
+    manager.known_objects.clear()
+    s3_client.objects[("import", "credit-kb/export.jsonl")] = to_jsonl(
+        [make_article(1), make_article(2, Content__c="<p>edited</p>")]
+    )
+    assert manager.process_s3_object("import", "credit-kb/export.jsonl") == (1, 0, 1)
+    assert s3_client.count("put_object") == 3
+    assert s3_client.objects[("credit-bucket", "article-2.html")] == "<p>edited</p>"
+
+    # Digests of written objects are remembered, so no HEAD is needed
+    heads = s3_client.count("head_object")
+    assert manager.process_s3_object("import", "credit-kb/export.jsonl") == (0, 0, 2)
+    assert s3_client.count("head_object") == heads
+
+
+def test_controller_reports_skipped_counts(manager, s3_client):
+    s3_client.objects[("import", "credit-kb/export.jsonl")] = to_jsonl([make_article(1)])
+    event = {"Records": [{"messageId": "m1", "body": json.dumps(
+        {"Records": [{"s3": {"bucket": {"name": "import"}, "object": {"key": "credit-kb/export.jsonl"}}}]}
+    )}]}
+
+    first = json.loads(manager.controller(event)["body"])
+    second = json.loads(manager.controller(event)["body"])
+
+    assert (first["successful"], first["failed"], first["skipped"]) == (1, 0, 0)
+    assert (second["successful"], second["failed"], second["skipped"]) == (0, 0, 1)
+
+
+def test_process_mode_matches_thread_mode(manager, s3_client):
+    articles = [make_article(i) for i in range(30)] + [make_article(99, Title="")]
+    s3_client.objects[("import", "credit-kb/export.jsonl")] = to_jsonl(articles) + b"not json\n"
+    threaded = manager.read_s3_object("import", "credit-kb/export.jsonl")
+
+    manager.config.update({"SANITIZE_MODE": "process", "SANITIZE_WORKERS": 2, "SANITIZE_CHUNK_SIZE": 4})
+    assert manager.read_s3_object("import", "credit-kb/export.jsonl") == threaded
+    assert len(threaded) == 30
+
+
+@pytest.mark.parametrize("mode", ["thread", "process"])
+def test_spilled_read_matches_single_stream(manager, s3_client, tmp_path, mode):
+    articles = [make_article(i) for i in range(30)] + [make_article(99, Title="")]
+    body = to_jsonl(articles) + b"not json\n" + to_jsonl([make_article(100)]).rstrip(b"\n")
+    s3_client.objects[("import", "credit-kb/export.jsonl")] = body
+    streamed = manager.read_s3_object("import", "credit-kb/export.jsonl")
+
+    manager.config.update({"SANITIZE_MODE": mode, "SANITIZE_WORKERS": 2, "SANITIZE_CHUNK_SIZE": 4})
+    manager.spill_threshold, manager.range_part_size = 1, 500
+    manager.spill_budget.directory = str(tmp_path)
+    spilled = manager.read_s3_object("import", "credit-kb/export.jsonl", size=len(body))
+
+    assert spilled == streamed
+    assert len(spilled) == 31
+    assert len(s3_client.ranges) == -(-len(body) // 500)
+    # The spill file is removed and its space released
+    assert list(tmp_path.iterdir()) == []
+    assert manager.spill_budget.reserved == 0
+
+
+def test_spill_streams_a_bounded_number_of_parts(manager, s3_client, tmp_path, monkeypatch):
+    body = to_jsonl(make_article(i) for i in range(30))
+    s3_client.objects[("import", "credit-kb/export.jsonl")] = body
+    streamed = manager.read_s3_object("import", "credit-kb/export.jsonl")
+    get_object, lock = s3_client.get_object, threading.Lock()
+    in_flight, peak = [0], [0]
+
+    def tracked_get(**kwargs):
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        time.sleep(0.005)
+        response = get_object(**kwargs)
+        with lock:
+            in_flight[0] -= 1
+        return response
+
+    monkeypatch.setattr(s3_client, "get_object", tracked_get)
+    monkeypatch.setattr(s3_manager, "SPILL_WRITE_CHUNK_SIZE", 64)
+    manager.config["MAX_THREADS"] = 2
+    manager.spill_threshold, manager.range_part_size = 1, 300
+    manager.spill_budget.directory = str(tmp_path)
+
+    assert manager.read_s3_object("import", "credit-kb/export.jsonl", size=len(body)) == streamed
+    assert peak[0] <= 2
+    assert manager.spill_budget.reserved == 0
+
+
+def test_object_too_large_for_spill_budget_is_ranged(manager, s3_client, tmp_path):
+    body = to_jsonl(make_article(i) for i in range(10))
+    s3_client.objects[("import", "credit-kb/export.jsonl")] = body
+    manager.spill_threshold = manager.range_threshold = 1
+    manager.spill_budget.max_bytes = len(body) - 1
+    manager.spill_budget.directory = str(tmp_path)
+
+    assert len(manager.read_s3_object("import", "credit-kb/export.jsonl", size=len(body))) == 10
+    assert s3_client.ranges
+    assert manager.spill_budget.reserved == 0
+
+
+def test_unknown_sanitize_mode_is_rejected(monkeypatch):
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    with pytest.raises(ValueError):
+        S3Manager({"BATCH_SIZE": 25, "MAX_THREADS": 4, "LOB_MAPPING": LOB_MAPPING, "SANITIZE_MODE": "gpu"})
+
+
+def test_s3_requests_share_one_bounded_executor(manager, s3_client):
+    fresh = S3Manager({"BATCH_SIZE": 25, "MAX_THREADS": 4, "LOB_MAPPING": LOB_MAPPING})
+    assert fresh.s3_client.meta.config.max_pool_connections == 4
+    fresh.close()
+
+    manager.config["MAX_IN_FLIGHT_BATCHES"] = 8
+    s3_client.objects[("import", "credit-kb/export.jsonl")] = to_jsonl(make_article(i) for i in range(300))
+
+    assert manager.process_s3_object("import", "credit-kb/export.jsonl") == (300, 0, 0)
+    assert len(s3_client.threads) <= manager.config["MAX_THREADS"]
+    assert all(name.startswith("s3-io") for name in s3_client.threads)
+
+
+def test_batch_without_eligible_records_counts_as_skipped(manager):
+    assert manager.process_batch([make_record(1, "Draft")], "credit-kb") == ["skipped"]
+    assert manager.process_batch([make_record(1, UrlName=None), make_record(2)], "credit-kb") == ["successful", "skipped"]
+    assert manager.process_batch([make_record(1)], "unknown-kb") == ["failed"]
+
+
+def test_file_of_unwritable_records_is_not_redelivered(manager, s3_client):
+    s3_client.objects[("import", "credit-kb/export.jsonl")] = to_jsonl([make_article(1, UrlName=None)])
+
+    response = manager.controller(s3_event("credit-kb/export.jsonl"))
+
+    assert response["batchItemFailures"] == []
+    assert json.loads(response["body"])["skipped"] == 1
+
+
+def test_malformed_lob_mapping_is_rejected_at_init(monkeypatch):
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    with pytest.raises(ValueError, match="LOB_MAPPING"):
+        S3Manager({"BATCH_SIZE": 25, "MAX_THREADS": 4, "LOB_MAPPING": "credit-kb=credit-bucket"})
+
+
+def test_nested_lob_prefix_routes_to_its_own_bucket(manager, s3_client):
+    manager.lob_router = LobRouter.parse(LOB_MAPPING + ",credit-kb/cards:cards-bucket")
+    s3_client.objects[("import", "credit-kb/cards/export.jsonl")] = to_jsonl([make_article(1)])
+
+    assert manager.process_s3_object("import", "credit-kb/cards/export.jsonl") == (1, 0, 0)
+    assert ("cards-bucket", "article-1.html") in s3_client.objects
+
+
+def s3_event(*keys, bucket="import", sizes=None):
+    return {"Records": [
+        {"messageId": f"m{index}", "body": json.dumps(
+            {"Records": [{"s3": {"bucket": {"name": bucket}, "object": {"key": key, **({"size": sizes[index]} if sizes else {})}}}]}
+        )}
+        for index, key in enumerate(keys)
+    ]}
+
+
+def test_controller_processes_objects_concurrently(manager, s3_client, monkeypatch):
+    keys = [f"credit-kb/export-{n}.jsonl" for n in range(3)]
+    for n, key in enumerate(keys):
+        s3_client.objects[("import", key)] = to_jsonl(make_article(n * 10 + i) for i in range(5))
+
+    # Two GETs must be open at once for the barrier to release; sequential
+    # processing would time out and report no records
+    barrier = threading.Barrier(2, timeout=5)
+    get_object = s3_client.get_object
+
+    def get_object_together(Bucket, Key, **kwargs):
+        if Key != keys[2]:
+            barrier.wait()
+        return get_object(Bucket, Key, **kwargs)
+
+    monkeypatch.setattr(s3_client, "get_object", get_object_together)
+    body = json.loads(manager.controller(s3_event(*keys))["body"])
+
+    assert (body["successful"], body["failed"], body["skipped"]) == (15, 0, 0)
+
+
+def test_controller_reads_large_objects_in_ranges(manager, s3_client):
+    body = to_jsonl(make_article(i) for i in range(30))
+    s3_client.objects[("import", "credit-kb/export.jsonl")] = body
+    manager.range_threshold, manager.range_part_size = 1024, 1024
+
+    response = manager.controller(s3_event("credit-kb/export.jsonl", sizes=[len(body)]))
+
+    assert json.loads(response["body"])["successful"] == 30
+    assert len(s3_client.ranges) == -(-len(body) // 1024)
+
+
+def test_controller_reports_only_failed_messages(manager, s3_client, monkeypatch):
+    s3_client.objects[("import", "credit-kb/good.jsonl")] = to_jsonl([make_article(1)])
+    s3_client.objects[("import", "credit-kb/flaky.jsonl")] = to_jsonl([make_article(2)])
+    s3_client.objects[("import", "credit-kb/unreadable.jsonl")] = to_jsonl([make_article(3)])
+    get_object, put_object = s3_client.get_object, s3_client.put_object
+
+    def failing_get(Bucket, Key, **kwargs):
+        if Key == "credit-kb/unreadable.jsonl":
+            raise ClientError({"Error": {"Code": "SlowDown", "Message": "slow down"}}, "GetObject")
+        return get_object(Bucket, Key, **kwargs)
+
+    def failing_put(Bucket, Key, Body, **kwargs):
+        if Key == "article-2.html":
+            raise ClientError({"Error": {"Code": "InternalError", "Message": "boom"}}, "PutObject")
+        return put_object(Bucket, Key, Body, **kwargs)
+
+    monkeypatch.setattr(s3_client, "get_object", failing_get)
+    monkeypatch.setattr(s3_client, "put_object", failing_put)
+    event = s3_event("credit-kb/good.jsonl", "credit-kb/flaky.jsonl", "credit-kb/unreadable.jsonl")
+    event["Records"].append({"messageId": "test", "body": json.dumps({"Service": "Amazon S3", "Event": "s3:TestEvent"})})
+    event["Records"].append({"messageId": "junk", "body": "not json"})
+
+    response = manager.controller(event)
+
+    assert response["batchItemFailures"] == [{"itemIdentifier": "m1"}, {"itemIdentifier": "m2"}]
+    body = json.loads(response["body"])
+    assert (body["successful"], body["failed"]) == (1, 1)
+
+
+def test_controller_fatal_error_fails_every_message(manager, monkeypatch):
+    monkeypatch.setattr(manager, "known_objects", None)
+
+    response = manager.controller(s3_event("credit-kb/a.jsonl", "credit-kb/b.jsonl"))
+
+    assert response["statusCode"] == 500
+    assert response["batchItemFailures"] == [{"itemIdentifier": "m0"}, {"itemIdentifier": "m1"}]
+
+
+def test_deletes_are_grouped_by_bucket_into_delete_objects(manager, s3_client):
+    files = [("Title", f"article-{i}", "credit-bucket", "") for i in range(2500)]
+    files.insert(3, ("Title", "article-auto", "auto-bucket", ""))
+    for _, url_name, bucket, _ in files:
+        s3_client.objects[(bucket, f"{url_name}.html")] = "old"
+    s3_client.undeletable = {"article-7.html", "article-2100.html"}
+
+    results = manager.delete_html_batch(files)
+
+    assert sorted(call[1] for call in s3_client.calls) == ["auto-bucket"] + ["credit-bucket"] * 3
+    assert sorted(len(call[2]) for call in s3_client.calls) == [1, 500, 1000, 1000]
+    failed = [files[i][1] for i, result in enumerate(results) if result == "failed"]
+    assert failed == ["article-7", "article-2100"]
+    assert results.count("successful") == len(files) - 2
+    assert ("auto-bucket", "article-auto.html") not in s3_client.objects
+    assert ("credit-bucket", "article-7.html") in s3_client.objects
+
+
+def test_gzip_output_encoding(manager, s3_client):
+    s3_client.objects[("import", "credit-kb/export.jsonl")] = to_jsonl([make_article(1)])
+    assert manager.process_s3_object("import", "credit-kb/export.jsonl") == (1, 0, 0)
+    assert s3_client.encodings[("credit-bucket", "article-1.html")] is None
+
+    # Switching encodings rewrites the object even though the HTML is unchanged
+    manager.output_encoding = "gzip"
+    assert manager.process_s3_object("import", "credit-kb/export.jsonl") == (1, 0, 0)
+    assert s3_client.encodings[("credit-bucket", "article-1.html")] == "gzip"
+    assert gzip.decompress(s3_client.objects[("credit-bucket", "article-1.html")]) == b"<p>Body 1 text</p>"
+
+    assert manager.process_s3_object("import", "credit-kb/export.jsonl") == (0, 0, 1)
+
+
+def test_output_encoding_is_validated(monkeypatch):
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    config = {"BATCH_SIZE": 25, "MAX_THREADS": 4, "LOB_MAPPING": LOB_MAPPING}
+    with pytest.raises(ValueError):
+        S3Manager({**config, "OUTPUT_ENCODING": "deflate"})
+
+    monkeypatch.setattr(s3_manager, "brotli", None)
+    with pytest.raises(ValueError, match="brotli"):
+        S3Manager({**config, "OUTPUT_ENCODING": "br"})
+
+
+def test_latest_version_per_article_wins_within_a_file(manager, s3_client):
+    s3_client.objects[("credit-bucket", "article-1.html")] = "old"
+    articles = [
+        make_article(1, LastModifiedDate="2024-05-01T09:00:00.000Z", Content__c="<p>draft one</p>"),
+        make_article(1, LastModifiedDate="2024-05-01T11:00:00.000Z", Content__c="<p>final</p>"),
+        make_article(1, LastModifiedDate="2024-05-01T10:00:00.000Z", Content__c="<p>draft two</p>"),
+        # The archived previous version shares the UrlName of the published one
+        make_article(1, status="Archived", LastModifiedDate="2024-05-01T11:00:00.000Z"),
+    ]
+    s3_client.objects[("import", "credit-kb/export.jsonl")] = to_jsonl(articles)
+
+    assert manager.process_s3_object("import", "credit-kb/export.jsonl") == (1, 0, 3)
+    assert s3_client.objects[("credit-bucket", "article-1.html")] == "<p>final</p>"
+    assert s3_client.count("put_object") == 1
+    assert s3_client.count("delete_objects") == 0
+
+
+def test_older_export_in_the_same_event_does_not_overwrite(manager, s3_client):
+    newer = to_jsonl([make_article(1, LastModifiedDate="2024-05-02T10:00:00.000Z", Content__c="<p>new</p>")])
+    older = to_jsonl([make_article(1, status="Archived", LastModifiedDate="2024-05-01T10:00:00.000Z")]
+                     + [make_article(1, LastModifiedDate="2024-05-01T10:00:00.000Z", Content__c="<p>old</p>")])
+    s3_client.objects[("import", "credit-kb/newer.jsonl")] = newer
+    s3_client.objects[("import", "credit-kb/older.jsonl")] = older
+
+    body = json.loads(manager.controller(s3_event("credit-kb/older.jsonl", "credit-kb/newer.jsonl"))["body"])
+
+    assert s3_client.objects[("credit-bucket", "article-1.html")] == "<p>new</p>"
+    assert body["successful"] + body["skipped"] == 3
+    assert body["failed"] == 0
+
+
+def test_uploads_record_source_version_and_older_exports_are_ignored(manager, s3_client):
+    newer = make_article(1, LastModifiedDate="2024-05-02T10:00:00.000Z", Content__c="<p>new</p>")
+    s3_client.objects[("import", "credit-kb/newer.jsonl")] = to_jsonl([newer])
+    assert manager.process_s3_object("import", "credit-kb/newer.jsonl") == (1, 0, 0)
+    assert s3_client.metadata[("credit-bucket", "article-1.html")]["source-last-modified"] == "2024-05-02T10:00:00.000Z"
+    assert s3_client.metadata[("credit-bucket", "article-1.html")]["article-number"] == "000000001"
+
+    # A later invocation receives an older export: neither its edit nor its archive applies
+    older = [make_article(1, LastModifiedDate="2024-05-01T10:00:00.000Z", Content__c="<p>old</p>")]
+    s3_client.objects[("import", "credit-kb/older.jsonl")] = to_jsonl(older)
+    body = json.loads(manager.controller(s3_event("credit-kb/older.jsonl"))["body"])
+    assert (body["successful"], body["skipped"]) == (0, 1)
+
+    archived = [make_article(1, status="Archived", LastModifiedDate="2024-05-01T12:00:00.000Z")]
+    s3_client.objects[("import", "credit-kb/archived.jsonl")] = to_jsonl(archived)
+    body = json.loads(manager.controller(s3_event("credit-kb/archived.jsonl"))["body"])
+    assert (body["successful"], body["skipped"]) == (0, 1)
+    assert s3_client.objects[("credit-bucket", "article-1.html")] == "<p>new</p>"
+    assert s3_client.count("delete_objects") == 0
+
+
+def test_unchanged_newer_version_advances_stored_version(manager, s3_client):
+    def export(name, **overrides):
+        s3_client.objects[("import", f"credit-kb/{name}.jsonl")] = to_jsonl([make_article(1, **overrides)])
+        return json.loads(manager.controller(s3_event(f"credit-kb/{name}.jsonl"))["body"])
+
+    export("a-january", LastModifiedDate="2024-01-01T10:00:00.000Z", Content__c="<p>A</p>")
+    assert export("a-march", LastModifiedDate="2024-03-01T10:00:00.000Z", Content__c="<p>A</p>")["skipped"] == 1
+    assert s3_client.count("put_object") == 1
+    assert s3_client.metadata[("credit-bucket", "article-1.html")]["source-last-modified"] == "2024-03-01T10:00:00.000Z"
+
+    # A delayed export of an intermediate version loses to the March one
+    assert export("b-february", LastModifiedDate="2024-02-01T10:00:00.000Z", Content__c="<p>B</p>")["skipped"] == 1
+    assert s3_client.objects[("credit-bucket", "article-1.html")] == "<p>A</p>"
+
+
+def test_version_update_of_a_deleted_object_recreates_it(manager, s3_client):
+    s3_client.objects[("import", "credit-kb/export.jsonl")] = to_jsonl(
+        [make_article(1, LastModifiedDate="2024-01-01T10:00:00.000Z")]
+    )
+    assert manager.process_s3_object("import", "credit-kb/export.jsonl") == (1, 0, 0)
+    # Deleted by another writer after this manager cached it
+    del s3_client.objects[("credit-bucket", "article-1.html")]
+
+    s3_client.objects[("import", "credit-kb/export.jsonl")] = to_jsonl(
+        [make_article(1, LastModifiedDate="2024-03-01T10:00:00.000Z")]
+    )
+    assert manager.process_s3_object("import", "credit-kb/export.jsonl") == (1, 0, 0)
+    assert s3_client.count("copy_object") == 1
+    assert ("credit-bucket", "article-1.html") in s3_client.objects
+
+
+def test_deleted_article_is_not_recreated_by_an_older_export(manager, s3_client):
+    manager.tombstones = InMemoryTombstoneStore()
+
+    def export(name, **overrides):
+        s3_client.objects[("import", f"credit-kb/{name}.jsonl")] = to_jsonl([make_article(1, **overrides)])
+        return json.loads(manager.controller(s3_event(f"credit-kb/{name}.jsonl"))["body"])
+
+    export("online", LastModifiedDate="2024-01-01T10:00:00.000Z")
+    assert export("archived", status="Archived", LastModifiedDate="2024-04-01T10:00:00.000Z")["successful"] == 1
+    assert manager.tombstones.load("credit-bucket", "article-1.html") == "2024-04-01T10:00:00.000Z"
+
+    manager.known_objects.clear()
+    assert export("delayed", LastModifiedDate="2024-02-01T10:00:00.000Z")["skipped"] == 1
+    assert ("credit-bucket", "article-1.html") not in s3_client.objects
+
+    # An older archive of the absent article keeps the newer tombstone
+    export("older-archive", status="Archived", LastModifiedDate="2024-03-01T10:00:00.000Z")
+    assert manager.tombstones.load("credit-bucket", "article-1.html") == "2024-04-01T10:00:00.000Z"
+
+    assert export("republished", LastModifiedDate="2024-05-01T10:00:00.000Z")["successful"] == 1
+    assert ("credit-bucket", "article-1.html") in s3_client.objects
+
+
+def test_warm_invocation_needs_no_head_requests(manager, s3_client):
+    s3_client.objects[("import", "credit-kb/export.jsonl")] = to_jsonl(make_article(i) for i in range(10))
+    manager.controller(s3_event("credit-kb/export.jsonl"))
+    assert s3_client.count("head_object") == 10
+
+    s3_client.objects[("import", "credit-kb/export.jsonl")] = to_jsonl(
+        make_article(i, Content__c=f"<p>edited {i}</p>") for i in range(10)
+    )
+    body = json.loads(manager.controller(s3_event("credit-kb/export.jsonl"))["body"])
+
+    assert body["successful"] == 10
+    assert s3_client.count("head_object") == 10
+
+
+def test_delete_rechecks_objects_cached_as_absent_by_an_earlier_invocation(manager, s3_client):
+    s3_client.objects[("import", "credit-kb/export.jsonl")] = to_jsonl([make_article(1, status="Archived")])
+    manager.controller(s3_event("credit-kb/export.jsonl"))
+    # Created by another execution environment in the meantime
+    s3_client.objects[("credit-bucket", "article-1.html")] = "written elsewhere"
+
+    s3_client.objects[("import", "credit-kb/export.jsonl")] = to_jsonl(
+        [make_article(1, status="Archived", LastModifiedDate="2024-06-01T10:00:00.000Z")]
+    )
+    manager.controller(s3_event("credit-kb/export.jsonl"))
+
+    assert ("credit-bucket", "article-1.html") not in s3_client.objects
+
+
+def test_conditional_put_retries_after_a_concurrent_write(manager, s3_client):
+    s3_client.objects[("credit-bucket", "article-1.html")] = "written by another instance"
+    manager.known_objects[("credit-bucket", "article-1.html")] = s3_manager.StoredObject('"stale"', None, None)
+
+    assert manager.process_batch([manager.article_parser.parse_line(to_jsonl([make_article(1)]))], "credit-kb") == ["successful"]
+    assert s3_client.count("put_object") == 2
+    assert s3_client.count("head_object") == 1
+    assert s3_client.objects[("credit-bucket", "article-1.html")] == "<p>Body 1 text</p>"
+
+
+def test_throttled_writes_back_off_and_are_retried(manager, s3_client, metrics_sink, monkeypatch):
+    monkeypatch.setattr(s3_limiter, "BACKOFF_BASE_SECONDS", 0)
+    put_object = s3_client.put_object
+    throttled = []
+
+    def throttling_put_object(**kwargs):
+        if len(throttled) < 2:
+            throttled.append(kwargs["Key"])
+            raise ClientError({"Error": {"Code": "SlowDown", "Message": "Please reduce your request rate."},
+                               "ResponseMetadata": {"HTTPStatusCode": 503}}, "PutObject")
+        return put_object(**kwargs)
+
+    monkeypatch.setattr(s3_client, "put_object", throttling_put_object)
+    s3_client.objects[("import", "credit-kb/export.jsonl")] = to_jsonl(make_article(i) for i in range(10))
+
+    manager.controller(s3_event("credit-kb/export.jsonl"))
+
+    assert sum(1 for key in s3_client.objects if key[0] == "credit-bucket") == 10
+    assert metrics_sink.total("RecordsSuccessful", Lob="credit-kb") == 10
+    assert metrics_sink.total("S3WriteThrottles") == 2
+    assert metrics_sink.total("S3WriteBackoffs") >= 1
+    assert metrics_sink.values("S3WriteConcurrencyLowest")[0] < manager.config["MAX_THREADS"]
+    assert metrics_sink.values("S3WritePeakInFlight")[0] <= manager.config["MAX_THREADS"]
+
+
+def test_conditional_delete_fails_when_object_changed(manager, s3_client):
+    s3_client.objects[("credit-bucket", "article-1.html")] = "current"
+    manager.known_objects[("credit-bucket", "article-1.html")] = s3_manager.StoredObject('"stale"', None, None)
+
+    assert manager.process_batch([make_record(1, "Archived")], "credit-kb") == ["failed"]
+    assert ("credit-bucket", "article-1.html") in s3_client.objects
+    # The stale state is dropped so the redelivered message re-reads it
+    assert ("credit-bucket", "article-1.html") not in manager.known_objects
+
+
+def test_controller_emits_stage_metrics_per_lob(manager, s3_client, metrics_sink):
+    s3_client.objects[("credit-bucket", "article-2.html")] = "old"
+    s3_client.undeletable.add("article-2.html")
+    body = to_jsonl([make_article(1), make_article(2, status="Archived"), make_article(3, Title="", Content__c="")])
+    s3_client.objects[("import", "credit-kb/export.jsonl")] = body + b"not json\n"
+
+    manager.controller(s3_event("credit-kb/export.jsonl"))
+
+    assert metrics_sink.total("LinesDecoded", Lob="credit-kb") == 4
+    assert metrics_sink.total("BytesRead", Lob="credit-kb") == len(body) + len(b"not json\n")
+    assert metrics_sink.total("MalformedLines", Lob="credit-kb") == 1
+    assert metrics_sink.total("ValidationRejects", Lob="credit-kb", Field="Title", Reason="missing") == 1
+    assert metrics_sink.total("ValidationRejects", Lob="credit-kb", Field="Content__c", Reason="missing") == 1
+    assert len(metrics_sink.values("S3GetLatency", Lob="credit-kb")) == 1
+    assert len(metrics_sink.values("S3PutLatency", Lob="credit-kb")) == 1
+    assert metrics_sink.total("S3DeleteErrors", Lob="credit-kb") == 1
+    assert metrics_sink.total("RecordsSuccessful", Lob="credit-kb") == 1
+    assert metrics_sink.total("RecordsFailed", Lob="credit-kb") == 1
+    assert metrics_sink.total("SanitizeCpuTime", Lob="credit-kb") > 0
+    # Emitted once: a second invocation starts from zero
+    metrics_sink.documents.clear()
+    manager.controller(s3_event("credit-kb/export.jsonl"))
+    assert metrics_sink.total("LinesDecoded", Lob="credit-kb") == 4
+
+
+def test_process_mode_reports_worker_parse_metrics(manager, s3_client, metrics_sink):
+    s3_client.objects[("import", "credit-kb/export.jsonl")] = to_jsonl(
+        [make_article(i) for i in range(10)] + [make_article(99, ArticleNumber="")]
+    )
+    manager.config.update({"SANITIZE_MODE": "process", "SANITIZE_WORKERS": 2, "SANITIZE_CHUNK_SIZE": 4})
+
+    manager.controller(s3_event("credit-kb/export.jsonl"))
+
+    assert metrics_sink.total("LinesDecoded", Lob="credit-kb") == 11
+    assert metrics_sink.total("ValidationRejects", Lob="credit-kb", Field="ArticleNumber", Reason="missing") == 1
+
+
+@pytest.mark.parametrize("mode", ["thread", "process"])
+def test_record_schema_rejects_are_aggregated(monkeypatch, s3_client, metrics_sink, caplog, mode):
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    record_schema = json.dumps({
+        "filters": [{"field": "PublishStatus", "operator": "EQUAL_TO", "values": ["Online", "Archived"]}],
+        "projections": [{"field": "Title", "data_type": "string", "max_length": 40}],
+    })
+    manager = S3Manager({"BATCH_SIZE": 25, "MAX_THREADS": 4, "LOB_MAPPING": LOB_MAPPING, "RECORD_SCHEMA": record_schema,
+                         "SANITIZE_MODE": mode, "SANITIZE_WORKERS": 2, "SANITIZE_CHUNK_SIZE": 4},
+                        s3_client=s3_client, metrics=MetricsRecorder(sink=metrics_sink))
+    s3_client.objects[("import", "credit-kb/export.jsonl")] = to_jsonl(
+        [make_article(i) for i in range(5)] + [make_article(i, status="Draft") for i in range(5, 8)]
+        + [make_article(9, Title="x" * 41)]
+    )
+
+    assert manager.process_s3_object("import", "credit-kb/export.jsonl") == (5, 0, 0)
+    manager.metrics.flush()
+    manager.close()
+    assert metrics_sink.total("ValidationRejects", Lob="credit-kb", Field="PublishStatus", Reason="value") == 3
+    assert metrics_sink.total("ValidationRejects", Lob="credit-kb", Field="Title", Reason="length") == 1
+    rejected = [record for record in caplog.records if "Rejected articles" in record.getMessage()]
+    assert len(rejected) == 1
+    assert "PublishStatus value 3, Title length 1" in rejected[0].getMessage()
+
+
+def test_malformed_record_schema_is_rejected_at_init(monkeypatch):
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    with pytest.raises(ValueError, match="RECORD_SCHEMA"):
+        S3Manager({"BATCH_SIZE": 25, "MAX_THREADS": 4, "LOB_MAPPING": LOB_MAPPING, "RECORD_SCHEMA": "{"})
+
+
+class FakeSQSClient:
+    def __init__(self):
+        self.sent = []
+
+    def send_message(self, QueueUrl, MessageBody):
+        self.sent.append((QueueUrl, MessageBody))
+
+
+class TickingClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        self.now += 1
+        return self.now
+
+
+# A Lambda context already within the deadline margin
+EXPIRING_CONTEXT = types.SimpleNamespace(get_remaining_time_in_millis=lambda: 0)
+
+
+@pytest.fixture
+def resumable(monkeypatch, s3_client, metrics_sink):
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    manager = S3Manager({"BATCH_SIZE": 25, "MAX_THREADS": 4, "LOB_MAPPING": LOB_MAPPING, "QUEUE_URL": "queue"},
+                        s3_client=s3_client, metrics=MetricsRecorder(sink=metrics_sink),
+                        checkpoints=InMemoryCheckpointStore(), sqs_client=FakeSQSClient())
+    yield manager
+    manager.close()
+
+
+@pytest.mark.parametrize("mode", ["stream", "ranged", "spill-thread", "spill-process"])
+def test_checkpointed_file_resumes_without_rereading(resumable, s3_client, tmp_path, mode):
+    body = to_jsonl(make_article(i) for i in range(30))
+    s3_client.objects[("import", "credit-kb/export.jsonl")] = body
+    if mode == "ranged":
+        resumable.range_threshold, resumable.range_part_size = 1, 500
+    elif mode.startswith("spill"):
+        resumable.spill_threshold, resumable.range_part_size = 1, 500
+        resumable.spill_budget.directory = str(tmp_path)
+        resumable.config.update({"SANITIZE_MODE": mode[len("spill-"):], "SANITIZE_WORKERS": 2, "SANITIZE_CHUNK_SIZE": 4})
+
+    offsets, successful = [], 0
+    while True:
+        try:
+            successful += resumable.process_s3_object("import", "credit-kb/export.jsonl", len(body),
+                                                      Deadline(3, clock=TickingClock()))[0]
+            break
+        except DeadlineReached as e:
+            successful += e.successful
+            offsets.append(e.checkpoint.offset)
+
+    assert len(offsets) > 1
+    assert offsets == sorted(offsets) and offsets[-1] < len(body)
+    assert successful == 30
+    # Every article is written once, none is re-read as unchanged
+    assert s3_client.count("put_object") == 30
+    assert resumable.checkpoints.checkpoints == {}
+    assert resumable.spill_budget.reserved == 0
+
+
+def test_controller_continues_checkpointed_file_through_the_queue(resumable, s3_client, metrics_sink):
+    s3_client.objects[("import", "credit-kb/export.jsonl")] = to_jsonl(make_article(i) for i in range(3))
+    event = s3_event("credit-kb/export.jsonl")
+
+    responses = [resumable.controller(event, EXPIRING_CONTEXT)]
+    while len(resumable.sqs_client.sent) == len(responses):
+        event = {"Records": [{"messageId": "next", "body": resumable.sqs_client.sent[-1][1]}]}
+        responses.append(resumable.controller(event, EXPIRING_CONTEXT))
+
+    # One line per invocation: the context is already past the margin
+    assert len(responses) == 3
+    assert [json.loads(response["body"])["successful"] for response in responses] == [1, 1, 1]
+    assert all(response["batchItemFailures"] == [] for response in responses)
+    assert resumable.sqs_client.sent[0] == ("queue", s3_event("credit-kb/export.jsonl")["Records"][0]["body"])
+    assert all(("credit-bucket", f"article-{i}.html") in s3_client.objects for i in range(3))
+    assert resumable.checkpoints.checkpoints == {}
+    assert metrics_sink.total("Checkpoints", Lob="credit-kb") == 2
+    assert metrics_sink.total("Resumes", Lob="credit-kb") == 2
+    assert metrics_sink.total("Continuations") == 2
+
+
+def test_checkpointed_message_is_redelivered_without_a_queue(resumable, s3_client):
+    resumable.sqs_client = None
+    s3_client.objects[("import", "credit-kb/export.jsonl")] = to_jsonl(make_article(i) for i in range(3))
+
+    response = resumable.controller(s3_event("credit-kb/export.jsonl"), EXPIRING_CONTEXT)
+
+    assert response["batchItemFailures"] == [{"itemIdentifier": "m0"}]
+    assert resumable.checkpoints.load("import", "credit-kb/export.jsonl").offset > 0
+
+
+def test_checkpoint_of_a_replaced_object_is_discarded(resumable, s3_client):
+    s3_client.objects[("import", "credit-kb/export.jsonl")] = to_jsonl(make_article(i) for i in range(3))
+    with pytest.raises(DeadlineReached):
+        resumable.process_s3_object("import", "credit-kb/export.jsonl", deadline=Deadline(0, clock=lambda: 1))
+
+    s3_client.objects[("import", "credit-kb/export.jsonl")] = to_jsonl(make_article(i) for i in range(10, 13))
+
+    assert resumable.process_s3_object("import", "credit-kb/export.jsonl") == (3, 0, 0)
+    assert resumable.checkpoints.checkpoints == {}
+
+
+def test_failures_before_a_checkpoint_fail_the_finished_file(resumable, s3_client):
+    s3_client.objects[("credit-bucket", "article-1.html")] = "old"
+    s3_client.undeletable.add("article-1.html")
+    s3_client.objects[("import", "credit-kb/export.jsonl")] = to_jsonl(
+        [make_article(1, status="Archived"), make_article(2)]
+    )
+    with pytest.raises(DeadlineReached) as reached:
+        resumable.process_s3_object("import", "credit-kb/export.jsonl", deadline=Deadline(0, clock=lambda: 1))
+    assert reached.value.failed == 1
+
+    assert resumable.process_s3_object("import", "credit-kb/export.jsonl") == (1, 1, 0)
+
+
+def test_controller_ignores_checkpoint_objects(resumable, s3_client):
+    response = resumable.controller(s3_event("_checkpoints/import/credit-kb/export.jsonl.json"), EXPIRING_CONTEXT)
+
+    assert json.loads(response["body"])["successful"] == 0
+    assert s3_client.calls == []
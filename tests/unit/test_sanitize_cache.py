@@ -0,0 +1,69 @@
+import os
+
+from html_sanitizer import HTML_PARSER, STREAMING, HTMLSanitizer
+from sanitize_cache import SanitizeCache, cache_key
+
+
+def test_cache_key_depends_on_rules_version():
+    assert cache_key("<p>x</p>", "1:streaming") == cache_key("<p>x</p>", "1:streaming")
+    assert cache_key("<p>x</p>", "1:streaming") != cache_key("<p>x</p>", "2:streaming")
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = SanitizeCache(max_entries=2)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    assert cache.get("a") == "A"
+    cache.put("c", "C")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+    assert cache.get("c") == "C"
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["misses"], stats["evictions"]) == (3, 1, 1)
+
+
+def test_memory_tier_is_bounded_by_size():
+    cache = SanitizeCache(max_entries=100, max_bytes=10)
+    cache.put("a", "x" * 6)
+    cache.put("b", "y" * 6)
+    assert cache.get("a") is None
+    assert cache.stats()["memory_bytes"] == 6
+
+
+def test_disk_tier_keeps_evicted_entries(tmp_path):
+    cache = SanitizeCache(max_entries=1, disk_dir=str(tmp_path), disk_max_bytes=1024)
+    cache.put("a", "<p>A</p>")
+    cache.put("b", "<p>B</p>")
+
+    assert os.path.exists(tmp_path / "a.html")
+    assert cache.get("a") == "<p>A</p>"
+    assert cache.stats()["disk_hits"] == 1
+
+    # A new cache over the same directory picks up existing entries
+    reloaded = SanitizeCache(max_entries=1, disk_dir=str(tmp_path), disk_max_bytes=1024)
+    assert reloaded.stats()["disk_entries"] >= 1
+
+
+def test_disk_tier_evicts_to_size_bound(tmp_path):
+    cache = SanitizeCache(max_entries=0, disk_dir=str(tmp_path), disk_max_bytes=20)
+    for key in "abc":
+        cache.put(key, key * 8)
+
+    assert cache.stats()["disk_bytes"] <= 20
+    assert not os.path.exists(tmp_path / "a.html")
+    assert cache.get("c") == "c" * 8
+
+
+def test_sanitizer_serves_repeated_bodies_from_cache():
+    cache = SanitizeCache()
+    sanitizer = HTMLSanitizer(STREAMING, cache=cache)
+    html = '<p>Hello&nbsp;<b>world</b></p>'
+
+    first = sanitizer.sanitize_html(html)
+    second = sanitizer.sanitize_html(html)
+    HTMLSanitizer(HTML_PARSER, cache=cache).sanitize_html(html)
+
+    assert first == second == "<p>Hello <strong>world</strong></p>"
+    # The html.parser sanitizer uses its own key, so it misses
+    assert (cache.stats()["memory_hits"], cache.stats()["misses"]) == (1, 2)
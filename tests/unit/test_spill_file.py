@@ -0,0 +1,49 @@
+import os
+
+from spill_file import SpillBudget, SpillFile, read_slice_lines
+
+DATA = b'{"a": 1}\n{"b": 2}\r\n\n{"c": 3}\n{"d": 4}'
+
+
+def write_spill(tmp_path, data=DATA, part_size=7):
+    spill = SpillFile(len(data), str(tmp_path))
+    # Parts may arrive in any order
+    for offset in reversed(range(0, len(data), part_size)):
+        spill.write_at(offset, data[offset:offset + part_size])
+    spill.index()
+    return spill
+
+
+def test_index_and_lines_match_a_stream(tmp_path):
+    spill = write_spill(tmp_path)
+
+    assert list(spill.lines()) == [b'{"a": 1}\n', b'{"b": 2}\r\n', b'\n', b'{"c": 3}\n', b'{"d": 4}']
+    assert spill.line_count == 5
+    spill.close()
+
+
+def test_slices_are_line_aligned(tmp_path):
+    spill = write_spill(tmp_path)
+
+    slices = list(spill.slices(2))
+    assert [len(read_slice_lines(spill.path, start, end)) for start, end in slices] == [2, 2, 1]
+    assert b"".join(b"".join(read_slice_lines(spill.path, start, end)) for start, end in slices) == DATA
+    spill.close()
+
+
+def test_close_deletes_the_file(tmp_path):
+    spill = write_spill(tmp_path)
+    spill.close()
+    spill.close()
+
+    assert not os.path.exists(spill.path)
+
+
+def test_budget_bounds_concurrent_reservations(tmp_path):
+    budget = SpillBudget(100, str(tmp_path))
+
+    assert budget.reserve(60)
+    assert not budget.reserve(50)
+    budget.release(60)
+    assert budget.reserve(100)
+    assert budget.reserved == 100
@@ -0,0 +1,83 @@
+import io
+
+import pytest
+from botocore.exceptions import ClientError
+
+from tombstones import InMemoryTombstoneStore, S3TombstoneStore
+
+
+class FakeTombstoneClient:
+    def __init__(self):
+        self.objects = {}
+        self.calls = []
+
+    def get_paginator(self, operation):
+        assert operation == "list_objects_v2"
+        return self
+
+    def paginate(self, Bucket, Prefix):
+        self.calls.append("list_objects_v2")
+        keys = sorted(key for bucket, key in self.objects if bucket == Bucket and key.startswith(Prefix))
+        # One key per page, to cover pagination
+        for key in keys:
+            yield {"Contents": [{"Key": key}]}
+        if not keys:
+            yield {}
+
+    def get_object(self, Bucket, Key):
+        self.calls.append("get_object")
+        if (Bucket, Key) not in self.objects:
+            raise ClientError({"Error": {"Code": "NoSuchKey"}}, "GetObject")
+        return {"Body": io.BytesIO(self.objects[(Bucket, Key)].encode())}
+
+    def put_object(self, Bucket, Key, Body, ContentType):
+        self.objects[(Bucket, Key)] = Body
+
+
+@pytest.mark.parametrize("store_factory", [
+    lambda: S3TombstoneStore(FakeTombstoneClient(), "import", "_checkpoints/_tombstones/"),
+    InMemoryTombstoneStore,
+])
+def test_store_saves_and_loads(store_factory):
+    store = store_factory()
+
+    assert store.load("credit-bucket", "article-1.html") is None
+    store.save("credit-bucket", "article-1.html", "2024-04-01T10:00:00.000Z")
+    assert store.load("credit-bucket", "article-1.html") == "2024-04-01T10:00:00.000Z"
+    assert store.load("auto-bucket", "article-1.html") is None
+
+
+def test_s3_store_keeps_tombstones_under_its_prefix():
+    client = FakeTombstoneClient()
+
+    S3TombstoneStore(client, "import", "_checkpoints/_tombstones/").save("credit-bucket", "a.html", "2024-04-01")
+
+    assert list(client.objects) == [("import", "_checkpoints/_tombstones/credit-bucket/a.html.json")]
+
+
+def test_s3_store_lists_a_bucket_once_and_gets_only_listed_keys():
+    client = FakeTombstoneClient()
+    writer = S3TombstoneStore(client, "import", "_checkpoints/_tombstones/")
+    writer.save("credit-bucket", "a.html", "2024-04-01")
+    writer.save("credit-bucket", "b.html", "2024-04-02")
+    store = S3TombstoneStore(client, "import", "_checkpoints/_tombstones/")
+    client.calls.clear()
+
+    assert [store.load("credit-bucket", f"new-{i}.html") for i in range(50)] == [None] * 50
+    assert store.load("credit-bucket", "b.html") == "2024-04-02"
+    assert client.calls == ["list_objects_v2", "get_object"]
+
+
+def test_s3_store_sees_its_own_saves_and_other_writers_after_refresh():
+    client = FakeTombstoneClient()
+    store = S3TombstoneStore(client, "import", "_checkpoints/_tombstones/")
+    other = S3TombstoneStore(client, "import", "_checkpoints/_tombstones/")
+
+    assert store.load("credit-bucket", "a.html") is None
+    store.save("credit-bucket", "a.html", "2024-04-01")
+    other.save("credit-bucket", "b.html", "2024-04-02")
+
+    assert store.load("credit-bucket", "a.html") == "2024-04-01"
+    assert store.load("credit-bucket", "b.html") is None
+    store.refresh()
+    assert store.load("credit-bucket", "b.html") == "2024-04-02"
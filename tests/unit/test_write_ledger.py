@@ -0,0 +1,35 @@
+from article_parser import ArticleRecord
+from write_ledger import WriteLedger, record_version
+
+
+def make_record(status, last_modified_date):
+    return ArticleRecord("ka0", "Title", "000000001", "title", status, last_modified_date, "<p>Body</p>")
+
+
+def test_record_version_orders_by_date_then_status():
+    online = make_record("Online", "2024-05-01T10:00:00.000Z")
+    archived = make_record("Archived", "2024-05-01T10:00:00.000Z")
+    later = make_record("Archived", "2024-05-02T08:00:00.000Z")
+
+    assert record_version(archived) < record_version(online) < record_version(later)
+    assert record_version(make_record(None, None)) < record_version(archived)
+
+
+def test_claims_supersede_and_reject_older_versions():
+    ledger = WriteLedger()
+    first = ledger.claim("key", ("2024-05-01", 1))
+    newer = ledger.claim("key", ("2024-05-02", 1))
+
+    assert ledger.claim("key", ("2024-04-30", 1)) is None
+    assert newer.previous is first.future
+    assert not ledger.is_current("key", first)
+    assert ledger.is_current("key", newer)
+
+    started = []
+    newer.when_ready(lambda: started.append("newer"))
+    assert started == []
+    first.future.set_result("skipped")
+    assert started == ["newer"]
+
+    ledger.clear()
+    assert len(ledger) == 0